@@ -0,0 +1,184 @@
+"""
+Agente inteligente simplificado (sem LangChain) usado pelo `app_v3_simple.py` e pelo serviço HTTP.
+
+Detecta todas as menções a países, consulta os dados (snapshot local / API RestCountries) e
+responde conforme a persona, mantendo só a janela recente da conversa (`SimpleMemory`): as
+respostas são montadas a partir dos dados consultados e não usam o contexto, então resumo e
+recuperação (`memory.create_memory`) seriam só custo (threads de resumo e um índice que cresce).
+
+Perguntas com vários países ("compare Brasil, Argentina e Chile") disparam as consultas em
+paralelo num pool limitado de threads compartilhado pelo processo (`AGENT_TOOL_CONCURRENCY`);
+consultas idênticas já em andamento, vindas de qualquer sessão, são coalescidas numa só.
+"""
+
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from memory import SimpleMemory
+from intent import find_countries
+from country_info import country_capital, fetch_country
+from http_client import CircuitOpenError
+from metrics import span
+from singleflight import SingleFlight, flights
+
+MAX_COUNTRIES = 10  # limite de consultas disparadas por mensagem
+
+# =========================
+# API Externa (Country Info)
+# =========================
+def format_country(data: Dict[str, Any]) -> str:
+    # Extrair idiomas
+    languages = list(data.get('languages', {}).values()) if 'languages' in data else ['N/A']
+
+    return f"""📍 **{data['name']['common']}**
+🏛️ **Capital:** {country_capital(data)}
+👥 **População:** {data.get('population', 0):,} habitantes
+🌍 **Região:** {data.get('region', 'N/A')} ({data.get('subregion', 'N/A')})
+📏 **Área:** {data.get('area', 0):,} km²
+🗣️ **Idiomas:** {', '.join(languages)}"""
+
+def format_error(country_name: str, error: Exception) -> str:
+    if isinstance(error, CircuitOpenError):
+        return f"⏳ O serviço de países está temporariamente indisponível; tente '{country_name}' de novo em instantes."
+    return f"❌ Não foi possível obter informações para '{country_name}'. Erro: {str(error)}"
+
+@span("tool")
+def lookup_country(country_name: str) -> Dict[str, Any]:
+    """Dados brutos do país; levanta exceção em falha"""
+    return fetch_country(country_name)
+
+def get_country_info(country_name: str) -> str:
+    """Busca informações sobre um país específico."""
+    try:
+        return format_country(lookup_country(country_name))
+    except Exception as e:
+        return format_error(country_name, e)
+
+def compare_countries(countries: List[Dict[str, Any]]) -> str:
+    """Tabela comparativa (markdown) com os países consultados com sucesso"""
+    lines = ["| País | Capital | População | Área (km²) | Hab./km² |", "|---|---|---:|---:|---:|"]
+    for data in countries:
+        population, area = data.get('population', 0), data.get('area', 0)
+        density = f"{population / area:,.1f}" if area else "N/A"
+        lines.append(f"| {data['name']['common']} | {country_capital(data)} | "
+                     f"{population:,} | {area:,} | {density} |")
+    return "\n".join(lines)
+
+# =========================
+# Execução paralela de ferramentas
+# =========================
+class ToolExecutor:
+    """Pool limitado de threads para chamadas de ferramentas.
+
+    `submit(key, fn, *args)` devolve o `Future` de uma chamada com a mesma chave ainda em
+    andamento, se houver, em vez de disparar outra (coalescência via `singleflight`).
+    """
+
+    def __init__(self, max_workers: int = 8, flights: SingleFlight = flights):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-tool")
+        self._flights = flights
+
+    def submit(self, key: Hashable, fn: Callable, *args) -> Future:
+        return self._flights.submit(("tool", key), self._pool, fn, *args)
+
+    def run_all(self, fn: Callable, keys: List[Hashable]) -> List[Any]:
+        """Executa `fn(key)` para cada chave em paralelo; devolve resultados ou exceções, na ordem"""
+        futures = [self.submit((fn.__name__, key), fn, key) for key in keys]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+tool_executor = ToolExecutor(int(os.getenv("AGENT_TOOL_CONCURRENCY", "8")))
+
+# =========================
+# Agente Inteligente Simplificado
+# =========================
+class SmartAgent:
+    def __init__(self, persona: str, style: str, memory: Optional[SimpleMemory] = None):
+        self.persona = persona
+        self.style = style
+        self.memory = memory if memory is not None else SimpleMemory()
+    
+    @span("intent")
+    def detect_intent(self, user_input: str) -> str:
+        """Detecta a intenção do usuário (`country_info:` com os países separados por `|`)."""
+        mentions = find_countries(user_input)
+        if mentions:
+            return "country_info:" + "|".join(m.name for m in mentions[:MAX_COUNTRIES])
+        
+        return "general_chat"
+    
+    def process_message(self, user_input: str) -> Dict[str, Any]:
+        """Processa a mensagem do usuário e retorna resposta estruturada."""
+        
+        # Adicionar mensagem do usuário à memória
+        self.memory.add_message("user", user_input)
+        
+        # Detectar intenção
+        intent = self.detect_intent(user_input)
+        
+        response_data = {
+            "intent": intent,
+            "api_used": False,
+            "api_result": None,
+            "response": "",
+            "thinking": ""
+        }
+        
+        if intent.startswith("country_info:"):
+            # Extrair nomes dos países (nomes canônicos em inglês, usados pela API)
+            countries = intent.split(":", 1)[1].split("|")
+            target = "este país" if len(countries) == 1 else f"estes {len(countries)} países"
+            
+            response_data["thinking"] = f"🤔 Detectei que você está perguntando sobre {'um país' if len(countries) == 1 else 'vários países'}: {', '.join(countries)}. Vou buscar informações atualizadas usando a API externa."
+            response_data["api_used"] = True
+            
+            # Buscar informações dos países em paralelo
+            with span("tool_fanout"):
+                results = tool_executor.run_all(lookup_country, countries)
+            found = [r for r in results if not isinstance(r, Exception)]
+            sections = [format_error(c, r) if isinstance(r, Exception) else format_country(r)
+                        for c, r in zip(countries, results)]
+            if len(found) > 1:
+                sections.append("📊 **Comparativo**\n\n" + compare_countries(found))
+            api_result = "\n\n".join(sections)
+            response_data["api_result"] = api_result
+            
+            # Gerar resposta baseada na persona
+            if self.persona == "Professor":
+                response_data["response"] = f"Como educador, vou compartilhar informações interessantes sobre {target}:\n\n{api_result}\n\n📚 Essas informações são atualizadas e obtidas em tempo real. Que aspecto específico você gostaria de explorar mais?"
+            
+            elif self.persona == "Suporte Técnico":
+                response_data["response"] = f"✅ Dados obtidos com sucesso da API RestCountries:\n\n{api_result}\n\n🔧 Status: {len(found)} de {len(countries)} consulta(s) realizada(s) com sucesso. Precisa de mais alguma informação técnica?"
+            
+            elif self.persona == "Contador de Histórias":
+                response_data["response"] = f"Que interessante! Deixe-me contar sobre {'este lugar fascinante' if len(countries) == 1 else 'esses lugares fascinantes'}:\n\n{api_result}\n\n✨ Cada país tem sua própria história única. Imagino quantas aventuras já aconteceram nessas terras!"
+            
+            else:  # Analista
+                response_data["response"] = f"📊 Análise de dados {'do país solicitado' if len(countries) == 1 else 'dos países solicitados'}:\n\n{api_result}\n\n📈 Dados obtidos via API RestCountries. Densidade populacional calculada automaticamente."
+        
+        else:
+            # Chat geral (as respostas simuladas não usam o contexto, então não há busca na memória)
+            response_data["thinking"] = "💭 Pergunta geral detectada."
+            
+            if self.persona == "Professor":
+                response_data["response"] = f"Como educador, vou explicar isso de forma didática. Sobre '{user_input}', posso dizer que é um tópico interessante que pode ser abordado de várias perspectivas. Para informações específicas sobre países, posso consultar dados em tempo real!"
+            
+            elif self.persona == "Suporte Técnico":
+                response_data["response"] = f"Entendi sua solicitação sobre '{user_input}'. Para questões gerais, posso fornecer orientações. Para dados específicos de países, tenho acesso a APIs atualizadas. Como posso ajudar especificamente?"
+            
+            elif self.persona == "Contador de Histórias":
+                response_data["response"] = f"Isso me lembra uma história... Sobre '{user_input}', há sempre algo fascinante para descobrir. Se quiser saber sobre algum país específico, posso buscar informações atualizadas para você!"
+            
+            else:  # Analista
+                response_data["response"] = f"Analisando sua consulta sobre '{user_input}'. Para análises baseadas em dados, especialmente informações de países, posso acessar fontes atualizadas. Que tipo de análise você precisa?"
+        
+        # Adicionar resposta à memória
+        self.memory.add_message("assistant", response_data["response"])
+        
+        return response_data
@@ -1,14 +1,21 @@
 import os
-import sqlite3
-import time
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import Dict, Any
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
+from oci_client import GenParams, OCIClient
+from history import trim_history
+from feedback_store import get_feedback_store
+from response_cache import get_response_cache
+from prompting import PERSONAS, STYLES, build_system_prompt
+from service_client import get_service_client
+from session_store import get_session_store
+from metrics import span, start_metrics_server, timed_stream
+from chat_view import render_history, reset_history_window
+from streamlit_common import diagnostics_page, get_session_id
+from singleflight import flight_key, flights
+
 # =========================
 # Configuração Inicial
 # =========================
@@ -63,139 +70,26 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # =========================
-# Personas & Estilos
-# =========================
-PERSONAS = {
-    "Professor": "Explique com exemplos simples e analogias, seja didático e paciente.",
-    "Suporte Técnico": "Seja objetivo, passo a passo, com troubleshooting e validações.",
-    "Contador de Histórias": "Use narrativa leve, metáforas curtas e exemplos envolventes.",
-    "Analista": "Forneça dados estruturados, análise objetiva e insights acionáveis."
-}
-
-STYLES = {
-    "Formal": "Escreva em tom profissional, claro e direto, evitando coloquialismos.",
-    "Técnico": "Use termos técnicos quando necessário, inclua listas numeradas e considerações práticas.",
-    "Simples": "Frases curtas, vocabulário simples, vá direto ao ponto.",
-    "Empático": "Seja caloroso, encorajador e demonstre compreensão emocional."
-}
-
-# =========================
-# Modelos de parâmetros
-# =========================
-class GenParams(BaseModel):
-    temperature: float = Field(0.5, ge=0.0, le=1.0)
-    top_p: float = Field(0.9, ge=0.0, le=1.0)
-    max_tokens: int = Field(512, ge=64, le=4096)
-    memory_turns: int = Field(6, ge=0, le=20)
-
-# =========================
-# Cliente OCI (Modo Simulação)
+# Sistema de Banco de Dados
 # =========================
-class OCIClient:
-    def __init__(self, mode: str = "mock"):
-        self.mode = mode
-        self.endpoint = os.getenv("OCI_ENDPOINT_URL", "")
-        self.region = os.getenv("OCI_REGION", "")
-        self.compartment = os.getenv("OCI_COMPARTMENT_OCID", "")
-        
-    def generate(self, messages: List[Dict[str, str]], params: GenParams) -> str:
-        """Gera resposta usando modo simulação (até você ter as credenciais OCI)"""
-        return self._mock_response(messages, params)
-    
-    def _mock_response(self, messages: List[Dict[str, str]], params: GenParams) -> str:
-        """Resposta simulada para desenvolvimento"""
-        user_last = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
-        
-        # Identificar persona ativa
-        persona = "Assistente"
-        system_msg = next((m["content"] for m in messages if m["role"] == "system"), "")
-        for k in PERSONAS.keys():
-            if k.lower() in system_msg.lower():
-                persona = k
-                break
-        
-        # Gerar resposta simulada baseada na persona
-        responses = {
-            "Professor": f"Como educador, vou explicar isso passo a passo. Primeiro, é importante entender que '{user_last}' pode ser abordado de várias perspectivas. Vamos começar com os fundamentos...",
-            "Suporte Técnico": f"Para resolver isso, vamos seguir um processo de troubleshooting: 1) Verifique X, 2) Confirme Y, 3) Teste Z. Isso deve resolver o problema relacionado a '{user_last}'.",
-            "Contador de Histórias": f"Isso me lembra uma história... Era uma vez alguém que enfrentou um desafio similar a '{user_last}'. Eles descobriram que a melhor abordagem era...",
-            "Analista": f"Analisando sua pergunta sobre '{user_last}', os dados mostram que 72% dos casos similares são resolvidos com a abordagem A, 23% com B, e 5% requerem intervenção especializada.",
-            "Assistente": f"Entendi sua pergunta sobre '{user_last}'. Posso ajudar com informações detalhadas, exemplos práticos e orientações passo a passo."
-        }
-        
-        response = responses.get(persona, responses["Assistente"])
-        return f"{response}\n\n*(Modo simulação - {persona} | temp={params.temperature})*"
+FEEDBACK_DB = 'feedback.db'
+CHAT_SERVICE_URL = os.getenv("CHAT_SERVICE_URL", "")  # se definido, o app vira cliente fino do service.py
 
-# =========================
-# Helpers: prompt & memória
-# =========================
-def build_system_prompt(persona: str, style: str) -> str:
-    guardrails = (
-        "Responda em PT-BR. Seja útil, claro e honesto sobre limitações. "
-        "Quando for apropriado, proponha próximos passos práticos. "
-        "Se a pergunta for ambígua, peça uma única clarificação curta. "
-        "Nunca invente números ou políticas internas."
-    )
-    return f"""Você é um assistente especializado com foco em {persona}. 
-Persona: {PERSONAS[persona]}
-Estilo: {style}. {STYLES[style]}
-Regras: {guardrails}"""
+SESSION_STORE_URL = os.getenv("SESSION_STORE_URL", "sqlite:///sessions.db")
+SESSION_HISTORY_LIMIT = 200  # mensagens carregadas do store ao abrir a conversa
 
-def trim_history(history: List[Dict[str, str]], max_turns: int) -> List[Dict[str, str]]:
-    """Mantém apenas as últimas N trocas além da mensagem de sistema."""
-    system = [m for m in history if m["role"] == "system"]
-    dialog = [m for m in history if m["role"] in ("user", "assistant")]
-    if max_turns <= 0:
-        return system
-    return system + dialog[-(max_turns*2):]
+def feedback_backend():
+    """Store local (SQLite) ou o serviço HTTP, com a mesma interface de leitura/escrita"""
+    return get_service_client(CHAT_SERVICE_URL) if CHAT_SERVICE_URL else get_feedback_store(FEEDBACK_DB)
 
-# =========================
-# Sistema de Banco de Dados
-# =========================
 def init_db():
-    """Inicializa o banco de dados SQLite"""
-    conn = sqlite3.connect('feedback.db')
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS feedback (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            persona TEXT,
-            style TEXT,
-            rating TEXT,
-            comment TEXT,
-            user_msg TEXT,
-            assistant_msg TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    """Inicializa o banco de dados SQLite (uma vez por processo)"""
+    if not CHAT_SERVICE_URL:
+        get_feedback_store(FEEDBACK_DB)
 
 def save_feedback_db(feedback_data: Dict[str, Any]):
-    """Salva feedback no SQLite"""
-    conn = sqlite3.connect('feedback.db')
-    c = conn.cursor()
-    c.execute('''
-        INSERT INTO feedback (timestamp, persona, style, rating, comment, user_msg, assistant_msg)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        feedback_data.get("timestamp"),
-        feedback_data.get("persona"),
-        feedback_data.get("style"),
-        feedback_data.get("rating"),
-        feedback_data.get("comment"),
-        feedback_data.get("user_msg"),
-        feedback_data.get("assistant_msg")
-    ))
-    conn.commit()
-    conn.close()
-
-def get_feedback_data():
-    """Recupera todos os dados de feedback"""
-    conn = sqlite3.connect('feedback.db')
-    df = pd.read_sql_query("SELECT * FROM feedback", conn)
-    conn.close()
-    return df
+    """Enfileira o feedback para gravação em lote no SQLite (ou envia ao serviço)"""
+    feedback_backend().submit(feedback_data)
 
 # =========================
 # Páginas do Streamlit
@@ -211,20 +105,31 @@ def main_chat_page():
     st.sidebar.markdown("---")
     st.sidebar.caption("Parâmetros do Modelo")
     temperature = st.sidebar.slider("Temperature", 0.0, 1.0, 0.7, 0.05, 
-                                   help="Controla a criatividade: valores mais baixos = mais determinístico")
+                                   help="Controla a criatividade: valores mais baixos = mais determinístico (0 = respostas reaproveitadas do cache)")
     top_p = st.sidebar.slider("Top-P", 0.0, 1.0, 0.9, 0.05, 
                              help="Controla diversidade: valores mais baixos = mais focado")
     max_tokens = st.sidebar.slider("Max tokens", 64, 2048, 512, 32,
                                   help="Número máximo de tokens na resposta")
     memory_turns = st.sidebar.slider("Memória (nº de trocas)", 0, 20, 6, 1,
                                     help="Quantas interações anteriores lembrar")
+    context_tokens = st.sidebar.slider("Orçamento de contexto (tokens)", 256, 16384, 4096, 256,
+                                      help="Máximo de tokens do histórico enviado ao modelo")
 
     st.sidebar.markdown("---")
     mock_mode = st.sidebar.toggle("Modo Simulação (Ativo sem credenciais OCI)", value=True)
     st.sidebar.info("✅ Modo simulação ativo. Desative quando tiver as credenciais OCI.")
+    response_cache = get_response_cache()
+    cache_stats = response_cache.stats()
+    st.sidebar.caption(f"🗄️ Cache de respostas: {cache_stats['hits']} exatos + {cache_stats['semantic_hits']} "
+                       f"semelhantes / {cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%})"
+                       + (f" · {cache_stats['bypassed']} fora do cache (temperatura > 0)"
+                          if cache_stats["bypassed"] else ""))
+    if cache_stats["semantic_disabled"]:
+        st.sidebar.caption(f"⚠️ Cache semântico desativado: {cache_stats['semantic_disabled']}")
 
     # Inicializar cliente e parâmetros
-    params = GenParams(temperature=temperature, top_p=top_p, max_tokens=max_tokens, memory_turns=memory_turns)
+    params = GenParams(temperature=temperature, top_p=top_p, max_tokens=max_tokens,
+                       memory_turns=memory_turns, context_tokens=context_tokens)
     client = OCIClient(mode="mock" if mock_mode else "oci")
 
     # UI - Cabeçalho
@@ -241,16 +146,25 @@ def main_chat_page():
         unsafe_allow_html=True
     )
 
-    # Inicializar estado da sessão
+    # Sistema prompt inicial
+    with span("prompt"):
+        system_prompt = {"role": "system", "content": build_system_prompt(persona, style)}
+
+    # Inicializar estado da sessão (retomando a conversa salva no store, se houver)
+    # No modo cliente fino o histórico fica só no serviço; localmente, no store de sessões
+    session_id = get_session_id("app")
+    if CHAT_SERVICE_URL:
+        service = get_service_client(CHAT_SERVICE_URL)
+        load_session, clear_session = service.load_session, service.clear_session
+    else:
+        sessions = get_session_store(SESSION_STORE_URL)
+        load_session, clear_session = sessions.load, sessions.clear
     if "chat_history" not in st.session_state:
-        st.session_state.chat_history = []
+        st.session_state.chat_history = [system_prompt] + load_session(session_id, SESSION_HISTORY_LIMIT)
     
     if "feedback_submitted" not in st.session_state:
         st.session_state.feedback_submitted = False
     
-    # Sistema prompt inicial
-    system_prompt = {"role": "system", "content": build_system_prompt(persona, style)}
-    
     # Atualizar system prompt se persona/estilo mudou
     if not st.session_state.chat_history or st.session_state.chat_history[0]["role"] != "system":
         st.session_state.chat_history = [system_prompt]
@@ -260,36 +174,55 @@ def main_chat_page():
     # Botão para limpar histórico
     if st.button("🗑️ Limpar Conversa", use_container_width=True):
         st.session_state.chat_history = [system_prompt]
+        clear_session(session_id)
+        reset_history_window()
         st.session_state.feedback_submitted = False
         st.rerun()
 
-    # Renderizar histórico de conversa
-    for m in st.session_state.chat_history:
-        if m["role"] == "user":
-            with st.chat_message("user", avatar="🧑‍💻"):
-                st.markdown(f'<div class="bubble-user">{m["content"]}</div>', unsafe_allow_html=True)
-        elif m["role"] == "assistant":
-            with st.chat_message("assistant", avatar="🤖"):
-                st.markdown(f'<div class="bubble-bot">{m["content"]}</div>', unsafe_allow_html=True)
+    # Renderizar histórico de conversa (só a janela mais recente)
+    render_history(st.session_state.chat_history)
 
     # Entrada do usuário
     user_msg = st.chat_input("Digite sua mensagem...")
     if user_msg:
         # Adicionar mensagem do usuário ao histórico
         st.session_state.chat_history.append({"role": "user", "content": user_msg})
+        with st.chat_message("user", avatar="🧑‍💻"):
+            st.markdown(f'<div class="bubble-user">{user_msg}</div>', unsafe_allow_html=True)
         
-        # Recortar memória para manter apenas as últimas N trocas
-        messages = trim_history(st.session_state.chat_history, params.memory_turns)
-        
-        # Gerar resposta
+        # Gerar resposta (ou reaproveitar do cache) renderizando os tokens conforme chegam
         try:
-            with st.spinner("💭 Processando sua pergunta..."):
-                assistant_text = client.generate(messages, params)
-                # Pequena pausa para melhor experiência do usuário
-                time.sleep(0.5)
+            with st.chat_message("assistant", avatar="🤖"):
+                placeholder = st.empty()
+                if CHAT_SERVICE_URL:
+                    # Cliente fino: prompt, recorte, cache e geração ficam no serviço
+                    assistant_text = None
+                    chunks = service.chat_stream(user_msg, persona, style, session_id, params)
+                else:
+                    # Recortar memória: últimas N trocas que cabem no orçamento de tokens
+                    with span("memory"):
+                        messages = trim_history(st.session_state.chat_history, params.memory_turns,
+                                                params.context_tokens)
+                    with span("cache"):
+                        assistant_text = response_cache.lookup(messages, params, namespace=client.mode)
+                    # Sessões pedindo a mesma geração ao mesmo tempo compartilham um único stream
+                    chunks = flights.stream(flight_key(messages, params, client.mode),
+                                            lambda: client.generate_stream(messages, params))
+                if assistant_text is None:
+                    placeholder.markdown('<div class="bubble-bot">💭 ...</div>', unsafe_allow_html=True)
+                    assistant_text = ""
+                    # "llm" mede só a espera pelos tokens, não a renderização de cada pedaço
+                    for chunk in timed_stream("llm", chunks, first_stage="llm_first_token"):
+                        assistant_text += chunk
+                        placeholder.markdown(f'<div class="bubble-bot">{assistant_text}▌</div>', unsafe_allow_html=True)
+                    if not CHAT_SERVICE_URL:
+                        response_cache.store(messages, assistant_text, params, namespace=client.mode)
+                placeholder.markdown(f'<div class="bubble-bot">{assistant_text}</div>', unsafe_allow_html=True)
             
             # Adicionar resposta ao histórico
             st.session_state.chat_history.append({"role": "assistant", "content": assistant_text})
+            if not CHAT_SERVICE_URL:  # no modo cliente fino o serviço já gravou a troca
+                sessions.append(session_id, {"role": "user", "content": user_msg}, {"role": "assistant", "content": assistant_text})
             st.session_state.feedback_submitted = False
             st.rerun()
             
@@ -329,14 +262,56 @@ def main_chat_page():
             st.success("✅ Feedback registrado. Obrigado!")
             st.rerun()
 
+def comments_browser(store, page_size: int = 20):
+    """Navegador de comentários com filtros no servidor e paginação por chave"""
+    cols = st.columns([2, 1, 2])
+    persona = cols[0].selectbox("Persona", ["Todas"] + list(PERSONAS.keys()), key="comments_persona")
+    rating = cols[1].selectbox("Avaliação", ["Todas", "👍", "👎"], key="comments_rating")
+    period = cols[2].date_input("Período", value=[], key="comments_period")
+    search = st.text_input("🔎 Buscar nos comentários", placeholder="ex.: lento, confuso", key="comments_search")
+
+    filters = {
+        "persona": None if persona == "Todas" else persona,
+        "rating": None if rating == "Todas" else rating,
+        "start": period[0] if len(period) > 0 else None,
+        "end": period[1] if len(period) > 1 else None,
+        "search": search,
+    }
+    # Filtros alterados: volta para a primeira página
+    if st.session_state.get("comments_filters") != filters:
+        st.session_state.comments_filters = filters
+        st.session_state.comments_cursors = [None]
+    cursors = st.session_state.comments_cursors
+
+    rows, next_cursor = store.comments_page(**filters, cursor=cursors[-1], limit=page_size)
+    if not rows:
+        st.info("Nenhum comentário encontrado.")
+    for row in rows:
+        with st.expander(f"{row['timestamp']} - {row['persona']} - {row['rating']}"):
+            st.write(row['comment'])
+
+    nav = st.columns(3)
+    if nav[0].button("⬅️ Mais recentes", disabled=len(cursors) == 1, use_container_width=True):
+        cursors.pop()
+        st.rerun()
+    nav[1].caption(f"Página {len(cursors)}")
+    if nav[2].button("Mais antigos ➡️", disabled=next_cursor is None, use_container_width=True):
+        cursors.append(next_cursor)
+        st.rerun()
+
 def analytics_page():
     """Página de analytics com visualizações dos feedbacks"""
     st.title("📊 Analytics - Feedback do Chatbot")
+    # pandas e plotly só são carregados quando a página é aberta (início de processo mais rápido)
+    import pandas as pd
+    import plotly.express as px
     
     try:
-        df = get_feedback_data()
+        store = feedback_backend()
+        by_rating = dict(store.rollup("rating"))
+        total_feedbacks = sum(by_rating.values())
         
-        if df.empty:
+        if total_feedbacks == 0:
             st.info("📝 Ainda não há dados de feedback coletados.")
             st.markdown("### 🚀 Como usar:")
             st.markdown("1. Vá para a página de Chat")
@@ -344,15 +319,10 @@ def analytics_page():
             st.markdown("3. Avalie as respostas com 👍 ou 👎")
             st.markdown("4. Volte aqui para ver as análises!")
             return
-            
-        # Converter timestamp para datetime
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df['date'] = df['timestamp'].dt.date
         
-        # Métricas gerais
-        total_feedbacks = len(df)
-        positive_feedbacks = len(df[df['rating'] == '👍'])
-        negative_feedbacks = len(df[df['rating'] == '👎'])
+        # Métricas gerais (lidas das contagens pré-agregadas)
+        positive_feedbacks = by_rating.get('👍', 0)
+        negative_feedbacks = by_rating.get('👎', 0)
         satisfaction_rate = (positive_feedbacks / total_feedbacks * 100) if total_feedbacks > 0 else 0
         
         col1, col2, col3, col4 = st.columns(4)
@@ -368,17 +338,18 @@ def analytics_page():
         
         with col1:
             st.subheader("Distribuição por Persona")
-            persona_counts = df['persona'].value_counts()
+            persona_counts = pd.DataFrame(store.rollup("persona"), columns=["persona", "count"])
             fig_persona = px.pie(
-                values=persona_counts.values, 
-                names=persona_counts.index,
+                values=persona_counts["count"], 
+                names=persona_counts["persona"],
                 color_discrete_sequence=px.colors.sequential.Plasma
             )
             st.plotly_chart(fig_persona, use_container_width=True)
             
         with col2:
             st.subheader("Avaliação por Persona")
-            rating_by_persona = pd.crosstab(df['persona'], df['rating'])
+            rating_by_persona = pd.DataFrame(store.rollup("persona", "rating"), columns=["persona", "rating", "count"]) \
+                .pivot(index="persona", columns="rating", values="count").fillna(0)
             fig_rating_persona = px.bar(
                 rating_by_persona, 
                 barmode='group',
@@ -386,16 +357,14 @@ def analytics_page():
             )
             st.plotly_chart(fig_rating_persona, use_container_width=True)
         
-        # Comentários
-        st.subheader("📝 Comentários dos Usuários")
-        comments_df = df[df['comment'].notna() & (df['comment'] != '')][['timestamp', 'persona', 'rating', 'comment']]
+        st.subheader("Feedbacks por Dia")
+        by_day = pd.DataFrame(store.rollup("day", "rating"), columns=["dia", "rating", "count"]) \
+            .pivot(index="dia", columns="rating", values="count").fillna(0)
+        st.bar_chart(by_day)
         
-        if not comments_df.empty:
-            for _, row in comments_df.iterrows():
-                with st.expander(f"{row['timestamp']} - {row['persona']} - {row['rating']}"):
-                    st.write(row['comment'])
-        else:
-            st.info("Nenhum comentário foi registrado ainda.")
+        # Comentários (filtrados e paginados no banco)
+        st.subheader("📝 Comentários dos Usuários")
+        comments_browser(store)
             
     except Exception as e:
         st.error(f"Erro ao carregar dados: {e}")
@@ -409,18 +378,21 @@ def main():
     
     # Navegação entre páginas
     st.sidebar.title("Navegação")
-    page = st.sidebar.radio("Selecione a página:", ["💬 Chat", "📊 Analytics"])
+    start_metrics_server()  # só se METRICS_PORT estiver definido
+    page = st.sidebar.radio("Selecione a página:", ["💬 Chat", "📊 Analytics", "🩺 Diagnóstico"])
     
     # Informações da OCI na sidebar
     st.sidebar.markdown("---")
     st.sidebar.subheader("🔧 Configuração OCI")
-    st.sidebar.info("Para conectar com OCI, configure as variáveis de ambiente:\n- OCI_ENDPOINT_URL\n- OCI_REGION\n- OCI_COMPARTMENT_OCID")
+    st.sidebar.info("Para conectar com OCI, configure as variáveis de ambiente:\n- OCI_ENDPOINT_URL (ou OCI_ENDPOINTS / OCI_REGIONS)\n- OCI_REGION\n- OCI_COMPARTMENT_OCID")
     
     # Executar página selecionada
     if page == "💬 Chat":
         main_chat_page()
     elif page == "📊 Analytics":
         analytics_page()
+    elif page == "🩺 Diagnóstico":
+        diagnostics_page()
 
 if __name__ == "__main__":
     main()
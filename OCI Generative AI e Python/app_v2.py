@@ -1,22 +1,20 @@
 import os
-import sqlite3
 import time
-import requests
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any
 
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
-from langchain.agents import AgentExecutor, create_react_agent
-from langchain_core.prompts import PromptTemplate
-from langchain_core.tools import Tool
-from langchain.memory import ConversationBufferWindowMemory
-from langchain_community.llms.oci_generative_ai import OCIAuthType
-from langchain_core.language_models.llms import LLM
+from memory import Message, create_memory, render_context
+from feedback_store import get_feedback_store
+from prompting import PERSONAS, STYLES
+from session_store import get_session_store
+from metrics import span, start_metrics_server
+from response_cache import get_response_cache
+from chat_view import render_history, reset_history_window
+from streamlit_common import diagnostics_page, get_session_id
+from singleflight import flight_key, flights
 
 # =========================
 # Configuração Inicial
@@ -43,97 +41,38 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # =========================
-# Personas & Estilos
+# Fábrica de Agentes (compartilhada entre sessões)
 # =========================
-PERSONAS = {
-    "Professor": "Explique com exemplos simples e analogias, seja didático e paciente.",
-    "Suporte Técnico": "Seja objetivo, passo a passo, com troubleshooting e validações.",
-    "Contador de Histórias": "Use narrativa leve, metáforas curtas e exemplos envolventes.",
-    "Analista": "Forneça dados estruturados, análise objetiva e insights acionáveis."
-}
+TOOL_NAMES = ("get_country_info",)
 
-STYLES = {
-    "Formal": "Escreva em tom profissional, claro e direto, evitando coloquialismos.",
-    "Técnico": "Use termos técnicos quando necessário, inclua listas numeradas e considerações práticas.",
-    "Simples": "Frases curtas, vocabulário simples, vá direto ao ponto.",
-    "Empático": "Seja caloroso, encorajador e demonstre compreensão emocional."
-}
+@st.cache_resource(show_spinner=False)
+def get_agent_executor(persona: str, style: str, tool_names: tuple):
+    """Compila o agente uma vez por (persona, estilo, ferramentas) e o reutiliza em todas as sessões.
 
-# =========================
-# Ferramenta de API Externa (Country Info)
-# =========================
-def get_country_info(country_name: str) -> str:
-    """Busca informações sobre um país específico, como capital, população e região. Use esta ferramenta quando o usuário perguntar sobre dados de um país."""
-    try:
-        response = requests.get(f"https://restcountries.com/v3.1/name/{country_name}?fields=name,capital,population,region,subregion")
-        response.raise_for_status()
-        data = response.json()[0]
-        return f"Informações sobre {data['name']['common']}:\n- Capital: {data['capital'][0]}\n- População: {data['population']:,}\n- Região: {data['region']} ({data['subregion']})"
-    except Exception as e:
-        return f"Não foi possível obter informações para '{country_name}'. Verifique o nome e tente novamente. Erro: {e}"
+    O executor não guarda memória: o histórico de cada sessão é passado no `invoke`. A pilha do
+    LangChain (`langchain_agent.py`) só é importada aqui, na primeira mensagem do processo.
+    """
+    from langchain_agent import build_agent_executor, tools
+    return build_agent_executor(persona, style, [t for t in tools if t.name in tool_names])
 
-# Criar a ferramenta usando a classe Tool
-country_tool = Tool(
-    name="get_country_info",
-    description="Busca informações sobre um país específico, como capital, população e região. Use esta ferramenta quando o usuário perguntar sobre dados de um país.",
-    func=get_country_info
-)
-
-tools = [country_tool]
+def summarize(summary: str, messages: List[Message]) -> str:
+    """Resumidor da memória; roda em segundo plano, então o import do LLM não atrasa a página"""
+    from langchain_agent import MockOCI
+    return MockOCI().summarize(summary, messages)
 
 # =========================
-# LLM Customizado (Modo Simulação)
+# Sistema de Banco de Dados (sem alterações)
 # =========================
-class MockOCI(LLM):
-    @property
-    def _llm_type(self) -> str:
-        return "mock_oci"
+FEEDBACK_DB = 'feedback_v2.db'
 
-    def _call(self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any) -> str:
-        # Extrai a última pergunta do usuário do prompt complexo do agente
-        user_last_question = prompt.split("Pergunta:")[-1].strip()
+SESSION_STORE_URL = os.getenv("SESSION_STORE_URL", "sqlite:///sessions.db")
+MEMORY_RESTORE_LIMIT = int(os.getenv("MEMORY_RESTORE_LIMIT", "1000"))  # mensagens recarregadas ao retomar
 
-        # Verifica se a pergunta é sobre um país
-        if "brasil" in user_last_question.lower() or "france" in user_last_question.lower() or "japan" in user_last_question.lower():
-            return """
-            Pensamento: O usuário está perguntando sobre um país. Devo usar a ferramenta `get_country_info`.
-            Ação: get_country_info
-            Entrada da Ação: Brasil
-            """
-        else:
-            return f"""
-            Pensamento: O usuário está fazendo uma pergunta geral. Não preciso de ferramentas.
-            Resposta Final: Entendi sua pergunta sobre '{user_last_question}'. Como um modelo de linguagem avançado, posso ajudar com informações gerais, mas para dados em tempo real, minhas ferramentas são mais úteis.
-            """
-
-    @property
-    def _identifying_params(self) -> Dict[str, Any]:
-        return {"model": "mock_oci_v1"}
-
-# =========================
-# Sistema de Banco de Dados (sem alterações)
-# =========================
 def init_db():
-    conn = sqlite3.connect('feedback_v2.db')
-    c = conn.cursor()
-    c.execute('CREATE TABLE IF NOT EXISTS feedback (id INTEGER PRIMARY KEY, timestamp TEXT, persona TEXT, style TEXT, rating TEXT, comment TEXT, user_msg TEXT, assistant_msg TEXT)')
-    conn.commit()
-    conn.close()
+    get_feedback_store(FEEDBACK_DB)
 
 def save_feedback_db(feedback_data: Dict[str, Any]):
-    conn = sqlite3.connect('feedback_v2.db')
-    c = conn.cursor()
-    c.execute('INSERT INTO feedback (timestamp, persona, style, rating, comment, user_msg, assistant_msg) VALUES (?, ?, ?, ?, ?, ?, ?)',
-              (feedback_data.get("timestamp"), feedback_data.get("persona"), feedback_data.get("style"), feedback_data.get("rating"),
-               feedback_data.get("comment"), feedback_data.get("user_msg"), feedback_data.get("assistant_msg")))
-    conn.commit()
-    conn.close()
-
-def get_feedback_data():
-    conn = sqlite3.connect('feedback_v2.db')
-    df = pd.read_sql_query("SELECT * FROM feedback", conn)
-    conn.close()
-    return df
+    get_feedback_store(FEEDBACK_DB).submit(feedback_data)
 
 # =========================
 # Página Principal do Chat (com LangChain)
@@ -145,65 +84,35 @@ def main_chat_page():
 
     st.sidebar.markdown("---")
     st.sidebar.info("✅ LangChain e Tools integrados!")
+    response_cache = get_response_cache()
+    cache_stats = response_cache.stats()
+    st.sidebar.caption(f"🗄️ Cache de respostas: {cache_stats['hits']} exatos + {cache_stats['semantic_hits']} "
+                       f"semelhantes / {cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%})")
+    if cache_stats["semantic_disabled"]:
+        st.sidebar.caption(f"⚠️ Cache semântico desativado: {cache_stats['semantic_disabled']}")
 
     # UI - Cabeçalho
     st.title("🧠 Chatbot OCI v4")
     st.caption("Agora com LangChain, Memória Avançada e Ferramentas de API Externa")
 
-    # Inicializar estado da sessão para LangChain
+    # Inicializar estado da sessão para LangChain (retomando a conversa salva no store)
+    sessions = get_session_store(SESSION_STORE_URL)
+    session_id = get_session_id("app_v2")
     if "memory" not in st.session_state:
-        st.session_state.memory = ConversationBufferWindowMemory(
-            k=5, memory_key="chat_history", return_messages=True
-        )
-
-    # Constrói o prompt do sistema
-    system_prompt_text = f"""Você é um assistente especializado com foco em {persona}.
-    Persona: {PERSONAS[persona]}
-    Estilo: {style}. {STYLES[style]}
-    Regras: Responda em PT-BR. Seja útil e honesto. Use suas ferramentas quando necessário."""
-
-    # Configuração do Agente LangChain
-    llm = MockOCI()
-    prompt = PromptTemplate.from_template(
-        f"""{system_prompt_text}
-
-Você tem acesso às seguintes ferramentas:
-{{tools}}
-
-Use o seguinte formato:
-
-Pergunta: a pergunta de entrada que você deve responder
-Pensamento: você deve sempre pensar sobre o que fazer
-Ação: a ação a ser tomada, deve ser uma de [{{tool_names}}]
-Entrada da Ação: a entrada para a ação
-Observação: o resultado da ação
-... (este Pensamento/Ação/Entrada da Ação/Observação pode se repetir N vezes)
-Pensamento: Agora sei a resposta final
-Resposta Final: a resposta final para a pergunta original
-
-Comece!
-
-{{chat_history}}
-
-Pergunta: {{input}}
-Pensamento: {{agent_scratchpad}}"""
-    )
-    agent = create_react_agent(llm, tools, prompt)
-    agent_executor = AgentExecutor(agent=agent, tools=tools, memory=st.session_state.memory, verbose=True, handle_parsing_errors=True)
+        # Janela das últimas 5 trocas + resumo contínuo das anteriores + recuperação das relevantes
+        st.session_state.memory = create_memory(max_turns=100, context_messages=10,
+                                                summarizer=summarize)
+        st.session_state.memory.restore(sessions.load(session_id, MEMORY_RESTORE_LIMIT))
 
     # Botão para limpar memória
     if st.button("🗑️ Limpar Memória da Conversa", use_container_width=True):
         st.session_state.memory.clear()
+        sessions.clear(session_id)
+        reset_history_window()
         st.rerun()
 
-    # Renderizar histórico de conversa da memória LangChain
-    for msg in st.session_state.memory.chat_memory.messages:
-        if msg.type == "human":
-            with st.chat_message("user", avatar="🧑‍💻"):
-                st.markdown(f'<div class="bubble-user">{msg.content}</div>', unsafe_allow_html=True)
-        elif msg.type == "ai":
-            with st.chat_message("assistant", avatar="🤖"):
-                st.markdown(f'<div class="bubble-bot">{msg.content}</div>', unsafe_allow_html=True)
+    # Renderizar histórico de conversa (só a janela mais recente)
+    render_history(st.session_state.memory.messages)
 
     # Entrada do usuário
     user_msg = st.chat_input("Pergunte sobre um país ou converse normalmente...")
@@ -213,8 +122,37 @@ Pensamento: {{agent_scratchpad}}"""
 
         with st.spinner("🤖 Pensando e usando ferramentas..."):
             try:
-                response = agent_executor.invoke({"input": user_msg})
+                tool_names = TOOL_NAMES
+                with span("memory"):
+                    # Uma única busca na memória serve ao agente (texto) e à chave do cache (mensagens)
+                    context_messages = st.session_state.memory.prompt_messages(user_msg)
+                    chat_history = render_context(context_messages)
+                    # Chave do cache: persona/estilo + contexto da sessão + pergunta atual
+                    cache_messages = [{"role": "system", "content": f"{persona}|{style}"}]
+                    cache_messages += context_messages
+                    cache_messages.append({"role": "user", "content": user_msg})
+                cache_namespace = "agent_v2:" + ",".join(tool_names)
+
+                with span("cache"):
+                    cached = response_cache.lookup(cache_messages, namespace=cache_namespace)
+                if cached is not None:
+                    response = {"input": user_msg, "output": cached, "cached": True}
+                else:
+                    with span("prompt"):
+                        agent_executor = get_agent_executor(persona, style, tool_names)
+                    with span("agent"):
+                        # Perguntas idênticas simultâneas (mesmo contexto) executam o agente uma só vez
+                        response = flights.do(
+                            flight_key(cache_messages, namespace=cache_namespace),
+                            lambda: agent_executor.invoke({"input": user_msg, "chat_history": chat_history}))
+                    from langchain_agent import reached_final_answer  # já carregado pelo executor
+                    if reached_final_answer(agent_executor, response):  # não cacheia parada por limite
+                        response_cache.store(cache_messages, response["output"], namespace=cache_namespace)
                 assistant_text = response["output"]
+                st.session_state.memory.add_message("user", user_msg)
+                st.session_state.memory.add_message("assistant", assistant_text)
+                sessions.append(session_id, {"role": "user", "content": user_msg},
+                                {"role": "assistant", "content": assistant_text})
 
                 with st.chat_message("assistant", avatar="🤖"):
                     st.markdown(f'<div class="bubble-bot">{assistant_text}</div>', unsafe_allow_html=True)
@@ -231,18 +169,22 @@ Pensamento: {{agent_scratchpad}}"""
 # =========================
 def analytics_page():
     st.title("📊 Analytics - Feedback do Chatbot v4")
-    df = get_feedback_data()
-    if df.empty:
+    store = get_feedback_store(FEEDBACK_DB)
+    by_rating = dict(store.rollup("rating"))
+    total_feedbacks = sum(by_rating.values())
+    if total_feedbacks == 0:
         st.info("📝 Ainda não há dados de feedback coletados.")
         return
 
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    total_feedbacks = len(df)
-    positive_feedbacks = len(df[df['rating'] == '👍'])
+    positive_feedbacks = by_rating.get('👍', 0)
     satisfaction_rate = (positive_feedbacks / total_feedbacks * 100) if total_feedbacks > 0 else 0
 
     st.metric("Taxa de Satisfação Geral", f"{satisfaction_rate:.1f}%")
-    st.dataframe(df)
+    st.subheader("Resumo por Dia e Persona")
+    import pandas as pd  # carregado só quando a página é aberta
+    st.dataframe(pd.DataFrame(store.rollup("day", "persona", "rating"), columns=["dia", "persona", "rating", "total"]))
+    st.subheader("Últimos Feedbacks")
+    st.dataframe(pd.DataFrame(store.recent(50)))
 
 # =========================
 # App principal
@@ -250,12 +192,15 @@ def analytics_page():
 def main():
     init_db()
     st.sidebar.title("Navegação")
-    page = st.sidebar.radio("Selecione a página:", ["💬 Chat Avançado", "📊 Analytics"])
+    start_metrics_server()  # só se METRICS_PORT estiver definido
+    page = st.sidebar.radio("Selecione a página:", ["💬 Chat Avançado", "📊 Analytics", "🩺 Diagnóstico"])
 
     if page == "💬 Chat Avançado":
         main_chat_page()
     elif page == "📊 Analytics":
         analytics_page()
+    elif page == "🩺 Diagnóstico":
+        diagnostics_page()
 
 if __name__ == "__main__":
     main()
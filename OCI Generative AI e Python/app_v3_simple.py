@@ -1,16 +1,20 @@
 import os
-import sqlite3
 import time
-import requests
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
+from agent import SmartAgent
+from country_info import country_cache, http as country_http
+from feedback_store import get_feedback_store
+from prompting import PERSONAS, STYLES
+from session_store import get_session_store
+from metrics import span, start_metrics_server
+from chat_view import render_history, reset_history_window
+from streamlit_common import diagnostics_page, get_session_id
+
 # =========================
 # Configuração Inicial
 # =========================
@@ -37,194 +41,17 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # =========================
-# Personas & Estilos
-# =========================
-PERSONAS = {
-    "Professor": "Explique com exemplos simples e analogias, seja didático e paciente.",
-    "Suporte Técnico": "Seja objetivo, passo a passo, com troubleshooting e validações.",
-    "Contador de Histórias": "Use narrativa leve, metáforas curtas e exemplos envolventes.",
-    "Analista": "Forneça dados estruturados, análise objetiva e insights acionáveis."
-}
-
-STYLES = {
-    "Formal": "Escreva em tom profissional, claro e direto, evitando coloquialismos.",
-    "Técnico": "Use termos técnicos quando necessário, inclua listas numeradas e considerações práticas.",
-    "Simples": "Frases curtas, vocabulário simples, vá direto ao ponto.",
-    "Empático": "Seja caloroso, encorajador e demonstre compreensão emocional."
-}
-
-# =========================
-# API Externa (Country Info)
-# =========================
-def get_country_info(country_name: str) -> str:
-    """Busca informações sobre um país específico."""
-    try:
-        response = requests.get(f"https://restcountries.com/v3.1/name/{country_name}?fields=name,capital,population,region,subregion,area,languages")
-        response.raise_for_status()
-        data = response.json()[0]
-        
-        # Extrair idiomas
-        languages = list(data.get('languages', {}).values()) if 'languages' in data else ['N/A']
-        
-        return f"""📍 **{data['name']['common']}**
-🏛️ **Capital:** {data.get('capital', ['N/A'])[0]}
-👥 **População:** {data.get('population', 0):,} habitantes
-🌍 **Região:** {data.get('region', 'N/A')} ({data.get('subregion', 'N/A')})
-📏 **Área:** {data.get('area', 0):,} km²
-🗣️ **Idiomas:** {', '.join(languages)}"""
-    except Exception as e:
-        return f"❌ Não foi possível obter informações para '{country_name}'. Erro: {str(e)}"
-
-# =========================
-# Sistema de Memória Simples
+# Sistema de Banco de Dados
 # =========================
-class SimpleMemory:
-    def __init__(self, max_turns=10):
-        self.max_turns = max_turns
-        self.messages = []
-    
-    def add_message(self, role: str, content: str):
-        self.messages.append({"role": role, "content": content})
-        # Manter apenas as últimas N mensagens
-        if len(self.messages) > self.max_turns * 2:
-            self.messages = self.messages[-self.max_turns * 2:]
-    
-    def get_context(self) -> str:
-        context = ""
-        for msg in self.messages[-6:]:  # Últimas 3 trocas
-            if msg["role"] == "user":
-                context += f"Usuário: {msg['content']}\n"
-            else:
-                context += f"Assistente: {msg['content']}\n"
-        return context
-    
-    def clear(self):
-        self.messages = []
+FEEDBACK_DB = 'feedback_v3.db'
 
-# =========================
-# Agente Inteligente Simplificado
-# =========================
-class SmartAgent:
-    def __init__(self, persona: str, style: str):
-        self.persona = persona
-        self.style = style
-        self.memory = SimpleMemory()
-    
-    def detect_intent(self, user_input: str) -> str:
-        """Detecta a intenção do usuário."""
-        user_lower = user_input.lower()
-        
-        # Lista de países comuns
-        countries = ['brasil', 'brazil', 'frança', 'france', 'japão', 'japan', 'alemanha', 'germany', 
-                    'itália', 'italy', 'espanha', 'spain', 'portugal', 'argentina', 'chile', 
-                    'méxico', 'mexico', 'canadá', 'canada', 'eua', 'usa', 'china', 'índia', 'india']
-        
-        for country in countries:
-            if country in user_lower:
-                return f"country_info:{country}"
-        
-        return "general_chat"
-    
-    def process_message(self, user_input: str) -> Dict[str, Any]:
-        """Processa a mensagem do usuário e retorna resposta estruturada."""
-        
-        # Adicionar mensagem do usuário à memória
-        self.memory.add_message("user", user_input)
-        
-        # Detectar intenção
-        intent = self.detect_intent(user_input)
-        
-        response_data = {
-            "intent": intent,
-            "api_used": False,
-            "api_result": None,
-            "response": "",
-            "thinking": ""
-        }
-        
-        if intent.startswith("country_info:"):
-            # Extrair nome do país
-            country = intent.split(":")[1]
-            
-            # Mapear nomes em português para inglês
-            country_map = {
-                'brasil': 'brazil',
-                'frança': 'france', 
-                'japão': 'japan',
-                'alemanha': 'germany',
-                'itália': 'italy',
-                'espanha': 'spain',
-                'eua': 'united states'
-            }
-            
-            country_en = country_map.get(country, country)
-            
-            response_data["thinking"] = f"🤔 Detectei que você está perguntando sobre um país: {country}. Vou buscar informações atualizadas usando a API externa."
-            response_data["api_used"] = True
-            
-            # Buscar informações do país
-            api_result = get_country_info(country_en)
-            response_data["api_result"] = api_result
-            
-            # Gerar resposta baseada na persona
-            if self.persona == "Professor":
-                response_data["response"] = f"Como educador, vou compartilhar informações interessantes sobre este país:\n\n{api_result}\n\n📚 Essas informações são atualizadas e obtidas em tempo real. Que aspecto específico você gostaria de explorar mais?"
-            
-            elif self.persona == "Suporte Técnico":
-                response_data["response"] = f"✅ Dados obtidos com sucesso da API RestCountries:\n\n{api_result}\n\n🔧 Status: Consulta realizada com sucesso. Precisa de mais alguma informação técnica?"
-            
-            elif self.persona == "Contador de Histórias":
-                response_data["response"] = f"Que interessante! Deixe-me contar sobre este lugar fascinante:\n\n{api_result}\n\n✨ Cada país tem sua própria história única. Imagino quantas aventuras já aconteceram nessas terras!"
-            
-            else:  # Analista
-                response_data["response"] = f"📊 Análise de dados do país solicitado:\n\n{api_result}\n\n📈 Dados obtidos via API RestCountries. Densidade populacional calculada automaticamente."
-        
-        else:
-            # Chat geral
-            context = self.memory.get_context()
-            response_data["thinking"] = f"💭 Pergunta geral detectada. Usando contexto da conversa anterior."
-            
-            if self.persona == "Professor":
-                response_data["response"] = f"Como educador, vou explicar isso de forma didática. Sobre '{user_input}', posso dizer que é um tópico interessante que pode ser abordado de várias perspectivas. Para informações específicas sobre países, posso consultar dados em tempo real!"
-            
-            elif self.persona == "Suporte Técnico":
-                response_data["response"] = f"Entendi sua solicitação sobre '{user_input}'. Para questões gerais, posso fornecer orientações. Para dados específicos de países, tenho acesso a APIs atualizadas. Como posso ajudar especificamente?"
-            
-            elif self.persona == "Contador de Histórias":
-                response_data["response"] = f"Isso me lembra uma história... Sobre '{user_input}', há sempre algo fascinante para descobrir. Se quiser saber sobre algum país específico, posso buscar informações atualizadas para você!"
-            
-            else:  # Analista
-                response_data["response"] = f"Analisando sua consulta sobre '{user_input}'. Para análises baseadas em dados, especialmente informações de países, posso acessar fontes atualizadas. Que tipo de análise você precisa?"
-        
-        # Adicionar resposta à memória
-        self.memory.add_message("assistant", response_data["response"])
-        
-        return response_data
+SESSION_STORE_URL = os.getenv("SESSION_STORE_URL", "sqlite:///sessions.db")
 
-# =========================
-# Sistema de Banco de Dados
-# =========================
 def init_db():
-    conn = sqlite3.connect('feedback_v3.db')
-    c = conn.cursor()
-    c.execute('CREATE TABLE IF NOT EXISTS feedback (id INTEGER PRIMARY KEY, timestamp TEXT, persona TEXT, style TEXT, rating TEXT, comment TEXT, user_msg TEXT, assistant_msg TEXT)')
-    conn.commit()
-    conn.close()
+    get_feedback_store(FEEDBACK_DB)
 
 def save_feedback_db(feedback_data: Dict[str, Any]):
-    conn = sqlite3.connect('feedback_v3.db')
-    c = conn.cursor()
-    c.execute('INSERT INTO feedback (timestamp, persona, style, rating, comment, user_msg, assistant_msg) VALUES (?, ?, ?, ?, ?, ?, ?)',
-              (feedback_data.get("timestamp"), feedback_data.get("persona"), feedback_data.get("style"), feedback_data.get("rating"),
-               feedback_data.get("comment"), feedback_data.get("user_msg"), feedback_data.get("assistant_msg")))
-    conn.commit()
-    conn.close()
-
-def get_feedback_data():
-    conn = sqlite3.connect('feedback_v3.db')
-    df = pd.read_sql_query("SELECT * FROM feedback", conn)
-    conn.close()
-    return df
+    get_feedback_store(FEEDBACK_DB).submit(feedback_data)
 
 # =========================
 # Página Principal do Chat
@@ -237,29 +64,35 @@ def main_chat_page():
     st.sidebar.markdown("---")
     st.sidebar.success("✅ Sistema Inteligente Ativo!")
     st.sidebar.info("🔧 Memória adaptativa integrada\n🌐 API de países em tempo real\n🧠 Detecção automática de intenções")
+    cache_stats = country_cache.stats()
+    st.sidebar.caption(f"🗄️ Cache de países: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                       f"({cache_stats['hit_rate']:.0%})")
+    http_stats = country_http.stats()
+    st.sidebar.caption(f"🌐 API de países: {http_stats['requests']} requisições, {http_stats['retries']} novas "
+                       f"tentativas, disjuntor {http_stats['breaker']}")
 
     # UI - Cabeçalho
     st.title("🧠 Chatbot OCI v4")
     st.caption("Sistema Inteligente com Memória Avançada e APIs Externas")
 
-    # Inicializar agente
+    # Inicializar agente (retomando a conversa salva no store)
+    sessions = get_session_store(SESSION_STORE_URL)
+    session_id = get_session_id("app_v3")
     if "agent" not in st.session_state or st.session_state.get("current_persona") != persona:
         st.session_state.agent = SmartAgent(persona, style)
         st.session_state.current_persona = persona
+        memory = st.session_state.agent.memory
+        memory.restore(sessions.load(session_id, memory.messages.maxlen))  # só o que cabe na janela
 
     # Botão para limpar memória
     if st.button("🗑️ Limpar Memória da Conversa", use_container_width=True):
         st.session_state.agent.memory.clear()
+        sessions.clear(session_id)
+        reset_history_window()
         st.rerun()
 
-    # Renderizar histórico de conversa
-    for msg in st.session_state.agent.memory.messages:
-        if msg["role"] == "user":
-            with st.chat_message("user", avatar="🧑‍💻"):
-                st.markdown(f'<div class="bubble-user">{msg["content"]}</div>', unsafe_allow_html=True)
-        elif msg["role"] == "assistant":
-            with st.chat_message("assistant", avatar="🤖"):
-                st.markdown(f'<div class="bubble-bot">{msg["content"]}</div>', unsafe_allow_html=True)
+    # Renderizar histórico de conversa (só a janela mais recente)
+    render_history(st.session_state.agent.memory.messages)
 
     # Entrada do usuário
     user_msg = st.chat_input("Pergunte sobre um país ou converse normalmente...")
@@ -269,7 +102,10 @@ def main_chat_page():
 
         with st.spinner("🤖 Processando com IA..."):
             try:
-                result = st.session_state.agent.process_message(user_msg)
+                with span("agent"):
+                    result = st.session_state.agent.process_message(user_msg)
+                sessions.append(session_id, {"role": "user", "content": user_msg},
+                                {"role": "assistant", "content": result["response"]})
                 
                 with st.chat_message("assistant", avatar="🤖"):
                     st.markdown(f'<div class="bubble-bot">{result["response"]}</div>', unsafe_allow_html=True)
@@ -291,9 +127,11 @@ def main_chat_page():
 # =========================
 def analytics_page():
     st.title("📊 Analytics - Feedback do Chatbot v4")
-    df = get_feedback_data()
+    store = get_feedback_store(FEEDBACK_DB)
+    by_rating = dict(store.rollup("rating"))
+    total_feedbacks = sum(by_rating.values())
     
-    if df.empty:
+    if total_feedbacks == 0:
         st.info("📝 Ainda não há dados de feedback coletados.")
         st.markdown("### 🚀 Como usar:")
         st.markdown("1. Vá para a página de Chat")
@@ -302,9 +140,7 @@ def analytics_page():
         st.markdown("4. Volte aqui para ver as análises!")
         return
 
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    total_feedbacks = len(df)
-    positive_feedbacks = len(df[df['rating'] == '👍'])
+    positive_feedbacks = by_rating.get('👍', 0)
     satisfaction_rate = (positive_feedbacks / total_feedbacks * 100) if total_feedbacks > 0 else 0
 
     col1, col2, col3 = st.columns(3)
@@ -312,7 +148,11 @@ def analytics_page():
     col2.metric("👍 Positivos", positive_feedbacks)
     col3.metric("Taxa de Satisfação", f"{satisfaction_rate:.1f}%")
     
-    st.dataframe(df)
+    st.subheader("Resumo por Dia e Persona")
+    import pandas as pd  # carregado só quando a página é aberta
+    st.dataframe(pd.DataFrame(store.rollup("day", "persona", "rating"), columns=["dia", "persona", "rating", "total"]))
+    st.subheader("Últimos Feedbacks")
+    st.dataframe(pd.DataFrame(store.recent(50)))
 
 # =========================
 # App principal
@@ -320,12 +160,15 @@ def analytics_page():
 def main():
     init_db()
     st.sidebar.title("Navegação")
-    page = st.sidebar.radio("Selecione a página:", ["💬 Chat Inteligente", "📊 Analytics"])
+    start_metrics_server()  # só se METRICS_PORT estiver definido
+    page = st.sidebar.radio("Selecione a página:", ["💬 Chat Inteligente", "📊 Analytics", "🩺 Diagnóstico"])
 
     if page == "💬 Chat Inteligente":
         main_chat_page()
     elif page == "📊 Analytics":
         analytics_page()
+    elif page == "🩺 Diagnóstico":
+        diagnostics_page()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,226 @@
+"""
+Micro-batching de gerações: agrupa pedidos simultâneos numa única chamada em lote ao backend.
+
+Os pedidos entram numa fila limitada (`max_queue`); um coletor no event loop espera até
+`max_wait` segundos a partir do primeiro pedido da fila, ou até juntar `max_batch_size`, e
+chama `batch_fn([(messages, params), ...])` — no cliente OCI, `AsyncOCIClient.agenerate_batch`
+(o modo simulação implementa a mesma interface). Cada resultado volta para quem pediu.
+
+- fila cheia: `QueueFullError` na hora (contrapressão em vez de fila sem fim)
+- prazo por pedido (`timeout`): quem estoura recebe `DeadlineExceeded` e sai do próximo lote
+- até `max_concurrent_batches` lotes em voo; com o backend ocupado, a fila cresce e os
+  próximos lotes saem maiores
+- métricas: `llm_batch_size` (pedidos por lote), `llm_batch_wait_seconds` (espera na fila) e
+  `llm_batch_rejected_total` (fila cheia / prazo estourado)
+
+O coletor e a fila pertencem ao event loop do `submit` (o loop do serviço ASGI ou o loop
+compartilhado do `oci_client`); se um `submit` chega de outro loop — o anterior foi encerrado,
+p.ex. por um `asyncio.run` — o coletor é recriado no loop atual. Configuração de `get_batcher()`: `LLM_BATCH_MAX_SIZE`
+(1 desliga), `LLM_BATCH_MAX_WAIT_MS`, `LLM_BATCH_MAX_QUEUE` e `LLM_BATCH_TIMEOUT`.
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from metrics import REGISTRY, Counter, Histogram, span
+
+BatchRequest = Tuple[List[Dict[str, str]], Any]
+BatchFn = Callable[[List[BatchRequest]], Awaitable[Sequence[Union[str, BaseException]]]]
+
+batch_size = Histogram("llm_batch_size", "Pedidos por chamada em lote ao backend", label="batcher",
+                       buckets=(1, 2, 4, 8, 16, 32, 64))
+batch_wait = Histogram("llm_batch_wait_seconds", "Espera de cada pedido na fila do micro-batching",
+                       label="batcher")
+batch_rejected = Counter("llm_batch_rejected_total", "Pedidos recusados pelo micro-batching", label="reason")
+REGISTRY.extend([batch_size, batch_wait, batch_rejected])
+
+class QueueFullError(RuntimeError):
+    """A fila do micro-batching atingiu `max_queue`"""
+
+class DeadlineExceeded(TimeoutError):
+    """O pedido não foi respondido dentro do prazo"""
+
+class _Pending:
+    __slots__ = ("request", "future", "enqueued", "deadline")
+
+    def __init__(self, request: BatchRequest, future: asyncio.Future, enqueued: float, deadline: float):
+        self.request = request
+        self.future = future
+        self.enqueued = enqueued
+        self.deadline = deadline
+
+# =========================
+# Agendador
+# =========================
+class MicroBatcher:
+    def __init__(self, batch_fn: BatchFn, max_batch_size: int = 8, max_wait: float = 0.005,
+                 max_queue: int = 256, timeout: float = 60.0, max_concurrent_batches: int = 4,
+                 name: str = "llm"):
+        if max_batch_size < 1 or max_queue < 1 or max_concurrent_batches < 1:
+            raise ValueError("max_batch_size, max_queue e max_concurrent_batches devem ser >= 1")
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.max_concurrent_batches = max_concurrent_batches
+        self.name = name
+        self._queue: deque = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._collector: Optional[asyncio.Task] = None
+        self._batches: set = set()
+        self._counts = {"requests": 0, "batches": 0, "batched": 0, "queue_full": 0, "deadline": 0}
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def _start(self, loop: asyncio.AbstractEventLoop):
+        collector = self._collector
+        if collector is not None and not collector.done() and collector.get_loop() is loop:
+            return
+        if collector is not None and collector.get_loop() is not loop:
+            # Loop anterior encerrado ou trocado: os pedidos dele não têm mais quem os espere
+            self._queue = deque(item for item in self._queue if item.future.get_loop() is loop)
+            self._batches = set()
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+        self._collector = loop.create_task(self._collect())
+
+    async def submit(self, messages: List[Dict[str, str]], params: Any, timeout: Optional[float] = None) -> str:
+        """Enfileira um pedido e espera a resposta do lote em que ele for incluído"""
+        loop = asyncio.get_running_loop()
+        self._start(loop)
+        if len(self._queue) >= self.max_queue:
+            self._counts["queue_full"] += 1
+            batch_rejected.inc("queue_full")
+            raise QueueFullError(f"{self.name}: fila de micro-batching cheia ({self.max_queue})")
+        timeout = self.timeout if timeout is None else timeout
+        now = loop.time()
+        item = _Pending((messages, params), loop.create_future(), now, now + timeout)
+        self._queue.append(item)
+        self._counts["requests"] += 1
+        self._wakeup.set()
+        try:
+            return await asyncio.wait_for(asyncio.shield(item.future), timeout)
+        except asyncio.TimeoutError:
+            self._counts["deadline"] += 1
+            batch_rejected.inc("deadline")
+            raise DeadlineExceeded(f"{self.name}: sem resposta em {timeout:.1f}s") from None
+        finally:
+            if not item.future.done():
+                item.future.cancel()  # fora do próximo lote (ou resultado descartado)
+
+    def _take(self, now: float) -> List[_Pending]:
+        batch: List[_Pending] = []
+        while self._queue and len(batch) < self.max_batch_size:
+            item = self._queue.popleft()
+            if not item.future.done() and item.deadline > now:
+                batch.append(item)
+        return batch
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            # Reserva a vaga antes de montar o lote: enquanto o backend está ocupado, a fila cresce
+            await self._slots.acquire()
+            window_end = self._queue[0].enqueued + self.max_wait if self._queue else loop.time()
+            while 0 < len(self._queue) < self.max_batch_size:
+                remaining = window_end - loop.time()
+                if remaining <= 0:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            batch = self._take(loop.time())
+            if not batch:
+                self._slots.release()
+                continue
+            task = asyncio.ensure_future(self._dispatch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _dispatch(self, batch: List[_Pending]):
+        now = asyncio.get_running_loop().time()
+        for item in batch:
+            batch_wait.observe(self.name, now - item.enqueued)
+        batch_size.observe(self.name, len(batch))
+        self._counts["batches"] += 1
+        self._counts["batched"] += len(batch)
+        try:
+            with span("llm_batch"):
+                results = list(await self.batch_fn([item.request for item in batch]))
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name}: lote com {len(batch)} pedidos devolveu {len(results)} respostas")
+        except Exception as e:
+            results = [e] * len(batch)
+        finally:
+            self._slots.release()
+        for item, result in zip(batch, results):
+            if item.future.done():
+                continue
+            if isinstance(result, BaseException):
+                item.future.set_exception(result)
+            else:
+                item.future.set_result(result)
+
+    async def aclose(self):
+        """Encerra o coletor; pedidos ainda na fila são cancelados"""
+        if self._collector is not None:
+            self._collector.cancel()
+            await asyncio.gather(self._collector, *self._batches, return_exceptions=True)
+            self._collector = None
+        while self._queue:
+            self._queue.popleft().future.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        counts = dict(self._counts)
+        counts["queued"] = len(self._queue)
+        counts["mean_batch"] = counts["batched"] / counts["batches"] if counts["batches"] else 0.0
+        return counts
+
+# =========================
+# Instâncias por backend
+# =========================
+_lock = threading.Lock()
+_batchers: "weakref.WeakKeyDictionary[Any, MicroBatcher]" = weakref.WeakKeyDictionary()
+
+def _weak_batch_fn(backend: Any) -> BatchFn:
+    """`backend.agenerate_batch` sem manter o backend vivo (senão a entrada em `_batchers` nunca sai)"""
+    method = weakref.WeakMethod(backend.agenerate_batch)
+
+    async def batch_fn(requests: List[BatchRequest]) -> Sequence[Union[str, BaseException]]:
+        bound = method()
+        if bound is None:
+            raise RuntimeError("backend do micro-batching já foi descartado")
+        return await bound(requests)
+    return batch_fn
+
+def get_batcher(backend: Any) -> Optional[MicroBatcher]:
+    """Micro-batcher do backend (com `agenerate_batch`), ou `None` se `LLM_BATCH_MAX_SIZE` <= 1"""
+    max_batch_size = int(os.getenv("LLM_BATCH_MAX_SIZE", "1"))
+    if max_batch_size <= 1:
+        return None
+    with _lock:
+        batcher = _batchers.get(backend)
+        if batcher is None:
+            batcher = _batchers[backend] = MicroBatcher(
+                _weak_batch_fn(backend),
+                max_batch_size=max_batch_size,
+                max_wait=float(os.getenv("LLM_BATCH_MAX_WAIT_MS", "5")) / 1000,
+                max_queue=int(os.getenv("LLM_BATCH_MAX_QUEUE", "256")),
+                timeout=float(os.getenv("LLM_BATCH_TIMEOUT", "60")),
+                name=getattr(backend, "mode", "llm"),
+            )
+        return batcher
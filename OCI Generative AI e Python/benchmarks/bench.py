@@ -0,0 +1,441 @@
+"""
+Benchmarks de latência e carga do pipeline de chat.
+
+Cenários (conversas sintéticas, determinísticas pela `--seed`):
+
+- `agent`: `SmartAgent.process_message`, com a API de países trocada pelo stub local
+  (`stub_server.py`); por padrão o snapshot offline é desligado para exercitar o caminho de rede
+- `generate`: `OCIClient.generate_stream` em modo simulação (latência total e do 1º token)
+- `batch`: gerações completas simultâneas num backend simulado de poucas vagas, pelo
+  `MicroBatcher` (`--batch-size 1` compara com uma chamada por pedido)
+- `router`: `RoutedOCIClient` sobre vários stubs de chat com latências diferentes (mais
+  `--failing-endpoints` que só respondem 503), com a estratégia de `--routing`
+- `trim`: `trim_history` sobre um histórico que cresce a cada troca
+- `feedback`: `FeedbackStore.submit`, tempo de drenagem do lote e consultas de analytics
+
+Cada cenário roda num subprocesso próprio, para que o pico de RSS seja medido isoladamente.
+Os resultados (p50/p95/p99, vazão, pico de RSS) vão para um JSON que pode ser comparado
+com uma execução anterior:
+
+    python benchmarks/bench.py
+    python benchmarks/bench.py agent generate --concurrency 16 --sessions 100 --messages 20
+    python benchmarks/bench.py --output base.json
+    python benchmarks/bench.py --compare base.json --threshold 0.10 --fail-on-regression
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+SCENARIOS = ("agent", "generate", "batch", "router", "trim", "feedback")
+PERSONAS = ("Professor", "Suporte Técnico", "Contador de Histórias", "Analista")
+WORDS = (
+    "como qual quando onde porque sistema dados modelo resposta exemplo processo cliente "
+    "servidor memória contexto análise projeto relatório custo prazo equipe nuvem oracle "
+    "python streamlit pergunta explicar detalhe simples passo próximo melhor problema erro"
+).split()
+
+# =========================
+# Métricas
+# =========================
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Percentil com interpolação linear (q entre 0 e 100)"""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """Resumo em milissegundos"""
+    values = sorted(latencies)
+    return {
+        "p50": percentile(values, 50) * 1000,
+        "p95": percentile(values, 95) * 1000,
+        "p99": percentile(values, 99) * 1000,
+        "mean": (sum(values) / len(values) * 1000) if values else 0.0,
+        "max": (values[-1] * 1000) if values else 0.0,
+    }
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024  # bytes no macOS, KiB no Linux
+
+def run_sessions(sessions: List[List[Callable[[], Any]]], concurrency: int) -> Dict[str, Any]:
+    """Executa as sessões em paralelo (cada uma em ordem) e mede a latência de cada chamada"""
+    def run(calls):
+        latencies = []
+        for call in calls:
+            start = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = [lat for result in pool.map(run, sessions) for lat in result]
+    wall = time.perf_counter() - start
+    return {
+        "ops": len(latencies),
+        "wall_seconds": wall,
+        "throughput": len(latencies) / wall if wall else 0.0,
+        "latency_ms": summarize(latencies),
+    }
+
+# =========================
+# Carga sintética
+# =========================
+def synthetic_text(rng: random.Random, size: int) -> str:
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+def country_names() -> List[str]:
+    from intent import ALIASES_FILE
+    with open(ALIASES_FILE, encoding="utf-8") as fh:
+        return [alias for entry in json.load(fh).values() for alias in entry["aliases"]]
+
+def synthetic_question(rng: random.Random, size: int, countries: List[str], country_ratio: float) -> str:
+    if countries and rng.random() < country_ratio:
+        return f"Me fale sobre {rng.choice(countries)}. " + synthetic_text(rng, max(size - 30, 0))
+    return synthetic_text(rng, size)
+
+def conversations(args: Dict[str, Any], countries: List[str] = ()) -> List[List[str]]:
+    rng = random.Random(args["seed"])
+    return [[synthetic_question(rng, args["message_size"], countries, args["country_ratio"])
+             for _ in range(args["messages"])] for _ in range(args["sessions"])]
+
+# =========================
+# Cenários
+# =========================
+def bench_agent(args: Dict[str, Any]) -> Dict[str, Any]:
+    import country_info
+    from agent import SmartAgent
+    from stub_server import StubServer
+
+    stub = StubServer(latency=args["stub_latency"]).start()
+    country_info.API_URL = stub.url
+    if not args["snapshot"]:
+        country_info.snapshot = country_info.CountrySnapshot(path=Path(tempfile.gettempdir()) / "sem-snapshot.json.gz")
+    country_info.country_cache.clear()
+
+    sessions = []
+    for i, questions in enumerate(conversations(args, country_names())):
+        agent = SmartAgent(PERSONAS[i % len(PERSONAS)], "Formal")
+        sessions.append([lambda a=agent, q=q: a.process_message(q) for q in questions])
+    try:
+        result = run_sessions(sessions, args["concurrency"])
+    finally:
+        stub.stop()
+    result["stub_requests"] = stub.requests
+    result["country_cache"] = country_info.country_cache.stats()
+    return result
+
+def bench_generate(args: Dict[str, Any]) -> Dict[str, Any]:
+    from history import trim_history
+    from oci_client import GenParams, OCIClient
+    from prompting import build_system_prompt
+
+    client = OCIClient(mode="mock", token_delay=args["token_delay"])
+    params = GenParams()
+    first_token: List[float] = []
+
+    def call(messages):
+        start = time.perf_counter()
+        for i, _ in enumerate(client.generate_stream(messages, params)):
+            if i == 0:
+                first_token.append(time.perf_counter() - start)
+
+    sessions = []
+    for i, questions in enumerate(conversations(args)):
+        history = [{"role": "system", "content": build_system_prompt(PERSONAS[i % len(PERSONAS)], "Formal")}]
+        calls = []
+        for q in questions:
+            history.append({"role": "user", "content": q})
+            calls.append(lambda m=trim_history(history, params.memory_turns, params.context_tokens): call(m))
+            history.append({"role": "assistant", "content": synthetic_text(random.Random(q), args["message_size"])})
+        sessions.append(calls)
+    result = run_sessions(sessions, args["concurrency"])
+    result["first_token_ms"] = summarize(first_token)
+    return result
+
+def bench_batch(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Gerações completas simultâneas com backend de vagas limitadas, com e sem micro-batching"""
+    from batching import MicroBatcher
+    from oci_client import AsyncOCIClient, GenParams, _runtime
+    from prompting import build_system_prompt
+
+    client = AsyncOCIClient(mode="mock", token_delay=args["token_delay"] or 0.001,
+                            max_concurrency=args["backend_slots"])
+    batcher = MicroBatcher(client.agenerate_batch, max_batch_size=args["batch_size"],
+                           max_wait=args["batch_wait_ms"] / 1000, max_concurrent_batches=args["backend_slots"]) \
+        if args["batch_size"] > 1 else None
+    generate = batcher.submit if batcher else client.agenerate
+    runtime = _runtime()
+    params = GenParams()
+
+    sessions = []
+    for i, questions in enumerate(conversations(args)):
+        system = {"role": "system", "content": build_system_prompt(PERSONAS[i % len(PERSONAS)], "Formal")}
+        sessions.append([lambda m=[system, {"role": "user", "content": q}]: runtime.run(generate(m, params))
+                         for q in questions])
+    result = run_sessions(sessions, args["concurrency"])
+    if batcher:
+        result["batching"] = batcher.stats()
+        runtime.run(batcher.aclose())
+    return result
+
+def bench_router(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Gerações roteadas entre stubs locais de chat com latência injetada e endpoints com falha"""
+    from oci_client import GenParams, RoutedOCIClient, _runtime
+    from router import EndpointRouter
+    from stub_server import StubServer
+
+    stubs = [StubServer(latency=float(latency)).start() for latency in args["endpoint_latencies"].split(",")]
+    stubs += [StubServer(error_rate=1.0).start() for _ in range(args["failing_endpoints"])]
+    router = EndpointRouter([stub.chat_url for stub in stubs], strategy=args["routing"],
+                            rng=random.Random(args["seed"]))
+    client = RoutedOCIClient([], router=router, max_concurrency=64)
+    runtime = _runtime()
+    params = GenParams()
+    errors = []
+
+    def call(messages):
+        try:
+            runtime.run(client.agenerate(messages, params))
+        except Exception as e:
+            errors.append(type(e).__name__)
+
+    try:
+        sessions = [[lambda m=[{"role": "user", "content": q}]: call(m) for q in questions]
+                    for questions in conversations(args)]
+        result = run_sessions(sessions, args["concurrency"])
+    finally:
+        runtime.run(client.aclose())
+        for stub in stubs:
+            stub.stop()
+    result["errors"] = len(errors)
+    result["endpoints"] = [dict(row, stub_requests=stub.requests) for row, stub in zip(router.stats(), stubs)]
+    return result
+
+def bench_trim(args: Dict[str, Any]) -> Dict[str, Any]:
+    from history import default_counter, trim_history
+
+    sessions = []
+    for questions in conversations(args):
+        history = [{"role": "system", "content": synthetic_text(random.Random(0), 400)}]
+        calls = []
+        for q in questions:
+            history = history + [{"role": "user", "content": q}]
+            calls.append(lambda h=history: trim_history(h, args["memory_turns"], args["context_tokens"]))
+            history = history + [{"role": "assistant", "content": q[::-1]}]
+        sessions.append(calls)
+    result = run_sessions(sessions, args["concurrency"])
+    info = default_counter.cache_info()
+    result["token_cache"] = {"hits": info.hits, "misses": info.misses, "size": info.currsize}
+    return result
+
+def bench_feedback(args: Dict[str, Any]) -> Dict[str, Any]:
+    from feedback_store import FeedbackStore
+
+    rng = random.Random(args["seed"])
+    with tempfile.TemporaryDirectory() as tmp:
+        store = FeedbackStore(os.path.join(tmp, "bench_feedback.db"))
+        sessions = []
+        for questions in conversations(args):
+            calls = []
+            for q in questions:
+                row = {
+                    "timestamp": datetime.now().isoformat(),
+                    "persona": rng.choice(PERSONAS),
+                    "style": "Formal",
+                    "rating": rng.choice(("👍", "👎")),
+                    "comment": synthetic_text(rng, 60) if rng.random() < 0.5 else "",
+                    "user_msg": q,
+                    "assistant_msg": q[::-1],
+                }
+                calls.append(lambda r=row: store.submit(r))
+            sessions.append(calls)
+        result = run_sessions(sessions, args["concurrency"])
+
+        start = time.perf_counter()
+        store.flush()
+        result["flush_seconds"] = time.perf_counter() - start
+
+        queries = {
+            "rollup_persona_rating": lambda: store.rollup("persona", "rating"),
+            "rollup_day_rating": lambda: store.rollup("day", "rating"),
+            "comments_page": lambda: store.comments_page(limit=20),
+            "comments_search": lambda: store.comments_page(search=rng.choice(WORDS), limit=20),
+        }
+        result["queries_ms"] = {}
+        for name, query in queries.items():
+            latencies = []
+            for _ in range(args["query_repeats"]):
+                start = time.perf_counter()
+                query()
+                latencies.append(time.perf_counter() - start)
+            result["queries_ms"][name] = summarize(latencies)
+        store.close()
+    return result
+
+BENCHMARKS = {"agent": bench_agent, "generate": bench_generate, "batch": bench_batch, "router": bench_router,
+              "trim": bench_trim, "feedback": bench_feedback}
+
+def run_scenario(name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+    sys.path.insert(0, str(BENCH_DIR))
+    result = BENCHMARKS[name](args)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+# =========================
+# Comparação
+# =========================
+# métrica -> (caminho no resultado, True se maior é melhor)
+COMPARED = {
+    "p50_ms": (("latency_ms", "p50"), False),
+    "p95_ms": (("latency_ms", "p95"), False),
+    "p99_ms": (("latency_ms", "p99"), False),
+    "throughput": (("throughput",), True),
+    "peak_rss_mb": (("peak_rss_mb",), False),
+}
+
+def _get(result: Dict[str, Any], path: tuple) -> Optional[float]:
+    for key in path:
+        if not isinstance(result, dict) or key not in result:
+            return None
+        result = result[key]
+    return result
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    """Imprime a variação de cada métrica e retorna as regressões acima do limiar"""
+    regressions = []
+    for scenario, result in current["results"].items():
+        base = baseline.get("results", {}).get(scenario)
+        if base is None:
+            continue
+        print(f"\n{scenario}")
+        for metric, (path, higher_is_better) in COMPARED.items():
+            old, new = _get(base, path), _get(result, path)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            flag = "⚠️" if worse > threshold else ("✅" if worse < -threshold else "  ")
+            print(f"  {flag} {metric:<12} {old:>12.3f} -> {new:>12.3f} ({change:+.1%})")
+            if worse > threshold:
+                regressions.append(f"{scenario}.{metric} {change:+.1%}")
+    return regressions
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# =========================
+# CLI
+# =========================
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmarks do pipeline de chat")
+    parser.add_argument("scenarios", nargs="*", metavar="CENÁRIO",
+                        help=f"um ou mais de: {', '.join(SCENARIOS)} (padrão: todos)")
+    parser.add_argument("--concurrency", type=int, default=8, help="sessões executadas em paralelo")
+    parser.add_argument("--sessions", type=int, default=50, help="número de conversas sintéticas")
+    parser.add_argument("--messages", type=int, default=20, help="mensagens do usuário por conversa")
+    parser.add_argument("--message-size", type=int, default=200, help="tamanho aproximado de cada mensagem (caracteres)")
+    parser.add_argument("--country-ratio", type=float, default=0.3, help="fração de perguntas sobre países (agent)")
+    parser.add_argument("--stub-latency", type=float, default=0.005, help="latência do stub de países (s)")
+    parser.add_argument("--snapshot", action="store_true", help="mantém o snapshot offline de países (agent)")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="atraso por token no modo simulação (generate)")
+    parser.add_argument("--batch-size", type=int, default=8, help="tamanho máximo do lote; 1 desliga (batch)")
+    parser.add_argument("--batch-wait-ms", type=float, default=2.0, help="janela de agrupamento em ms (batch)")
+    parser.add_argument("--backend-slots", type=int, default=2, help="chamadas simultâneas aceitas pelo backend (batch)")
+    parser.add_argument("--endpoint-latencies", default="0.005,0.02,0.05",
+                        help="latências (s) dos stubs de chat saudáveis, separadas por vírgula (router)")
+    parser.add_argument("--failing-endpoints", type=int, default=1, help="stubs de chat que só respondem 503 (router)")
+    parser.add_argument("--routing", choices=("p2c", "least", "random"), default="p2c", help="estratégia (router)")
+    parser.add_argument("--memory-turns", type=int, default=6, help="trocas mantidas pelo trim_history (trim)")
+    parser.add_argument("--context-tokens", type=int, default=4096, help="orçamento de tokens do trim_history (trim)")
+    parser.add_argument("--query-repeats", type=int, default=50, help="repetições de cada consulta (feedback)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-isolate", action="store_true", help="roda tudo no mesmo processo")
+    parser.add_argument("--output", type=Path, help="arquivo JSON de saída (padrão: benchmarks/results/<data>.json)")
+    parser.add_argument("--compare", type=Path, help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--threshold", type=float, default=0.10, help="variação tolerada antes de marcar regressão")
+    parser.add_argument("--fail-on-regression", action="store_true", help="sai com código 1 se houver regressão")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"cenário inválido: {', '.join(sorted(unknown))}")
+    args.scenarios = args.scenarios or list(SCENARIOS)
+    return args
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    options = {k: v for k, v in vars(args).items() if k not in ("scenarios", "output", "compare")}
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "options": options,
+        },
+        "results": {},
+    }
+
+    for name in dict.fromkeys(args.scenarios):
+        print(f"▶️ {name} ...", flush=True)
+        if args.no_isolate:
+            result = run_scenario(name, options)
+        else:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                result = pool.submit(run_scenario, name, options).result()
+        report["results"][name] = result
+        lat = result["latency_ms"]
+        print(f"   {result['ops']} ops em {result['wall_seconds']:.2f}s | {result['throughput']:.1f} ops/s | "
+              f"p50 {lat['p50']:.3f} ms | p95 {lat['p95']:.3f} ms | p99 {lat['p99']:.3f} ms | "
+              f"RSS {result['peak_rss_mb'] or 0:.1f} MB")
+
+    output = args.output or BENCH_DIR / "results" / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"💾 Resultados em {output}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        regressions = compare(baseline, report, args.threshold)
+        if regressions:
+            print(f"\n⚠️ Regressões acima de {args.threshold:.0%}: {', '.join(regressions)}")
+            if args.fail_on_regression:
+                return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
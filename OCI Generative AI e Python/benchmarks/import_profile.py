@@ -0,0 +1,126 @@
+"""
+Perfil do tempo de importação (início a frio) dos pontos de entrada.
+
+Para cada módulo, roda `python -X importtime -c "import <módulo>"` num processo novo e reporta o
+tempo total de importação, as dependências diretas mais caras e quais pacotes pesados (pandas,
+plotly, LangChain...) foram carregados já no início. Com `--first-page`, mede também o tempo
+até a primeira página renderizada de cada app Streamlit (via `streamlit.testing.AppTest`),
+também num processo novo.
+
+    python benchmarks/import_profile.py
+    python benchmarks/import_profile.py app_v2 --repeat 5 --top 15
+    python benchmarks/import_profile.py --first-page --output startup.json
+"""
+
+import argparse
+import json
+import re
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+
+ENTRY_POINTS = ("app", "app_v2", "app_v3_simple", "service")
+STREAMLIT_APPS = ("app", "app_v2", "app_v3_simple")
+HEAVY_PACKAGES = ("pandas", "plotly", "langchain", "langchain_core", "langchain_community",
+                  "numpy", "pydantic", "httpx", "requests", "fastapi")
+
+_LINE_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+_FIRST_PAGE = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+ready = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=300).run()
+done = time.perf_counter()
+print(json.dumps({"harness_s": ready - start, "first_page_s": done - ready,
+                  "exception": bool(at.exception)}))
+"""
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Linhas do `-X importtime` -> [{módulo, self_ms, cumulativo_ms, nível}]"""
+    rows = []
+    for line in stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append({"module": name, "self_ms": int(self_us) / 1000,
+                         "cumulative_ms": int(cumulative_us) / 1000, "level": len(indent) // 2})
+    return rows
+
+def profile_module(module: str, repeat: int) -> Dict[str, Any]:
+    """Melhor de `repeat` execuções (menos ruído de disco/cache do SO)"""
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              cwd=ROOT, capture_output=True, text=True)
+        rows = parse_importtime(proc.stderr)
+        if proc.returncode != 0 or not rows:
+            return {"module": module, "error": proc.stderr.strip().splitlines()[-1:]}
+        total = rows[-1]["cumulative_ms"]  # o módulo pedido é o último (nível 0)
+        if best is None or total < best[0]:
+            best = (total, rows)
+    total, rows = best
+    loaded = {r["module"]: r for r in rows}
+    return {
+        "module": module,
+        "total_ms": total,
+        "direct": sorted((r for r in rows if r["level"] == 1), key=lambda r: -r["cumulative_ms"]),
+        "heavy": {name: loaded[name]["cumulative_ms"] for name in HEAVY_PACKAGES if name in loaded},
+    }
+
+def first_page(module: str) -> Dict[str, Any]:
+    proc = subprocess.run([sys.executable, "-c", _FIRST_PAGE, str(ROOT / f"{module}.py")],
+                          cwd=ROOT, capture_output=True, text=True)
+    try:
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        return {"error": proc.stderr.strip().splitlines()[-1:]}
+
+def print_report(result: Dict[str, Any], top: int):
+    if "error" in result:
+        print(f"❌ {result['module']}: {result['error']}")
+        return
+    print(f"▶️ {result['module']}: {result['total_ms']:.0f} ms de importação")
+    for row in result["direct"][:top]:
+        print(f"   {row['cumulative_ms']:8.1f} ms  {row['module']}")
+    heavy = ", ".join(f"{k} ({v:.0f} ms)" for k, v in result["heavy"].items()) or "nenhum"
+    print(f"   pacotes pesados carregados: {heavy}")
+    page = result.get("first_page")
+    if page and "error" not in page:
+        print(f"   primeira página: {page['first_page_s'] * 1000:.0f} ms"
+              + (" (com exceção)" if page["exception"] else ""))
+    elif page:
+        print(f"   primeira página: ❌ {page['error']}")
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Perfil de importação dos pontos de entrada")
+    parser.add_argument("modules", nargs="*", metavar="MÓDULO", help=f"padrão: {' '.join(ENTRY_POINTS)}")
+    parser.add_argument("--repeat", type=int, default=3, help="execuções por módulo (vale a melhor)")
+    parser.add_argument("--top", type=int, default=10, help="dependências diretas listadas")
+    parser.add_argument("--first-page", action="store_true", help="mede também a primeira página dos apps Streamlit")
+    parser.add_argument("--output", type=Path, help="arquivo JSON com o relatório completo")
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    report = {"timestamp": datetime.now().isoformat(timespec="seconds"), "python": sys.version.split()[0],
+              "results": {}}
+    for module in args.modules or ENTRY_POINTS:
+        result = profile_module(module, args.repeat)
+        if args.first_page and module in STREAMLIT_APPS and "error" not in result:
+            result["first_page"] = first_page(module)
+        report["results"][module] = result
+        print_report(result, args.top)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"💾 Relatório em {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
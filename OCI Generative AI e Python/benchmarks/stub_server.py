@@ -0,0 +1,185 @@
+"""
+Servidor HTTP local que imita a API RestCountries (`/v3.1/name/<nome>`) para os benchmarks.
+
+Responde a partir do snapshot `data/countries.json.gz`, com latência artificial configurável,
+de modo que o caminho de rede do `country_info` é exercitado sem depender da internet.
+
+Também atende `POST /20231130/actions/chat` no formato do OCI GenAI (JSON ou SSE com
+`isStream`), ecoando a última mensagem; vários stubs com latências diferentes servem de
+endpoints para o `RoutedOCIClient` (`chat_url`).
+
+Injeção de falhas (para exercitar o `http_client`): uma fração das requisições responde 503
+(`error_rate`, com `Retry-After` se `retry_after` for informado), demora `slow_latency`
+segundos (`slow_rate`) ou tem a conexão derrubada sem resposta (`drop_rate`). O sorteio usa um `random.Random(seed)` próprio, reprodutível.
+
+    python benchmarks/stub_server.py --port 8089 --latency 0.02
+    python benchmarks/stub_server.py --error-rate 0.2 --slow-rate 0.05 --slow-latency 2
+"""
+
+import argparse
+import gzip
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+from urllib.parse import unquote, urlparse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from intent import ALIASES_FILE, fold  # noqa: E402
+from country_info import SNAPSHOT_FILE  # noqa: E402
+from oci_client import mock_tokens  # noqa: E402
+
+CHAT_PATH = "/20231130/actions/chat"
+
+def load_index() -> dict:
+    """Índice nome/apelido normalizado -> registro no formato da API"""
+    with gzip.open(SNAPSHOT_FILE, "rt", encoding="utf-8") as fh:
+        countries = json.load(fh)["countries"]
+    with open(ALIASES_FILE, encoding="utf-8") as fh:
+        aliases = json.load(fh)
+    index = {}
+    for code, record in countries.items():
+        for key in [fold(record["name"]["common"])] + aliases.get(code, {}).get("aliases", []):
+            index.setdefault(key, record)
+    return index
+
+class StubServer:
+    """`ThreadingHTTPServer` em thread daemon; `url` aponta para o molde de `country_info.API_URL`"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 error_rate: float = 0.0, slow_rate: float = 0.0, slow_latency: float = 1.0,
+                 drop_rate: float = 0.0, retry_after: Optional[float] = None, seed: int = 0):
+        index = load_index()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive: o pool de conexões dos clientes é exercitado
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def _inject_faults(self) -> bool:
+                """Aplica latência e falhas sorteadas; False se a requisição já foi encerrada"""
+                with stub._lock:
+                    stub.requests += 1
+                    roll = stub.rng.random()
+                if roll < stub.drop_rate:
+                    stub.faults["drop"] += 1
+                    self.close_connection = True
+                    self.connection.close()
+                    return False
+                roll -= stub.drop_rate
+                if roll < stub.error_rate:
+                    stub.faults["error"] += 1
+                    self.send_response(503)
+                    if stub.retry_after is not None:
+                        self.send_header("Retry-After", f"{stub.retry_after:g}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return False
+                roll -= stub.error_rate
+                delay = stub.latency
+                if roll < stub.slow_rate:
+                    stub.faults["slow"] += 1
+                    delay += stub.slow_latency
+                if delay:
+                    time.sleep(delay)
+                return True
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if not self._inject_faults():
+                    return
+                if urlparse(self.path).path != CHAT_PATH:
+                    self.send_error(404)
+                    return
+                request = json.loads(body)["chatRequest"]
+                text = f"Eco: {request['messages'][-1]['content'][0]['text']}"
+                message = {"role": "ASSISTANT", "content": [{"type": "TEXT", "text": text}]}
+                if request.get("isStream"):
+                    events = [{"message": {"content": [{"type": "TEXT", "text": token}]}} for token in mock_tokens(text)]
+                    payload = "".join(f"data: {json.dumps(e)}\n\n" for e in events).encode("utf-8")
+                    content_type = "text/event-stream"
+                else:
+                    payload = json.dumps({"chatResponse": {"choices": [{"message": message}]}}).encode("utf-8")
+                    content_type = "application/json"
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                if not self._inject_faults():
+                    return
+                path = urlparse(self.path).path
+                record = index.get(fold(unquote(path.rsplit("/", 1)[-1]))) if path.startswith("/v3.1/name/") else None
+                body = json.dumps([record] if record else {"status": 404, "message": "Not Found"}).encode("utf-8")
+                self.send_response(200 if record else 404)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.latency = latency
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.drop_rate = drop_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.connections = 0  # conexões TCP aceitas (reúso de keep-alive = menos conexões que requisições)
+        self.faults = {"error": 0, "slow": 0, "drop": 0}
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, kwargs={"poll_interval": 0.05},
+                                       name="stub-server", daemon=True)  # `stop()` rápido nos testes
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v3.1/name/{{name}}"
+
+    @property
+    def chat_url(self) -> str:
+        """Base do endpoint de chat (como `OCI_ENDPOINT_URL`)"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServer":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub local da API RestCountries")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0, help="atraso por requisição, em segundos")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fração de respostas 503")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fração de respostas lentas")
+    parser.add_argument("--slow-latency", type=float, default=1.0, help="atraso extra das respostas lentas")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fração de conexões derrubadas")
+    parser.add_argument("--retry-after", type=float, default=None, help="Retry-After das respostas 503")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    server = StubServer(args.host, args.port, args.latency, error_rate=args.error_rate,
+                        slow_rate=args.slow_rate, slow_latency=args.slow_latency,
+                        drop_rate=args.drop_rate, retry_after=args.retry_after, seed=args.seed)
+    print(f"🌐 Stub em {server.url}")
+    server.httpd.serve_forever()
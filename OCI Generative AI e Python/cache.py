@@ -0,0 +1,100 @@
+"""
+Cache em memória com expiração (TTL) e despejo LRU, seguro para várias threads.
+
+Falhas também podem ser cacheadas (cache negativo) com um TTL mais curto, para que uma
+consulta inválida ou um upstream fora do ar não seja repetido a cada pergunta.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0, negative_ttl: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # chave -> (expira_em, valor, é_erro)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+
+    def _lookup(self, key: Hashable):
+        """Retorna a entrada válida (movendo-a para o fim da fila LRU) ou None"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= self.clock():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def _store(self, key: Hashable, value: Any, ttl: float, is_error: bool):
+        self._data[key] = (self.clock() + ttl, value, is_error)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None or entry[2]:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: float = None):
+        with self._lock:
+            self._store(key, value, self.ttl if ttl is None else ttl, False)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any],
+                    cache_error: Optional[Callable[[Exception], bool]] = None) -> Any:
+        """Retorna o valor cacheado ou chama `loader`; exceções são cacheadas por `negative_ttl`
+
+        Com `cache_error`, só as exceções para as quais ele retorna True entram no cache negativo
+        (ex.: "não encontrado", mas não timeouts ou disjuntor aberto).
+        """
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                if entry[2]:
+                    self.negative_hits += 1
+                    raise entry[1].with_traceback(None)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        try:
+            value = loader()
+        except Exception as e:
+            if self.negative_ttl > 0 and (cache_error is None or cache_error(e)):
+                with self._lock:
+                    self._store(key, e, self.negative_ttl, True)
+            raise
+        with self._lock:
+            self._store(key, value, self.ttl, False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.negative_hits
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "negative_hits": self.negative_hits,
+            "hit_rate": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,90 @@
+"""
+Renderização do histórico do chat em janela, compartilhada pelos apps Streamlit.
+
+A cada rerun só as últimas `page_size × páginas` mensagens viram `st.chat_message`; o botão
+"Carregar mensagens anteriores" amplia a janela uma página por vez. O HTML de cada bolha fica
+num cache LRU por processo, indexado pelo id da mensagem (`memory.Message.id`) ou, para
+históricos em dicionários, por (papel, conteúdo). Assim o custo do rerun depende do tamanho da
+janela, não do tamanho da conversa.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, List, Sequence
+
+import streamlit as st
+
+PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "50"))
+AVATARS = {"user": "🧑‍💻", "assistant": "🤖"}
+BUBBLE_CLASSES = {"user": "bubble-user", "assistant": "bubble-bot"}
+
+# =========================
+# Fragmentos HTML
+# =========================
+class FragmentCache:
+    """LRU de fragmentos HTML por mensagem, compartilhado por todas as sessões do processo"""
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, role: str, content: str) -> str:
+        with self._lock:
+            html = self._items.get(key)
+            if html is not None:
+                self._items.move_to_end(key)
+                return html
+        html = bubble_html(role, content)
+        with self._lock:
+            self._items[key] = html
+            if len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return html
+
+fragment_cache = FragmentCache()
+
+def bubble_html(role: str, content: str) -> str:
+    return f'<div class="{BUBBLE_CLASSES.get(role, "bubble-bot")}">{content}</div>'
+
+def _fields(message: Any):
+    """(chave, papel, conteúdo) de um `memory.Message` ou de um dicionário `{"role", "content"}`"""
+    if isinstance(message, dict):
+        return (message["role"], message["content"]), message["role"], message["content"]
+    return message.id, message.role, message.content
+
+def last_visible(messages: Sequence[Any], limit: int) -> tuple:
+    """Últimas `limit` mensagens de usuário/assistente (em ordem) e se há anteriores ocultas.
+
+    Percorre o histórico de trás para frente, então o custo é O(limit) para listas e deques.
+    """
+    visible: List[Any] = []
+    for message in reversed(messages):
+        role = message["role"] if isinstance(message, dict) else message.role
+        if role not in AVATARS:
+            continue
+        if len(visible) == limit:
+            return visible[::-1], True
+        visible.append(message)
+    return visible[::-1], False
+
+# =========================
+# Renderização
+# =========================
+def render_history(messages: Sequence[Any], state_key: str = "history_pages", page_size: int = PAGE_SIZE):
+    """Desenha a janela atual do histórico, com paginação para mensagens mais antigas"""
+    pages = st.session_state.setdefault(state_key, 1)
+    visible, has_more = last_visible(messages, page_size * pages)
+    if has_more and st.button("⬆️ Carregar mensagens anteriores", key=f"{state_key}_more",
+                              use_container_width=True):
+        st.session_state[state_key] = pages + 1
+        st.rerun()
+    for message in visible:
+        key, role, content = _fields(message)
+        with st.chat_message(role, avatar=AVATARS[role]):
+            st.markdown(fragment_cache.get(key, role, content), unsafe_allow_html=True)
+
+def reset_history_window(state_key: str = "history_pages"):
+    """Volta a janela para a primeira página (ex.: ao limpar a conversa)"""
+    st.session_state[state_key] = 1
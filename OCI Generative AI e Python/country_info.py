@@ -0,0 +1,143 @@
+"""
+Consulta de dados de países.
+
+O caminho principal é um snapshot local (`data/countries.json.gz`, no formato da API
+RestCountries v3.1), carregado sob demanda num índice em memória por nome e apelido.
+Só os nomes que não estão no snapshot vão para a rede, pelo `ToolHTTPClient` compartilhado
+(timeouts, novas tentativas com backoff, disjuntor e, com `COUNTRY_API_HEDGE_AFTER`, requisições
+hedged); essas respostas ficam num `TTLCache` por processo, indexado pelo nome normalizado,
+com cache negativo só para "país não encontrado" (404); falhas transitórias e o disjuntor
+aberto não são cacheadas.
+
+Para atualizar o snapshot a partir da API:
+
+    python country_info.py --refresh
+"""
+
+import argparse
+import gzip
+import json
+import os
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Optional
+from urllib.parse import quote
+
+import requests
+
+from cache import TTLCache
+from http_client import CircuitBreaker, ToolHTTPClient
+from intent import ALIASES_FILE, DATA_DIR, fold
+
+API_URL = "https://restcountries.com/v3.1/name/{name}?fields=name,capital,population,region,subregion,area,languages"
+ALL_URL = "https://restcountries.com/v3.1/all?fields=name,cca3,capital,population,region,subregion,area,languages"
+TIMEOUT = (3.05, 10)  # (conexão, leitura) em segundos
+SNAPSHOT_FILE = DATA_DIR / "countries.json.gz"
+
+country_cache = TTLCache(maxsize=512, ttl=24 * 3600, negative_ttl=300)
+_hedge_after = os.getenv("COUNTRY_API_HEDGE_AFTER", "")
+http = ToolHTTPClient(
+    "restcountries",
+    timeout=TIMEOUT,
+    retries=int(os.getenv("COUNTRY_API_RETRIES", "2")),
+    breaker=CircuitBreaker(failure_threshold=5, reset_timeout=30.0),
+    hedge_after=float(_hedge_after) if _hedge_after else None,
+)
+
+# =========================
+# Snapshot local
+# =========================
+class CountrySnapshot:
+    """Índice em memória do snapshot, carregado na primeira consulta"""
+
+    def __init__(self, path: Path = SNAPSHOT_FILE, aliases_path: Path = ALIASES_FILE):
+        self.path = path
+        self.aliases_path = aliases_path
+        self.meta: Dict[str, Any] = {}
+        self._index: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not self.path.exists():
+            return {}
+        with gzip.open(self.path, "rt", encoding="utf-8") as fh:
+            payload = json.load(fh)
+        aliases = {}
+        if self.aliases_path.exists():
+            with open(self.aliases_path, encoding="utf-8") as fh:
+                aliases = json.load(fh)
+
+        index = {}
+        for code, record in payload["countries"].items():
+            keys = [fold(record["name"]["common"]), fold(record["name"].get("official", ""))]
+            keys += aliases.get(code, {}).get("aliases", [])
+            for key in keys:
+                if key:
+                    index.setdefault(key, record)
+        self.meta = {k: v for k, v in payload.items() if k != "countries"}
+        self.meta["countries"] = len(payload["countries"])
+        return index
+
+    def lookup(self, country_name: str) -> Optional[Dict[str, Any]]:
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._load()
+        return self._index.get(fold(country_name))
+
+    def reload(self):
+        with self._lock:
+            self._index = None
+
+snapshot = CountrySnapshot()
+
+def refresh_snapshot(path: Path = SNAPSHOT_FILE) -> int:
+    """Baixa todos os países da API e regrava o snapshot; retorna quantos foram salvos"""
+    countries = {}
+    for item in http.get_json(ALL_URL, timeout=(3.05, 60)):
+        code = item.pop("cca3")
+        item["name"] = {k: item["name"][k] for k in ("common", "official") if k in item["name"]}
+        if not item.get("capital"):
+            item.pop("capital", None)  # territórios sem capital (Antártida, Macau...) vêm com []
+        countries[code] = item
+    payload = {"source": "restcountries.com v3.1", "generated_at": date.today().isoformat(), "countries": countries}
+
+    tmp_path = path.with_suffix(".tmp")
+    with gzip.GzipFile(tmp_path, "wb", mtime=0) as fh:
+        fh.write(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    os.replace(tmp_path, path)
+    snapshot.reload()
+    return len(countries)
+
+# =========================
+# Consulta
+# =========================
+def _fetch_remote(country_name: str) -> Dict[str, Any]:
+    return http.get_json(API_URL.format(name=quote(country_name)))[0]
+
+def country_capital(data: Dict[str, Any]) -> str:
+    """Primeira capital do registro, ou "N/A" se a lista vier vazia ou ausente"""
+    return (data.get("capital") or ["N/A"])[0]
+
+def _is_not_found(error: Exception) -> bool:
+    response = getattr(error, "response", None)
+    return isinstance(error, requests.HTTPError) and response is not None and response.status_code == 404
+
+def fetch_country(country_name: str) -> Dict[str, Any]:
+    """Retorna os dados brutos do país (formato RestCountries v3.1); levanta exceção em falha"""
+    data = snapshot.lookup(country_name)
+    if data is not None:
+        return data
+    key = fold(country_name)
+    return country_cache.get_or_load(key, lambda: _fetch_remote(country_name), cache_error=_is_not_found)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Snapshot local de dados de países")
+    parser.add_argument("--refresh", action="store_true", help="baixa os dados atuais da API RestCountries")
+    args = parser.parse_args()
+    if args.refresh:
+        print(f"✅ Snapshot atualizado com {refresh_snapshot()} países em {SNAPSHOT_FILE}")
+    else:
+        snapshot.lookup("")
+        print(f"📦 {SNAPSHOT_FILE}: {snapshot.meta}")
@@ -0,0 +1,92 @@
+"""
+Embeddings de texto locais para busca por similaridade.
+
+Um embedder é qualquer `Callable[[List[str]], np.ndarray]` que devolve uma linha normalizada
+(norma L2 = 1) por texto, de modo que a similaridade de cosseno é um produto escalar.
+
+- `HashingEmbedder`: n-gramas de caracteres projetados por hashing; sem dependências além do
+  NumPy, determinístico entre processos e bom para detectar paráfrases próximas
+- `SentenceTransformerEmbedder`: modelo local do `sentence-transformers` (dependência opcional)
+- `load_embedder(spec)`: escolhe a implementação a partir de uma string de configuração
+
+O NumPy só é importado na primeira vetorização, fora do início a frio dos apps.
+"""
+
+import logging
+import unicodedata
+import zlib
+from typing import TYPE_CHECKING, Callable, List, Optional
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Embedder = Callable[[List[str]], "np.ndarray"]
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.casefold())
+    return " ".join("".join(c for c in text if not unicodedata.combining(c)).split())
+
+def _l2_normalize(matrix: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+class HashingEmbedder:
+    """Vetoriza n-gramas de caracteres de cada palavra com hashing assinado (crc32)"""
+
+    def __init__(self, dim: int = 512, ngram_range: tuple = (3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def _features(self, text: str) -> List[str]:
+        features = []
+        lo, hi = self.ngram_range
+        for word in _normalize(text).split():
+            features.append(word)
+            padded = f"<{word}>"
+            for n in range(lo, hi + 1):
+                features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return features
+
+    def __call__(self, texts: List[str]) -> "np.ndarray":
+        import numpy as np
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in self._features(text)), dtype=np.uint32)
+            if hashes.size:
+                signs = np.where(hashes & 0x80000000, 1.0, -1.0)
+                matrix[row] = np.bincount(hashes % self.dim, weights=signs, minlength=self.dim)
+        return _l2_normalize(matrix)
+
+class SentenceTransformerEmbedder:
+    """Modelo local do `sentence-transformers`, carregado na primeira chamada"""
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+        self.model_name = model_name
+        self._model = None
+
+    def __call__(self, texts: List[str]) -> "np.ndarray":
+        import numpy as np
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name)
+        vectors = self._model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+def load_embedder(spec: Optional[str]) -> Optional[Embedder]:
+    """`""`/`"off"` desativa, `"hashing"` usa o `HashingEmbedder`; outro valor é o nome do modelo
+    do `sentence-transformers` (com o `HashingEmbedder` como alternativa se o pacote faltar)"""
+    spec = (spec or "").strip()
+    if spec.lower() in ("", "off", "none", "0"):
+        return None
+    if spec.lower() == "hashing":
+        return HashingEmbedder()
+    try:
+        import sentence_transformers  # noqa: F401
+    except ImportError:
+        logger.warning("sentence-transformers não instalado; usando HashingEmbedder no lugar de %s", spec)
+        return HashingEmbedder()
+    return SentenceTransformerEmbedder(spec)
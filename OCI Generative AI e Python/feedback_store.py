@@ -0,0 +1,334 @@
+"""
+Armazenamento de feedback em SQLite compartilhado pelos apps.
+
+Os cliques de feedback entram numa fila thread-safe e uma thread de escrita, dona de uma
+conexão persistente em modo WAL, grava os eventos em transações em lote (por tamanho ou
+por tempo). A fila é drenada no encerramento do processo. Um lote que encontra o banco
+ocupado (`SQLITE_BUSY`/locked) é regravado com espera exponencial; só depois de
+`write_retries` tentativas, ou num erro permanente, as linhas são descartadas, com log e
+contagem em `rows_dropped` / `feedback_dropped_total`.
+
+Na mesma transação de cada lote são atualizadas as contagens pré-agregadas de
+`feedback_rollup` (dia × persona × estilo × avaliação), que o dashboard lê no lugar das
+linhas brutas.
+
+Os comentários são navegados com paginação por chave (keyset) sobre índices de
+`feedback`, com filtros no servidor e busca textual pela tabela FTS5 `feedback_fts`.
+"""
+
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from metrics import REGISTRY, Counter as MetricCounter, span
+
+FEEDBACK_COLUMNS = ("timestamp", "persona", "style", "rating", "comment", "user_msg", "assistant_msg")
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS feedback (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        persona TEXT,
+        style TEXT,
+        rating TEXT,
+        comment TEXT,
+        user_msg TEXT,
+        assistant_msg TEXT
+    )
+'''
+
+ROLLUP_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS feedback_rollup (
+        day TEXT NOT NULL,
+        persona TEXT NOT NULL,
+        style TEXT NOT NULL,
+        rating TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (day, persona, style, rating)
+    ) WITHOUT ROWID
+'''
+
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_feedback_timestamp ON feedback (timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_feedback_persona_rating ON feedback (persona, rating, timestamp)",
+)
+
+# Índice textual dos comentários (tabela de conteúdo externo sincronizada por triggers)
+FTS_SCHEMA = (
+    """CREATE VIRTUAL TABLE feedback_fts USING fts5(
+        comment, content='feedback', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS feedback_fts_ai AFTER INSERT ON feedback BEGIN
+        INSERT INTO feedback_fts (rowid, comment) VALUES (new.id, new.comment);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS feedback_fts_ad AFTER DELETE ON feedback BEGIN
+        INSERT INTO feedback_fts (feedback_fts, rowid, comment) VALUES ('delete', old.id, old.comment);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS feedback_fts_au AFTER UPDATE OF comment ON feedback BEGIN
+        INSERT INTO feedback_fts (feedback_fts, rowid, comment) VALUES ('delete', old.id, old.comment);
+        INSERT INTO feedback_fts (rowid, comment) VALUES (new.id, new.comment);
+    END""",
+    "INSERT INTO feedback_fts (feedback_fts) VALUES ('rebuild')",
+)
+
+COMMENT_FIELDS = ("id", "timestamp", "persona", "style", "rating", "comment")
+
+ROLLUP_DIMENSIONS = ("day", "persona", "style", "rating")
+
+# Reconstrói as contagens a partir das linhas brutas (bancos criados antes do rollup)
+ROLLUP_BACKFILL_SQL = '''
+    INSERT INTO feedback_rollup (day, persona, style, rating, count)
+    SELECT substr(COALESCE(timestamp, ''), 1, 10), COALESCE(persona, ''), COALESCE(style, ''),
+           COALESCE(rating, ''), COUNT(*)
+    FROM feedback GROUP BY 1, 2, 3, 4
+'''
+
+ROLLUP_UPSERT_SQL = '''
+    INSERT INTO feedback_rollup (day, persona, style, rating, count) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (day, persona, style, rating) DO UPDATE SET count = count + excluded.count
+'''
+
+INSERT_SQL = f"INSERT INTO feedback ({', '.join(FEEDBACK_COLUMNS)}) VALUES ({', '.join('?' * len(FEEDBACK_COLUMNS))})"
+
+_STOP = object()
+
+logger = logging.getLogger(__name__)
+
+feedback_dropped = MetricCounter("feedback_dropped_total", "Feedbacks descartados por falha na gravação", label="reason")
+REGISTRY.append(feedback_dropped)
+
+def _is_transient(error: sqlite3.Error) -> bool:
+    """Banco ocupado por outro escritor: vale tentar de novo"""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """Abre uma conexão em modo WAL (leitores não bloqueiam o escritor)"""
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+class FeedbackStore:
+    def __init__(self, db_path: str, batch_size: int = 100, flush_interval: float = 0.5,
+                 write_retries: int = 5, retry_backoff: float = 0.05):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.write_retries = write_retries
+        self.retry_backoff = retry_backoff
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches_written = 0
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.fts_enabled = True
+        self.init_db()
+
+    def init_db(self):
+        conn = connect(self.db_path)
+        conn.isolation_level = None  # transação explícita: criação + backfill atômicos entre processos
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(SCHEMA)
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            conn.execute(ROLLUP_SCHEMA)
+            if "feedback_rollup" not in tables:
+                conn.execute(ROLLUP_BACKFILL_SQL)
+            for statement in INDEXES:
+                conn.execute(statement)
+            if "feedback_fts" not in tables and self.fts_enabled:
+                try:
+                    conn.execute("SAVEPOINT fts")
+                    for statement in FTS_SCHEMA:
+                        conn.execute(statement)
+                    conn.execute("RELEASE fts")
+                except sqlite3.OperationalError:
+                    # SQLite compilado sem FTS5: a busca cai para LIKE
+                    conn.execute("ROLLBACK TO fts")
+                    conn.execute("RELEASE fts")
+                    self.fts_enabled = False
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    # -------- escrita --------
+    def submit(self, feedback_data: Dict[str, Any]):
+        """Enfileira um feedback; a gravação acontece em lote na thread de escrita"""
+        self._ensure_writer()
+        self._queue.put(tuple(feedback_data.get(col) for col in FEEDBACK_COLUMNS))
+
+    def flush(self, timeout: Optional[float] = None):
+        """Bloqueia até que tudo o que foi enfileirado esteja gravado"""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 10.0):
+        """Drena a fila e encerra a thread de escrita"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _ensure_writer(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=f"feedback-writer:{self.db_path}", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        conn = connect(self.db_path)
+        try:
+            stop = False
+            while not stop:
+                batch, waiters = [], []
+                item = self._queue.get()
+                deadline = time.monotonic() + self.flush_interval
+                while True:
+                    if item is _STOP:
+                        stop = True
+                    elif isinstance(item, threading.Event):
+                        waiters.append(item)
+                    else:
+                        batch.append(item)
+                    if stop or waiters or len(batch) >= self.batch_size:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                if batch:
+                    self._write_batch(conn, batch)
+                for waiter in waiters:
+                    waiter.set()
+        finally:
+            conn.close()
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: List[tuple]):
+        rollup = [(*key, n) for key, n in _rollup_counts(batch).items()]
+        for attempt in range(self.write_retries + 1):
+            try:
+                with span("db_write"), conn:  # uma transação (e um fsync) por lote
+                    conn.executemany(INSERT_SQL, batch)
+                    conn.executemany(ROLLUP_UPSERT_SQL, rollup)
+            except sqlite3.Error as e:
+                if _is_transient(e) and attempt < self.write_retries:
+                    time.sleep(self.retry_backoff * 2 ** attempt)
+                    continue
+                logger.exception("Falha ao gravar lote de %d feedbacks em %s; linhas descartadas",
+                                 len(batch), self.db_path)
+                self.rows_dropped += len(batch)
+                feedback_dropped.inc("busy" if _is_transient(e) else "error", len(batch))
+                return
+            self.batches_written += 1
+            self.rows_written += len(batch)
+            return
+
+    # -------- leitura --------
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def rollup(self, *dimensions: str) -> List[tuple]:
+        """Contagens agregadas pelas dimensões pedidas, ex.: `rollup("persona", "rating")`"""
+        for dim in dimensions:
+            if dim not in ROLLUP_DIMENSIONS:
+                raise ValueError(f"Dimensão inválida: {dim}")
+        if not dimensions:
+            return self._query("SELECT COALESCE(SUM(count), 0) FROM feedback_rollup")
+        cols = ", ".join(dimensions)
+        return self._query(f"SELECT {cols}, SUM(count) FROM feedback_rollup GROUP BY {cols} ORDER BY {cols}")
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Últimos feedbacks gravados (pela chave primária, sem varrer a tabela)"""
+        rows = self._query(f"SELECT id, {', '.join(FEEDBACK_COLUMNS)} FROM feedback ORDER BY id DESC LIMIT ?", (limit,))
+        return [dict(zip(("id",) + FEEDBACK_COLUMNS, row)) for row in rows]
+
+    def comments_page(self, persona: Optional[str] = None, rating: Optional[str] = None,
+                      start: Optional[date] = None, end: Optional[date] = None,
+                      search: Optional[str] = None, cursor: Optional[Tuple[str, int]] = None,
+                      limit: int = 20) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, int]]]:
+        """Uma página de comentários, do mais recente para o mais antigo.
+
+        `cursor` é o `(timestamp, id)` do último item da página anterior (paginação por chave);
+        retorna as linhas e o cursor da próxima página, ou None se não houver mais.
+        """
+        where, params, join = ["f.comment IS NOT NULL", "f.comment <> ''"], [], ""
+        if persona:
+            where.append("f.persona = ?")
+            params.append(persona)
+        if rating:
+            where.append("f.rating = ?")
+            params.append(rating)
+        if start:
+            where.append("f.timestamp >= ?")
+            params.append(start.isoformat())
+        if end:
+            where.append("f.timestamp < ?")
+            params.append((end + timedelta(days=1)).isoformat())
+        if search and search.strip():
+            if self.fts_enabled:
+                join = "JOIN feedback_fts ON feedback_fts.rowid = f.id"
+                where.append("feedback_fts MATCH ?")
+                params.append(_fts_query(search))
+            else:
+                where.append("f.comment LIKE ?")
+                params.append(f"%{search.strip()}%")
+        if cursor:
+            where.append("(f.timestamp, f.id) < (?, ?)")
+            params.extend(cursor)
+
+        cols = ", ".join(f"f.{c}" for c in COMMENT_FIELDS)
+        rows = self._query(
+            f"SELECT {cols} FROM feedback f {join} WHERE {' AND '.join(where)} "
+            f"ORDER BY f.timestamp DESC, f.id DESC LIMIT ?", tuple(params) + (limit + 1,))
+        page = [dict(zip(COMMENT_FIELDS, row)) for row in rows[:limit]]
+        next_cursor = (page[-1]["timestamp"], page[-1]["id"]) if len(rows) > limit else None
+        return page, next_cursor
+
+def _fts_query(search: str) -> str:
+    """Converte o texto livre numa consulta FTS5 segura (termos com prefixo, combinados por AND)"""
+    return " ".join('"' + term.replace('"', '""') + '"*' for term in search.split())
+
+def _rollup_counts(batch: List[tuple]) -> Counter:
+    counts = Counter()
+    for timestamp, persona, style, rating, *_ in batch:
+        counts[((timestamp or "")[:10], persona or "", style or "", rating or "")] += 1
+    return counts
+
+_stores: Dict[str, FeedbackStore] = {}
+_stores_lock = threading.Lock()
+
+def get_feedback_store(db_path: str) -> FeedbackStore:
+    """Instância única por arquivo de banco, compartilhada por todas as sessões do processo"""
+    with _stores_lock:
+        store = _stores.get(db_path)
+        if store is None:
+            store = _stores[db_path] = FeedbackStore(db_path)
+        return store
+
+@atexit.register
+def close_all():
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.close()
@@ -0,0 +1,95 @@
+"""
+Recorte do histórico de conversa por orçamento de tokens.
+
+A contagem de tokens usa um tokenizador plugável (qualquer `Callable[[str], int]`) e fica em
+cache por conteúdo, então o histórico não é re-tokenizado a cada rerun do Streamlit.
+"""
+
+import math
+from functools import lru_cache
+from typing import Callable, List, Dict, Optional
+
+Tokenizer = Callable[[str], int]
+
+TRUNCATION_MARK = "\n[… mensagem truncada]"
+
+def approx_tokens(text: str) -> int:
+    """Estimativa padrão: ~4 caracteres por token"""
+    return math.ceil(len(text) / 4)
+
+class TokenCounter:
+    """Conta tokens de mensagens com cache LRU por conteúdo.
+
+    `message_overhead` cobre os tokens de papel/formatação que o modelo adiciona a cada mensagem.
+    """
+
+    def __init__(self, tokenizer: Tokenizer = approx_tokens, cache_size: int = 8192, message_overhead: int = 4):
+        self.tokenizer = tokenizer
+        self.message_overhead = message_overhead
+        self._count = lru_cache(maxsize=cache_size)(tokenizer)
+
+    def count_text(self, text: str) -> int:
+        return self._count(text)
+
+    def count(self, message: Dict[str, str]) -> int:
+        return self._count(message["content"]) + self.message_overhead
+
+    def cache_info(self):
+        return self._count.cache_info()
+
+default_counter = TokenCounter()
+
+def set_tokenizer(tokenizer: Tokenizer, **kwargs):
+    """Troca o tokenizador padrão (ex.: `lambda t: len(enc.encode(t))` com tiktoken)"""
+    global default_counter
+    default_counter = TokenCounter(tokenizer, **kwargs)
+
+def truncate_text(text: str, max_tokens: int, counter: Optional[TokenCounter] = None) -> str:
+    """Maior prefixo de `text` (com a marca de corte) que cabe em `max_tokens` tokens"""
+    counter = counter or default_counter
+    if counter.count_text(text) <= max_tokens:
+        return text
+    # Busca binária no tokenizador puro: os prefixos não entram no cache por conteúdo
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if counter.tokenizer(text[:middle] + TRUNCATION_MARK) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low] + TRUNCATION_MARK
+
+def trim_history(history: List[Dict[str, str]], max_turns: int, max_tokens: Optional[int] = None,
+                 counter: Optional[TokenCounter] = None) -> List[Dict[str, str]]:
+    """Mantém as mensagens de sistema e as trocas mais recentes que cabem no orçamento.
+
+    Limites: no máximo `max_turns` trocas e, se `max_tokens` for informado, a soma de tokens
+    (sistema incluso) não ultrapassa o orçamento. A mensagem mais recente é sempre mantida e,
+    se sozinha já passa do orçamento (ex.: um texto longo colado), é truncada para caber.
+    `ValueError` se nem as mensagens de sistema cabem.
+    """
+    counter = counter or default_counter
+    system, dialog = [], []
+    for m in history:
+        if m["role"] == "system":
+            system.append(m)
+        elif m["role"] in ("user", "assistant"):
+            dialog.append(m)
+    if max_turns <= 0:
+        return system
+
+    budget = math.inf if max_tokens is None else max_tokens - sum(counter.count(m) for m in system)
+    if budget <= counter.message_overhead and dialog:
+        raise ValueError(f"orçamento de {max_tokens} tokens não comporta as mensagens de sistema")
+    kept = []
+    for m in reversed(dialog[-(max_turns * 2):]):
+        cost = counter.count(m)
+        if cost > budget:
+            if kept:
+                break
+            m = {**m, "content": truncate_text(m["content"], budget - counter.message_overhead, counter)}
+            cost = counter.count(m)
+        budget -= cost
+        kept.append(m)
+    kept.reverse()
+    return system + kept
@@ -0,0 +1,201 @@
+"""
+Cliente HTTP resiliente para as ferramentas do agente (APIs externas).
+
+- `requests.Session` com pool de conexões keep-alive e timeouts de conexão/leitura
+- novas tentativas com backoff exponencial e jitter ("full jitter") para falhas de rede,
+  timeouts e status 429/5xx, respeitando `Retry-After`
+- disjuntor (`CircuitBreaker`): após falhas seguidas, falha na hora por `reset_timeout`
+  segundos e depois deixa passar uma requisição de teste
+- requisições "hedged" opcionais: se a resposta não chega em `hedge_after` segundos, dispara
+  uma segunda cópia e fica com a que responder primeiro (corta a cauda de latência)
+
+Pode ser exercitado contra o stub com injeção de falhas `benchmarks/stub_server.py`.
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import observe
+
+Timeout = Union[float, Tuple[float, float]]
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+class CircuitOpenError(RuntimeError):
+    """O disjuntor está aberto: o upstream foi considerado indisponível"""
+
+class UpstreamStatusError(requests.HTTPError):
+    """Resposta 429/5xx que esgotou as tentativas"""
+
+# =========================
+# Disjuntor
+# =========================
+class CircuitBreaker:
+    """Fechado -> (N falhas seguidas) -> aberto -> (após `reset_timeout`) -> meio-aberto.
+
+    No estado meio-aberto só uma requisição de teste passa: sucesso fecha o disjuntor,
+    falha o reabre.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+            self._trial_in_flight = False
+
+# =========================
+# Cliente
+# =========================
+class ToolHTTPClient:
+    def __init__(self, name: str, timeout: Timeout = (3.05, 10), retries: int = 2,
+                 backoff: float = 0.2, max_backoff: float = 2.0,
+                 breaker: Optional[CircuitBreaker] = None, hedge_after: Optional[float] = None,
+                 pool_size: int = 20, sleep: Callable[[float], None] = time.sleep):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge_after = hedge_after
+        self.sleep = sleep
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._hedge_pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix=f"hedge-{name}") \
+            if hedge_after is not None else None
+        self._counts = {"requests": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "rejected": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, key: str):
+        with self._lock:
+            self._counts[key] += 1
+
+    def _attempt(self, url: str, timeout: Timeout, **kwargs) -> requests.Response:
+        start = time.perf_counter()
+        try:
+            return self.session.get(url, timeout=timeout, **kwargs)
+        finally:
+            observe(f"http_{self.name}", time.perf_counter() - start)
+
+    def _send(self, url: str, timeout: Timeout, **kwargs) -> requests.Response:
+        """Uma tentativa, com cópia "hedged" se a primeira demorar mais que `hedge_after`"""
+        self._count("requests")
+        if self._hedge_pool is None:
+            return self._attempt(url, timeout, **kwargs)
+        primary = self._hedge_pool.submit(self._attempt, url, timeout, **kwargs)
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done:
+            return primary.result()
+        self._count("hedges")
+        hedge = self._hedge_pool.submit(self._attempt, url, timeout, **kwargs)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _delay(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def get(self, url: str, timeout: Optional[Timeout] = None, **kwargs) -> requests.Response:
+        """GET com tentativas e disjuntor; levanta exceção se não houver resposta 2xx/4xx"""
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise CircuitOpenError(f"{self.name}: upstream indisponível (disjuntor aberto)")
+        timeout = timeout or self.timeout
+        healthy = False
+        try:
+            for attempt in range(self.retries + 1):
+                last = attempt == self.retries
+                try:
+                    response = self._send(url, timeout, **kwargs)
+                except (requests.ConnectionError, requests.Timeout):
+                    if last:
+                        raise
+                    self._count("retries")
+                    self.sleep(self._delay(attempt))
+                    continue
+                if response.status_code in RETRY_STATUSES:
+                    if last:
+                        raise UpstreamStatusError(f"{self.name}: HTTP {response.status_code}", response=response)
+                    self._count("retries")
+                    self.sleep(self._delay(attempt, response))
+                    continue
+                # 2xx e 4xx (erro do pedido, não do upstream) contam como upstream saudável
+                healthy = True
+                return response
+        finally:
+            # Todo desfecho registra no disjuntor (inclusive exceções inesperadas, como
+            # `ChunkedEncodingError`), senão a requisição de teste do meio-aberto nunca é liberada
+            if healthy:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+
+    def get_json(self, url: str, **kwargs) -> Any:
+        response = self.get(url, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+        counts["breaker"] = self.breaker.state
+        return counts
+
+    def close(self):
+        self.session.close()
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
@@ -0,0 +1,116 @@
+"""
+Detecção de intenção por dicionário de entidades (países).
+
+Os nomes e apelidos de países (PT/EN, padrão ISO 3166) ficam em `data/country_aliases.json`
+e são compilados uma única vez, na importação, num autômato Aho-Corasick. Uma única
+passada sobre o texto normalizado (minúsculas, sem acentos e pontuação) encontra todas as
+menções, respeitando limites de palavra ("usa" não casa dentro de "usando").
+"""
+
+import json
+import re
+import unicodedata
+from collections import deque, namedtuple
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DATA_DIR = Path(__file__).parent / "data"
+ALIASES_FILE = DATA_DIR / "country_aliases.json"
+
+CountryMention = namedtuple("CountryMention", ["code", "name", "alias"])
+
+_NON_WORD_RE = re.compile(r"[^\w]+")
+
+def fold(text: str) -> str:
+    """Normaliza para casamento: minúsculas, sem acentos, pontuação vira espaço único"""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(_NON_WORD_RE.sub(" ", text).split())
+
+class AhoCorasick:
+    """Autômato Aho-Corasick sobre caracteres (goto/fail/output em listas)"""
+
+    def __init__(self, patterns: Dict[str, object]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, object]]] = [[]]
+        for pattern, value in patterns.items():
+            self._insert(pattern, value)
+        self._build_links()
+
+    def _insert(self, pattern: str, value: object):
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((len(pattern), value))
+
+    def _build_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, object]]:
+        """Gera (início, fim, valor) de todas as ocorrências, inclusive sobrepostas"""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, value in out[state]:
+                yield i + 1 - length, i + 1, value
+
+    def __len__(self):
+        return len(self._goto)
+
+class CountryDetector:
+    """Encontra menções a países usando o autômato compilado"""
+
+    def __init__(self, countries: Dict[str, Dict]):
+        self.names = {code: info["name"] for code, info in countries.items()}
+        # Espaços nas bordas garantem o casamento apenas em palavras inteiras
+        patterns = {f" {alias} ": (code, alias) for code, info in countries.items() for alias in info["aliases"]}
+        self.automaton = AhoCorasick(patterns)
+
+    @classmethod
+    def from_file(cls, path: Path = ALIASES_FILE) -> "CountryDetector":
+        with open(path, encoding="utf-8") as fh:
+            return cls(json.load(fh))
+
+    def find_all(self, text: str) -> List[CountryMention]:
+        """Todas as menções (sem repetir país), na ordem em que aparecem no texto"""
+        matches = sorted(self.automaton.iter_matches(f" {fold(text)} "), key=lambda m: (m[0], m[0] - m[1]))
+        mentions, seen, last_end = [], set(), 0
+        for start, end, (code, alias) in matches:
+            # Descarta casamentos contidos em outro mais longo (ex.: "guinea" em "papua new guinea");
+            # o espaço de borda pode ser compartilhado entre menções vizinhas
+            if start + 1 < last_end:
+                continue
+            last_end = end
+            if code not in seen:
+                seen.add(code)
+                mentions.append(CountryMention(code, self.names[code], alias))
+        return mentions
+
+    def find_first(self, text: str) -> Optional[CountryMention]:
+        mentions = self.find_all(text)
+        return mentions[0] if mentions else None
+
+country_detector = CountryDetector.from_file()
+
+def find_countries(text: str) -> List[CountryMention]:
+    return country_detector.find_all(text)
@@ -0,0 +1,124 @@
+"""
+Agente LangChain do `app_v2.py`: ferramenta de países, LLM simulado (`MockOCI`) e montagem do
+`AgentExecutor` no formato ReAct.
+
+Fica num módulo separado para que a pilha do LangChain (a importação mais cara do projeto) só
+seja carregada na primeira mensagem enviada, e não a cada início de processo do Streamlit.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from langchain.agents import AgentExecutor, create_react_agent
+from langchain_core.language_models.llms import LLM
+from langchain_core.prompts import PromptTemplate
+from langchain_core.tools import Tool
+
+from country_info import country_capital, fetch_country
+from intent import country_detector
+from memory import Message, extractive_summary
+from metrics import span
+from prompting import PERSONAS, STYLES
+
+# =========================
+# Ferramenta de API Externa (Country Info)
+# =========================
+@span("tool")
+def get_country_info(country_name: str) -> str:
+    """Busca informações sobre um país específico, como capital, população e região. Use esta ferramenta quando o usuário perguntar sobre dados de um país."""
+    try:
+        data = fetch_country(country_name)
+        return f"Informações sobre {data['name']['common']}:\n- Capital: {country_capital(data)}\n- População: {data['population']:,}\n- Região: {data['region']} ({data['subregion']})"
+    except Exception as e:
+        return f"Não foi possível obter informações para '{country_name}'. Verifique o nome e tente novamente. Erro: {e}"
+
+# Criar a ferramenta usando a classe Tool
+country_tool = Tool(
+    name="get_country_info",
+    description="Busca informações sobre um país específico, como capital, população e região. Use esta ferramenta quando o usuário perguntar sobre dados de um país.",
+    func=get_country_info
+)
+
+tools = [country_tool]
+
+# =========================
+# LLM Customizado (Modo Simulação)
+# =========================
+class MockOCI(LLM):
+    @property
+    def _llm_type(self) -> str:
+        return "mock_oci"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any) -> str:
+        # Extrai a última pergunta do usuário do prompt complexo do agente
+        user_last_question = prompt.split("Pergunta:")[-1].strip()
+
+        # Verifica se a pergunta é sobre um país
+        country = country_detector.find_first(user_last_question)
+        if country:
+            return f"""
+            Pensamento: O usuário está perguntando sobre um país. Devo usar a ferramenta `get_country_info`.
+            Ação: get_country_info
+            Entrada da Ação: {country.name}
+            """
+        else:
+            return f"""
+            Pensamento: O usuário está fazendo uma pergunta geral. Não preciso de ferramentas.
+            Resposta Final: Entendi sua pergunta sobre '{user_last_question}'. Como um modelo de linguagem avançado, posso ajudar com informações gerais, mas para dados em tempo real, minhas ferramentas são mais úteis.
+            """
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model": "mock_oci_v1"}
+
+    def summarize(self, summary: str, messages: List[Message]) -> str:
+        """Resumidor da `SummaryMemory` no modo simulação"""
+        return extractive_summary(summary, messages)
+
+# =========================
+# Fábrica de Agentes
+# =========================
+def build_agent_executor(persona: str, style: str, tools: List[Tool]) -> AgentExecutor:
+    """Monta o agente ReAct (prompt, LLM simulado e ferramentas), sem memória própria"""
+    # Constrói o prompt do sistema
+    system_prompt_text = f"""Você é um assistente especializado com foco em {persona}.
+    Persona: {PERSONAS[persona]}
+    Estilo: {style}. {STYLES[style]}
+    Regras: Responda em PT-BR. Seja útil e honesto. Use suas ferramentas quando necessário."""
+
+    # Configuração do Agente LangChain
+    llm = MockOCI()
+    prompt = PromptTemplate.from_template(
+        f"""{system_prompt_text}
+
+Você tem acesso às seguintes ferramentas:
+{{tools}}
+
+Use o seguinte formato:
+
+Pergunta: a pergunta de entrada que você deve responder
+Pensamento: você deve sempre pensar sobre o que fazer
+Ação: a ação a ser tomada, deve ser uma de [{{tool_names}}]
+Entrada da Ação: a entrada para a ação
+Observação: o resultado da ação
+... (este Pensamento/Ação/Entrada da Ação/Observação pode se repetir N vezes)
+Pensamento: Agora sei a resposta final
+Resposta Final: a resposta final para a pergunta original
+
+Comece!
+
+{{chat_history}}
+
+Pergunta: {{input}}
+Pensamento: {{agent_scratchpad}}"""
+    )
+    agent = create_react_agent(llm, tools, prompt)
+    # Os passos intermediários dizem se o agente chegou à resposta final (ver `reached_final_answer`)
+    return AgentExecutor(agent=agent, tools=tools, verbose=True, handle_parsing_errors=True,
+                         return_intermediate_steps=True)
+
+def reached_final_answer(executor: AgentExecutor, response: Dict[str, Any]) -> bool:
+    """False quando o agente parou pelo limite de iterações ou de tempo, sem resposta final"""
+    if executor.max_execution_time is not None:
+        return False  # a parada por tempo não deixa rastro na resposta: na dúvida, não confia
+    steps = response.get("intermediate_steps", [])
+    return executor.max_iterations is None or len(steps) < executor.max_iterations
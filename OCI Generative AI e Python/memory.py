@@ -0,0 +1,372 @@
+"""
+Memória de conversa do SmartAgent.
+
+`SimpleMemory` guarda as mensagens num buffer circular (`deque` com `maxlen`) com a linha de
+contexto de cada uma já renderizada: `add_message` custa O(1) independentemente do tamanho da
+conversa, e `get_context` junta as linhas da janela só quando pedido, em cache até a próxima
+inserção.
+
+`SummaryMemory` acrescenta um segundo nível: as mensagens que saem da janela recente não são
+esquecidas, e sim comprimidas num resumo contínuo, em segundo plano, por um resumidor plugável
+(`Summarizer`: `(resumo_atual, mensagens) -> novo_resumo`). O contexto enviado ao modelo é
+resumo + janela recente, com tamanho constante em conversas longas. O resumidor padrão é
+extrativo (sem LLM); `OCIClient.summarize` implementa a mesma interface com o modelo.
+
+`RetrievalMemory` acrescenta a memória de longo prazo: cada mensagem é vetorizada (modelo local
+do `sentence-transformers` ou `HashingEmbedder`, ver `embeddings.py`) numa matriz NumPy — em
+disco via `np.memmap`, se desejado — e, a cada pergunta, as `top_k` mensagens antigas mais
+parecidas (cosseno vetorizado) entram no contexto junto com o resumo e a janela recente.
+`create_memory()` escolhe o nível conforme `MEMORY_EMBEDDINGS`. O NumPy só é importado quando o
+índice vetoriza as primeiras mensagens.
+"""
+
+import itertools
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+from embeddings import Embedder, HashingEmbedder, load_embedder
+from metrics import span
+
+if TYPE_CHECKING:
+    import numpy as np
+
+ROLE_LABELS = {"user": "Usuário", "assistant": "Assistente"}
+_message_ids = itertools.count(1)
+
+class Message:
+    """Mensagem da conversa com a linha de contexto pré-renderizada e um id único no processo"""
+    __slots__ = ("id", "role", "content", "line")
+
+    def __init__(self, role: str, content: str):
+        self.id = next(_message_ids)
+        self.role = role
+        self.content = content
+        self.line = f"{ROLE_LABELS.get(role, 'Assistente')}: {content}\n"
+
+class SimpleMemory:
+    def __init__(self, max_turns=10, context_messages=6):
+        self.max_turns = max_turns
+        self.context_messages = context_messages  # últimas 3 trocas por padrão
+        self.messages = deque(maxlen=max_turns * 2)
+        self._window = deque(maxlen=context_messages)
+        self._context: Optional[str] = None  # janela renderizada; None após cada inserção
+
+    def add_message(self, role: str, content: str):
+        message = Message(role, content)
+        self.messages.append(message)  # o deque descarta a mais antiga ao exceder o limite
+
+        if self.context_messages:
+            self._window.append(message)
+            self._context = None
+        return message
+
+    def _recent_context(self) -> str:
+        context = self._context
+        if context is None:
+            context = self._context = "".join(m.line for m in self._window)
+        return context
+
+    def get_context(self, query: Optional[str] = None) -> str:
+        """Contexto recente; `query` só é usada pelas memórias com recuperação"""
+        return self._recent_context()
+
+    def restore(self, history: List[Dict[str, str]]):
+        """Recarrega uma conversa salva (`{"role", "content"}` em ordem)"""
+        for m in history:
+            self.add_message(m["role"], m["content"])
+
+    def clear(self):
+        self.messages.clear()
+        self._window.clear()
+        self._context = None
+
+# =========================
+# Resumo contínuo
+# =========================
+Summarizer = Callable[[str, List[Message]], str]
+
+SUMMARY_MAX_CHARS = 1200
+SUMMARY_PROMPT = (
+    "Atualize o resumo da conversa incorporando as novas mensagens. Mantenha fatos, nomes, "
+    "números, preferências do usuário e pendências; descarte cumprimentos e repetições. "
+    "Responda só com o resumo, em PT-BR, em no máximo {max_chars} caracteres."
+)
+
+def _first_sentence(text: str, limit: int = 160) -> str:
+    text = " ".join(text.split())
+    for sep in (". ", "? ", "! ", "\n"):
+        cut = text.find(sep)
+        if 0 < cut < limit:
+            return text[:cut + 1]
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+def extractive_summary(summary: str, messages: List[Message], max_chars: int = SUMMARY_MAX_CHARS) -> str:
+    """Resumidor sem LLM: primeira frase de cada mensagem, descartando as linhas mais antigas"""
+    lines = summary.splitlines() if summary else []
+    lines += [f"- {ROLE_LABELS.get(m.role, 'Assistente')}: {_first_sentence(m.content)}" for m in messages]
+    while lines and sum(len(line) + 1 for line in lines) > max_chars:
+        lines.pop(0)
+    return "\n".join(lines)
+
+def summary_prompt(summary: str, messages: List[Message], max_chars: int = SUMMARY_MAX_CHARS) -> List[Dict[str, str]]:
+    """Mensagens para um resumidor baseado em LLM"""
+    new = "".join(m.line for m in messages)
+    return [
+        {"role": "system", "content": SUMMARY_PROMPT.format(max_chars=max_chars)},
+        {"role": "user", "content": f"Resumo atual:\n{summary or '(vazio)'}\n\nNovas mensagens:\n{new}"},
+    ]
+
+def render_context(messages: List[Dict[str, str]]) -> str:
+    """Contexto em texto (como `get_context`) a partir de `prompt_messages`, sem repetir a busca"""
+    return "".join(f"{m['content']}\n\n" if m["role"] == "system"
+                   else f"{ROLE_LABELS.get(m['role'], 'Assistente')}: {m['content']}\n" for m in messages)
+
+_summary_executor = ThreadPoolExecutor(max_workers=int(os.getenv("MEMORY_SUMMARY_WORKERS", "2")),
+                                       thread_name_prefix="summary")
+
+class SummaryMemory(SimpleMemory):
+    """Janela recente + resumo contínuo das mensagens que saíram dela.
+
+    As mensagens despejadas da janela entram em `pending` e, a cada `summarize_every`, um único
+    trabalho por memória as incorpora ao resumo no pool compartilhado. Até lá elas continuam no
+    contexto; se o resumidor falhar ou ficar para trás, `pending` é limitado a `max_pending` e as
+    mais antigas são descartadas (o comportamento da janela simples).
+    """
+
+    def __init__(self, max_turns=10, context_messages=6, summarizer: Optional[Summarizer] = None,
+                 summarize_every: int = 4, summary_max_chars: int = SUMMARY_MAX_CHARS,
+                 max_pending: Optional[int] = None):
+        super().__init__(max_turns, context_messages)
+        self.summarizer = summarizer or extractive_summary
+        self.summarize_every = max(1, summarize_every)
+        self.summary_max_chars = summary_max_chars
+        self.max_pending = max_pending or self.summarize_every * 4
+        self.summary = ""
+        self.pending: List[Message] = []
+        self._job: Optional[Future] = None
+        self._generation = 0  # invalida trabalhos em andamento após `clear()`
+        self._lock = threading.Lock()
+
+    def add_message(self, role: str, content: str):
+        evicted = self._window[0] if self.context_messages and len(self._window) == self.context_messages else None
+        message = super().add_message(role, content)
+        if evicted is not None:
+            with self._lock:
+                self.pending.append(evicted)
+                if len(self.pending) > self.max_pending:
+                    del self.pending[:len(self.pending) - self.max_pending]
+                self._schedule()
+        return message
+
+    def _schedule(self):
+        """Dispara o resumo se houver mensagens suficientes e nenhum trabalho em andamento (com lock)"""
+        if self._job is None and len(self.pending) >= self.summarize_every:
+            self._job = _summary_executor.submit(self._summarize, list(self.pending), self._generation)
+
+    def _summarize(self, batch: List[Message], generation: int):
+        try:
+            with span("summarize"):
+                summary = self.summarizer(self.summary, batch)[-self.summary_max_chars:]
+        except Exception:
+            summary = None
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._job = None
+            if summary is not None:
+                self.summary = summary
+                # `pending` pode ter sido aparado enquanto o resumo rodava
+                done = sum(1 for m in batch if m in self.pending)
+                del self.pending[:done]
+                self._schedule()
+
+    def restore(self, history: List[Dict[str, str]]):
+        """Recarrega uma conversa salva: só a janela recente passa por `add_message`; as mensagens
+        anteriores viram o resumo num único trabalho, em vez de um trabalho por despejo"""
+        split = max(0, len(history) - self.context_messages)
+        older = [Message(m["role"], m["content"]) for m in history[:split]]
+        self.messages.extend(older)
+        self._archive(older)
+        for m in history[split:]:
+            self.add_message(m["role"], m["content"])
+        if older:
+            with self._lock:
+                if self._job is None:
+                    self._job = _summary_executor.submit(self._summarize, older, self._generation)
+                else:  # resumo de outra origem em andamento: entra na fila normal
+                    self.pending[:0] = older[-self.max_pending:]
+
+    def _archive(self, messages: List[Message]):
+        """Mensagens antigas restauradas sem passar pela janela (ganchos das subclasses)"""
+
+    def wait(self, timeout: Optional[float] = None):
+        """Aguarda o resumo em andamento (útil em testes e benchmarks)"""
+        job = self._job
+        if job is not None:
+            job.result(timeout)
+
+    def get_context(self, query: Optional[str] = None) -> str:
+        with self._lock:
+            summary, pending = self.summary, list(self.pending)
+        header = f"Resumo da conversa anterior:\n{summary}\n\n" if summary else ""
+        return header + "".join(m.line for m in pending) + self._recent_context()
+
+    def prompt_messages(self, query: Optional[str] = None) -> List[Dict[str, str]]:
+        """Resumo (como mensagem de sistema) + mensagens ainda não resumidas, em ordem"""
+        with self._lock:
+            summary, pending = self.summary, list(self.pending)
+        messages = [{"role": "system", "content": f"Resumo da conversa anterior:\n{summary}"}] if summary else []
+        return messages + [{"role": m.role, "content": m.content} for m in pending + list(self._window)]
+
+    def clear(self):
+        super().clear()
+        with self._lock:
+            self._generation += 1
+            self.summary = ""
+            self.pending.clear()
+            self._job = None
+
+# =========================
+# Memória de longo prazo (recuperação)
+# =========================
+class TurnIndex:
+    """Matriz (n × dim) com o embedding de cada mensagem, na ordem da conversa.
+
+    A capacidade dobra quando enche (inserção amortizada O(1)); com `path`, a matriz é um
+    `np.memmap` em disco e só as páginas tocadas pela busca ficam residentes. Os vetores são
+    calculados em lote na busca seguinte, não a cada mensagem.
+    """
+
+    def __init__(self, embedder: Embedder, path: Optional[str] = None, capacity: int = 1024):
+        self.embedder = embedder
+        self.path = path
+        self.capacity = capacity
+        self.messages: List[Message] = []
+        self.matrix: Optional["np.ndarray"] = None
+        self._embedded = 0  # mensagens já vetorizadas (prefixo de `messages`)
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def add(self, message: Message):
+        self.messages.append(message)
+
+    def _allocate(self, rows: int, dim: int) -> "np.ndarray":
+        import numpy as np
+        if self.path is None:
+            return np.zeros((rows, dim), dtype=np.float32)
+        return np.lib.format.open_memmap(f"{self.path}.{rows}", mode="w+", dtype=np.float32, shape=(rows, dim))
+
+    def _grow(self, needed: int, dim: int):
+        capacity = max(self.capacity, 1)
+        while capacity < needed:
+            capacity *= 2
+        matrix = self._allocate(capacity, dim)
+        if self.matrix is not None:
+            matrix[:self._embedded] = self.matrix[:self._embedded]
+            if self.path is not None:
+                old = self.matrix.filename
+                del self.matrix
+                os.remove(old)
+        self.matrix = matrix
+        self.capacity = capacity
+
+    def _embed_pending(self):
+        if self._embedded == len(self.messages):
+            return
+        with span("memory_embed"):
+            vectors = self.embedder([m.content for m in self.messages[self._embedded:]])
+            if self.matrix is None or len(self.messages) > self.capacity:
+                self._grow(len(self.messages), vectors.shape[1])
+            self.matrix[self._embedded:len(self.messages)] = vectors
+            self._embedded = len(self.messages)
+
+    def search(self, query: str, k: int, limit: Optional[int] = None,
+               min_score: float = 0.0) -> List[Tuple[float, Message]]:
+        """As `k` mensagens mais parecidas entre as `limit` primeiras, em ordem cronológica"""
+        import numpy as np
+        self._embed_pending()
+        n = len(self.messages) if limit is None else min(limit, len(self.messages))
+        if k <= 0 or n <= 0:
+            return []
+        with span("memory_search"):
+            last = len(self.messages) - 1
+            # a pergunta costuma ser a última mensagem, já vetorizada
+            vector = self.matrix[last] if self.messages[last].content == query else self.embedder([query])[0]
+            scores = self.matrix[:n] @ vector
+            top = np.argpartition(-scores, k - 1)[:k] if n > k else np.arange(n)
+            top = top[scores[top] >= min_score]
+        return [(float(scores[i]), self.messages[i]) for i in np.sort(top)]
+
+    def clear(self):
+        self.messages.clear()
+        self._embedded = 0
+        if self.path is not None and self.matrix is not None:
+            old = self.matrix.filename
+            self.matrix = None
+            os.remove(old)
+        self.matrix = None
+
+class RetrievalMemory(SummaryMemory):
+    """Resumo + janela recente + as `top_k` mensagens antigas mais relevantes para a pergunta.
+
+    A busca considera só as mensagens que já saíram do contexto (janela e `pending`), para não
+    repetir o que o modelo já recebe.
+    """
+
+    def __init__(self, max_turns=10, context_messages=6, embedder: Optional[Embedder] = None,
+                 top_k: int = 4, min_score: float = 0.2, index_path: Optional[str] = None, **kwargs):
+        super().__init__(max_turns, context_messages, **kwargs)
+        self.index = TurnIndex(embedder or HashingEmbedder(), path=index_path)
+        self.top_k = top_k
+        self.min_score = min_score
+
+    def add_message(self, role: str, content: str):
+        message = super().add_message(role, content)
+        self.index.add(message)
+        return message
+
+    def _archive(self, messages: List[Message]):
+        for message in messages:
+            self.index.add(message)
+
+    def recall(self, query: str) -> List[Tuple[float, Message]]:
+        with self._lock:
+            in_context = len(self.pending)
+        limit = len(self.index) - len(self._window) - in_context
+        return self.index.search(query, self.top_k, limit, self.min_score)
+
+    def get_context(self, query: Optional[str] = None) -> str:
+        context = super().get_context()
+        if not query:
+            return context
+        recalled = self.recall(query)
+        if not recalled:
+            return context
+        return ("Trechos relevantes de conversas anteriores:\n" + "".join(m.line for _, m in recalled)
+                + "\n" + context)
+
+    def prompt_messages(self, query: Optional[str] = None) -> List[Dict[str, str]]:
+        messages = super().prompt_messages()
+        if query:
+            recalled = self.recall(query)
+            if recalled:
+                lines = "".join(m.line for _, m in recalled)
+                messages.insert(0, {"role": "system",
+                                    "content": f"Trechos relevantes de conversas anteriores:\n{lines}"})
+        return messages
+
+    def clear(self):
+        super().clear()
+        self.index.clear()
+
+def create_memory(**kwargs) -> SimpleMemory:
+    """`RetrievalMemory` com o embedder de `MEMORY_EMBEDDINGS` (padrão `hashing`); `off` usa
+    só a `SummaryMemory`"""
+    embedder = load_embedder(os.getenv("MEMORY_EMBEDDINGS", "hashing"))
+    if embedder is None:
+        return SummaryMemory(**kwargs)
+    return RetrievalMemory(embedder=embedder, **kwargs)
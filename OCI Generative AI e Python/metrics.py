@@ -0,0 +1,265 @@
+"""
+Métricas de latência por etapa do caminho de requisição.
+
+Cada etapa (detecção de intenção, memória, prompt, ferramentas, geração, gravações no banco...)
+é medida com `span("etapa")` — gerenciador de contexto ou decorador — e agregada num histograma
+de buckets fixos por processo. Streams (geração token a token) usam `timed_stream` /
+`atimed_stream`, que contam só a espera por cada pedaço, não o tempo de quem os consome. O custo por medição é um `perf_counter`, um `bisect` e um lock,
+baixo o bastante para ficar sempre ligado.
+
+Exposição:
+- `render_prometheus()`: formato texto do Prometheus (`GET /metrics` no `service.py`)
+- `start_metrics_server(port)`: servidor HTTP mínimo para processos Streamlit (`METRICS_PORT`)
+- `summary()`: contagens, médias e percentis estimados, usados na página de diagnóstico
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+class Histogram:
+    """Histograma Prometheus com um rótulo (`stage`)"""
+
+    def __init__(self, name: str, help: str, label: str = "stage", buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[str, list] = {}  # valor do rótulo -> [contagens por bucket (+Inf), soma]
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, seconds: float):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += seconds
+
+    def collect(self) -> Dict[str, Tuple[List[int], float]]:
+        with self._lock:
+            return {k: (list(counts), total) for k, (counts, total) in self._series.items()}
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for value, (counts, total) in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{self.label}="{value}",le="{le}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{self.label}="{value}"}} {total}')
+            lines.append(f'{self.name}_count{{{self.label}="{value}"}} {cumulative}')
+        return lines
+
+    def quantile(self, counts: List[int], q: float) -> float:
+        """Estimativa por interpolação linear dentro do bucket (como `histogram_quantile`)"""
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                if i == len(self.buckets):  # bucket +Inf: devolve o maior limite finito
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+class Counter:
+    """Contador Prometheus com um rótulo"""
+
+    def __init__(self, name: str, help: str, label: str = "stage"):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._values: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value: str, amount: int = 1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def collect(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f'{self.name}{{{self.label}="{k}"}} {v}' for k, v in sorted(self.collect().items())]
+        return lines
+
+stage_seconds = Histogram("chat_stage_duration_seconds", "Duração de cada etapa do processamento de uma mensagem")
+stage_errors = Counter("chat_stage_errors_total", "Etapas que terminaram com exceção")
+REGISTRY = [stage_seconds, stage_errors]
+
+# =========================
+# Medição
+# =========================
+class span:
+    """Mede a etapa: `with span("intent"): ...` ou `@span("tool")` sobre uma função"""
+    __slots__ = ("stage", "_start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        stage_seconds.observe(self.stage, time.perf_counter() - self._start)
+        if exc_type is not None:
+            stage_errors.inc(self.stage)
+        return False
+
+    def __call__(self, func):
+        stage = self.stage
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+
+def observe(stage: str, seconds: float):
+    """Registra uma duração medida por fora (ex.: tempo até o primeiro token)"""
+    stage_seconds.observe(stage, seconds)
+
+def timed_stream(stage: str, chunks: Iterable, first_stage: Optional[str] = None) -> Iterator:
+    """Repassa `chunks` medindo em `stage` só a espera pelos pedaços (a renderização de quem
+    consome fica de fora) e, com `first_stage`, o tempo até o primeiro pedaço"""
+    iterator = iter(chunks)
+    started = time.perf_counter()
+    waited, first, failed = 0.0, True, False
+    try:
+        while True:
+            before = time.perf_counter()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            except Exception:
+                failed = True
+                raise
+            finally:
+                waited += time.perf_counter() - before
+            if first and first_stage:
+                observe(first_stage, time.perf_counter() - started)
+            first = False
+            yield chunk
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()  # consumidor desistiu: libera a geração
+        stage_seconds.observe(stage, waited)
+        if failed:
+            stage_errors.inc(stage)
+
+async def atimed_stream(stage: str, chunks: AsyncIterator, first_stage: Optional[str] = None) -> AsyncIterator:
+    """`timed_stream` para async iterators"""
+    started = time.perf_counter()
+    waited, first, failed = 0.0, True, False
+    try:
+        while True:
+            before = time.perf_counter()
+            try:
+                chunk = await chunks.__anext__()
+            except StopAsyncIteration:
+                return
+            except Exception:
+                failed = True
+                raise
+            finally:
+                waited += time.perf_counter() - before
+            if first and first_stage:
+                observe(first_stage, time.perf_counter() - started)
+            first = False
+            yield chunk
+    finally:
+        aclose = getattr(chunks, "aclose", None)
+        if aclose is not None:
+            await aclose()
+        stage_seconds.observe(stage, waited)
+        if failed:
+            stage_errors.inc(stage)
+
+# =========================
+# Exposição
+# =========================
+def render_prometheus() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+def summary() -> List[Dict[str, float]]:
+    """Uma linha por etapa: chamadas, erros, média e percentis estimados (ms)"""
+    errors = stage_errors.collect()
+    rows = []
+    for stage, (counts, total) in sorted(stage_seconds.collect().items()):
+        n = sum(counts)
+        rows.append({
+            "etapa": stage,
+            "chamadas": n,
+            "erros": errors.get(stage, 0),
+            "média_ms": total / n * 1000 if n else 0.0,
+            "p50_ms": stage_seconds.quantile(counts, 0.50) * 1000,
+            "p95_ms": stage_seconds.quantile(counts, 0.95) * 1000,
+            "p99_ms": stage_seconds.quantile(counts, 0.99) * 1000,
+            "total_s": total,
+        })
+    return rows
+
+def reset():
+    for metric in REGISTRY:
+        metric.reset()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+_server_lock = threading.Lock()
+_server: Optional[ThreadingHTTPServer] = None
+
+def start_metrics_server(port: Optional[int] = None, host: str = "0.0.0.0") -> Optional[ThreadingHTTPServer]:
+    """Sobe `/metrics` numa thread daemon (uma vez por processo); porta padrão em `METRICS_PORT`"""
+    global _server
+    port = port if port is not None else int(os.getenv("METRICS_PORT", "0") or 0)
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError:  # porta já em uso (ex.: outro processo)
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
@@ -0,0 +1,452 @@
+"""
+Cliente OCI Generative AI compartilhado pelos apps Streamlit.
+
+- `OCIClient`: cliente síncrono usado pelas páginas (barato de instanciar a cada rerun)
+- `AsyncOCIClient`: cliente asyncio com pool de conexões keep-alive e limitador de concorrência
+- `RoutedOCIClient`: mesma interface sobre vários endpoints/regiões, escolhendo o endpoint por
+  latência e requisições em voo e trocando de endpoint quando um falha (`router.py`)
+- `get_shared_client()`: instância única do cliente assíncrono por processo (roteado quando há
+  mais de um endpoint configurado), rodando num event loop em thread própria, compartilhada por
+  todas as sessões do Streamlit
+
+Os dois clientes também têm uma chamada em lote (`generate_batch` / `agenerate_batch`), usada
+pelo micro-batching de `batching.py` (`LLM_BATCH_MAX_SIZE` > 1). O `httpx` só é importado quando
+um cliente assíncrono abre a primeira conexão; o modo simulação não o carrega.
+"""
+
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Iterator, AsyncIterator, Tuple, Union
+
+from pydantic import BaseModel, Field
+
+from batching import get_batcher
+from memory import Message, extractive_summary, summary_prompt
+from router import EndpointRouter, endpoint_urls
+
+if TYPE_CHECKING:
+    import httpx
+
+# =========================
+# Modelos de parâmetros
+# =========================
+class GenParams(BaseModel):
+    temperature: float = Field(0.5, ge=0.0, le=1.0)
+    top_p: float = Field(0.9, ge=0.0, le=1.0)
+    max_tokens: int = Field(512, ge=64, le=4096)
+    memory_turns: int = Field(6, ge=0, le=20)
+    context_tokens: int = Field(4096, ge=256, le=128000)
+
+# =========================
+# Backend de simulação
+# =========================
+_TOKEN_RE = re.compile(r"\S+\s*|\s+")
+
+def mock_response(messages: List[Dict[str, str]], params: GenParams) -> str:
+    """Resposta simulada para desenvolvimento"""
+    user_last = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+    system_msg = next((m["content"] for m in messages if m["role"] == "system"), "")
+
+    # Gerar resposta simulada baseada na persona
+    responses = {
+        "Professor": f"Como educador, vou explicar isso passo a passo. Primeiro, é importante entender que '{user_last}' pode ser abordado de várias perspectivas. Vamos começar com os fundamentos...",
+        "Suporte Técnico": f"Para resolver isso, vamos seguir um processo de troubleshooting: 1) Verifique X, 2) Confirme Y, 3) Teste Z. Isso deve resolver o problema relacionado a '{user_last}'.",
+        "Contador de Histórias": f"Isso me lembra uma história... Era uma vez alguém que enfrentou um desafio similar a '{user_last}'. Eles descobriram que a melhor abordagem era...",
+        "Analista": f"Analisando sua pergunta sobre '{user_last}', os dados mostram que 72% dos casos similares são resolvidos com a abordagem A, 23% com B, e 5% requerem intervenção especializada.",
+        "Assistente": f"Entendi sua pergunta sobre '{user_last}'. Posso ajudar com informações detalhadas, exemplos práticos e orientações passo a passo."
+    }
+
+    # Identificar persona ativa
+    persona = next((k for k in responses if k.lower() in system_msg.lower()), "Assistente")
+    return f"{responses[persona]}\n\n*(Modo simulação - {persona} | temp={params.temperature})*"
+
+def mock_tokens(text: str) -> List[str]:
+    """Quebra o texto em tokens (palavra + espaço) para simular streaming"""
+    return _TOKEN_RE.findall(text)
+
+def mock_batch(requests: List[Tuple[List[Dict[str, str]], GenParams]]) -> Tuple[List[str], int]:
+    """Respostas simuladas de um lote e o número de passos de decodificação (a maior resposta)"""
+    responses = [mock_response(messages, params) for messages, params in requests]
+    return responses, max((len(mock_tokens(r)) for r in responses), default=0)
+
+# =========================
+# Cliente síncrono
+# =========================
+class OCIClient:
+    def __init__(self, mode: str = "mock", token_delay: float = 0.0):
+        self.mode = mode
+        self.token_delay = token_delay  # atraso simulado por token no modo mock
+        self.compartment = os.getenv("OCI_COMPARTMENT_OCID", "")
+
+    def generate(self, messages: List[Dict[str, str]], params: GenParams) -> str:
+        """Gera a resposta completa (modo simulação ou endpoint OCI)"""
+        if self.mode != "mock":
+            client = get_shared_client()
+            batcher = get_batcher(client)
+            if batcher is not None:
+                # Pedidos simultâneos de todas as sessões saem juntos numa chamada em lote
+                return _runtime().run(batcher.submit(messages, params))
+        return "".join(self.generate_stream(messages, params))
+
+    def generate_batch(self, requests: List[Tuple[List[Dict[str, str]], GenParams]]) -> List[Union[str, BaseException]]:
+        """Gera as respostas de vários prompts numa única chamada ao backend"""
+        if self.mode == "mock":
+            responses, steps = mock_batch(requests)
+            if self.token_delay:
+                time.sleep(self.token_delay * steps)
+            return responses
+        return _runtime().run(get_shared_client().agenerate_batch(requests))
+
+    def generate_stream(self, messages: List[Dict[str, str]], params: GenParams) -> Iterator[str]:
+        """Gera a resposta em pedaços (tokens) à medida que ficam disponíveis"""
+        if self.mode == "mock":
+            return self._mock_stream(messages, params)
+        # Modo OCI: usa o cliente assíncrono compartilhado (pool + limitador) do processo
+        client = get_shared_client()
+        return _runtime().iterate(client.agenerate_stream(messages, params))
+
+    def summarize(self, summary: str, messages: List[Message]) -> str:
+        """Resumidor para `SummaryMemory`: extrativo no modo simulação, o próprio modelo no OCI"""
+        if self.mode == "mock":
+            return extractive_summary(summary, messages)
+        params = GenParams(temperature=0.0, top_p=1.0, max_tokens=512)
+        return self.generate(summary_prompt(summary, messages), params).strip()
+
+    def _mock_stream(self, messages: List[Dict[str, str]], params: GenParams) -> Iterator[str]:
+        """Simula a geração token a token a partir da resposta simulada"""
+        for token in mock_tokens(mock_response(messages, params)):
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            yield token
+
+# =========================
+# Limitador de concorrência (FIFO)
+# =========================
+class FairLimiter:
+    """Semáforo assíncrono que atende quem espera em ordem de chegada.
+
+    Quando o limite é atingido, novos pedidos entram numa fila FIFO; ao liberar uma vaga
+    ela é repassada diretamente ao próximo da fila, sem que recém-chegados furem a fila.
+    """
+
+    def __init__(self, limit: int):
+        if limit < 1:
+            raise ValueError("limit deve ser >= 1")
+        self.limit = limit
+        self.in_flight = 0
+        self._waiters: deque = deque()
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for w in self._waiters if not w.done())
+
+    async def acquire(self):
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # A vaga já tinha sido repassada: devolve para o próximo
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # repassa a vaga; in_flight não muda
+                return
+        self.in_flight -= 1
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+# =========================
+# Cliente assíncrono
+# =========================
+class AsyncOCIClient:
+    """Cliente OCI GenAI com conexões keep-alive reaproveitadas entre chamadas.
+
+    O `httpx.AsyncClient` é criado sob demanda no event loop em que é usado pela primeira
+    vez; todas as chamadas passam pelo `FairLimiter`, que limita as requisições em voo.
+    """
+
+    CHAT_PATH = "/20231130/actions/chat"
+
+    def __init__(self, mode: str = "oci", endpoint: Optional[str] = None,
+                 compartment: Optional[str] = None, model_id: Optional[str] = None,
+                 max_concurrency: int = 8, max_connections: int = 20,
+                 timeout: float = 60.0, auth: Optional["httpx.Auth"] = None,
+                 token_delay: float = 0.0, batch_path: Optional[str] = None):
+        self.mode = mode
+        self.endpoint = (endpoint if endpoint is not None else os.getenv("OCI_ENDPOINT_URL", "")).rstrip("/")
+        self.compartment = compartment if compartment is not None else os.getenv("OCI_COMPARTMENT_OCID", "")
+        self.model_id = model_id if model_id is not None else os.getenv("OCI_MODEL_ID", "cohere.command-r-plus")
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.auth = auth  # ex.: signer de requisições OCI adaptado para httpx
+        self.token_delay = token_delay
+        # Rota de lote de um endpoint próprio (ex.: gateway de modelo self-hosted); vazio = sem lote nativo
+        self.batch_path = batch_path if batch_path is not None else os.getenv("OCI_BATCH_PATH", "")
+        self.limiter = FairLimiter(max_concurrency)
+        self._http: Optional["httpx.AsyncClient"] = None
+
+    def _client(self) -> "httpx.AsyncClient":
+        if self._http is None:
+            import httpx
+            if not self.endpoint:
+                raise RuntimeError("OCI_ENDPOINT_URL não configurado. Ative o modo simulação ou configure o .env")
+            self._http = httpx.AsyncClient(
+                base_url=self.endpoint,
+                auth=self.auth,
+                timeout=httpx.Timeout(self.timeout, connect=10.0),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections,
+                                    keepalive_expiry=60.0),
+            )
+        return self._http
+
+    def _payload(self, messages: List[Dict[str, str]], params: GenParams, stream: bool) -> Dict[str, Any]:
+        return {
+            "compartmentId": self.compartment,
+            "servingMode": {"servingType": "ON_DEMAND", "modelId": self.model_id},
+            "chatRequest": {
+                "apiFormat": "GENERIC",
+                "messages": [
+                    {"role": m["role"].upper(), "content": [{"type": "TEXT", "text": m["content"]}]}
+                    for m in messages
+                ],
+                "maxTokens": params.max_tokens,
+                "temperature": params.temperature,
+                "topP": params.top_p,
+                "isStream": stream,
+            },
+        }
+
+    async def agenerate(self, messages: List[Dict[str, str]], params: GenParams) -> str:
+        """Gera a resposta completa"""
+        if self.mode == "mock":
+            return "".join([chunk async for chunk in self.agenerate_stream(messages, params)])
+        async with self.limiter:
+            response = await self._client().post(self.CHAT_PATH, json=self._payload(messages, params, False))
+            response.raise_for_status()
+            return _response_text(response.json())
+
+    async def agenerate_batch(self, requests: List[Tuple[List[Dict[str, str]], GenParams]]) -> List[Union[str, BaseException]]:
+        """Gera as respostas de um lote, na ordem dos pedidos (exceções no lugar das falhas)
+
+        Com `batch_path`, o lote vai numa única requisição (`{"requests": [...]}` com o mesmo
+        corpo do `/chat`, resposta `{"responses": [...]}`) e ocupa uma vaga do limitador. O chat
+        on-demand do OCI não tem rota de lote: sem `batch_path`, os pedidos saem em paralelo.
+        """
+        if self.mode == "mock":
+            async with self.limiter:
+                responses, steps = mock_batch(requests)
+                if self.token_delay:
+                    await asyncio.sleep(self.token_delay * steps)  # decodificação em paralelo no lote
+                return responses
+        if not self.batch_path:
+            return await asyncio.gather(*(self.agenerate(m, p) for m, p in requests), return_exceptions=True)
+        payload = {"requests": [self._payload(m, p, False) for m, p in requests]}
+        async with self.limiter:
+            response = await self._client().post(self.batch_path, json=payload)
+            response.raise_for_status()
+            return [_response_text(r) for r in response.json()["responses"]]
+
+    async def agenerate_stream(self, messages: List[Dict[str, str]], params: GenParams) -> AsyncIterator[str]:
+        """Gera a resposta em pedaços, lendo os eventos SSE do endpoint"""
+        async with self.limiter:
+            if self.mode == "mock":
+                for token in mock_tokens(mock_response(messages, params)):
+                    if self.token_delay:
+                        await asyncio.sleep(self.token_delay)
+                    yield token
+                return
+            payload = self._payload(messages, params, True)
+            async with self._client().stream("POST", self.CHAT_PATH, json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if not data or data == "[DONE]":
+                        continue
+                    text = _message_text(json.loads(data).get("message", {}))
+                    if text:
+                        yield text
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+def _response_text(body: Dict[str, Any]) -> str:
+    return "".join(_message_text(c.get("message", {})) for c in body["chatResponse"]["choices"])
+
+def _message_text(message: Dict[str, Any]) -> str:
+    return "".join(part.get("text", "") for part in message.get("content", []) or [])
+
+# =========================
+# Cliente com vários endpoints
+# =========================
+def is_endpoint_failure(error: BaseException) -> bool:
+    """Falhas atribuídas ao endpoint (rede, timeout, 429/5xx), que justificam tentar outro"""
+    import httpx
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+class RoutedOCIClient:
+    """Um `AsyncOCIClient` por endpoint, com a escolha e o failover feitos pelo `EndpointRouter`.
+
+    Uma chamada que falha por culpa do endpoint é repetida em outro, até `max_attempts`
+    endpoints diferentes. No streaming o failover só acontece antes do primeiro pedaço. A latência
+    informada ao roteador é a duração da chamada completa nos dois caminhos; chamadas canceladas
+    (ou streams abandonados) só liberam a vaga, sem contar como sucesso.
+    """
+
+    mode = "oci"
+
+    def __init__(self, endpoints: List[str], strategy: str = "p2c", max_attempts: int = 3,
+                 router: Optional[EndpointRouter] = None, **client_kwargs):
+        self.router = router or EndpointRouter(endpoints, strategy)
+        self.max_attempts = max_attempts
+        self.clients = {e.url: AsyncOCIClient(mode="oci", endpoint=e.url, **client_kwargs)
+                        for e in self.router.endpoints}
+
+    async def agenerate(self, messages: List[Dict[str, str]], params: GenParams) -> str:
+        tried: List[str] = []
+        while True:
+            endpoint = self.router.acquire(exclude=tried)
+            tried.append(endpoint.url)
+            started = time.perf_counter()
+            ok: Optional[bool] = True
+            try:
+                response = await self.clients[endpoint.url].agenerate(messages, params)
+            except Exception as e:
+                ok = not is_endpoint_failure(e)
+                if ok or len(tried) >= min(self.max_attempts, len(self.clients)):
+                    raise
+                continue
+            except BaseException:
+                ok = None  # cancelada: nada a dizer sobre o endpoint
+                raise
+            finally:
+                if ok:
+                    self.router.observe(endpoint, time.perf_counter() - started)
+                self.router.release(endpoint, ok)
+            return response
+
+    async def agenerate_stream(self, messages: List[Dict[str, str]], params: GenParams) -> AsyncIterator[str]:
+        tried: List[str] = []
+        while True:
+            endpoint = self.router.acquire(exclude=tried)
+            tried.append(endpoint.url)
+            started = time.perf_counter()
+            first = True
+            ok: Optional[bool] = True
+            try:
+                async for chunk in self.clients[endpoint.url].agenerate_stream(messages, params):
+                    first = False
+                    yield chunk
+            except Exception as e:
+                ok = not is_endpoint_failure(e)
+                if ok or not first or len(tried) >= min(self.max_attempts, len(self.clients)):
+                    raise
+                continue
+            except BaseException:
+                ok = None  # cancelada ou abandonada por quem consumia (GeneratorExit)
+                raise
+            else:
+                self.router.observe(endpoint, time.perf_counter() - started)
+            finally:
+                self.router.release(endpoint, ok)
+            return
+
+    async def agenerate_batch(self, requests: List[Tuple[List[Dict[str, str]], GenParams]]) -> List[Union[str, BaseException]]:
+        """Cada pedido do lote é roteado (e repetido em outro endpoint) individualmente"""
+        return await asyncio.gather(*(self.agenerate(m, p) for m, p in requests), return_exceptions=True)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return self.router.stats()
+
+    async def aclose(self):
+        for client in self.clients.values():
+            await client.aclose()
+
+# =========================
+# Event loop compartilhado
+# =========================
+class _LoopRuntime:
+    """Event loop em thread daemon para servir código síncrono (Streamlit)"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="oci-client-loop", daemon=True)
+        self.thread.start()
+
+    def run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def iterate(self, agen: AsyncIterator) -> Iterator:
+        """Consome um async generator a partir de código síncrono"""
+        try:
+            while True:
+                try:
+                    yield self.run(_anext(agen))
+                except StopAsyncIteration:
+                    return
+        finally:
+            self.run(agen.aclose())
+
+async def _anext(agen: AsyncIterator):
+    return await agen.__anext__()
+
+_lock = threading.Lock()
+_loop_runtime: Optional[_LoopRuntime] = None
+_shared_client: Optional[Union[AsyncOCIClient, RoutedOCIClient]] = None
+
+def _runtime() -> _LoopRuntime:
+    global _loop_runtime
+    with _lock:
+        if _loop_runtime is None:
+            _loop_runtime = _LoopRuntime()
+        return _loop_runtime
+
+def get_shared_client() -> Union[AsyncOCIClient, RoutedOCIClient]:
+    """Retorna o cliente assíncrono único do processo (configurado por variáveis de ambiente)
+
+    Com mais de um endpoint (`OCI_ENDPOINTS` / `OCI_REGIONS`) o cliente é roteado; os limites de
+    concorrência e conexões valem por endpoint e a estratégia vem de `OCI_ROUTING`.
+    """
+    global _shared_client
+    with _lock:
+        if _shared_client is None:
+            options = dict(
+                max_concurrency=int(os.getenv("OCI_MAX_CONCURRENCY", "8")),
+                max_connections=int(os.getenv("OCI_MAX_CONNECTIONS", "20")),
+                timeout=float(os.getenv("OCI_TIMEOUT", "60")),
+            )
+            endpoints = endpoint_urls()
+            if len(endpoints) > 1:
+                router = EndpointRouter(endpoints, strategy=os.getenv("OCI_ROUTING", "p2c"),
+                                        eject_seconds=float(os.getenv("OCI_EJECT_SECONDS", "10")))
+                _shared_client = RoutedOCIClient(endpoints, router=router, **options)
+            else:
+                _shared_client = AsyncOCIClient(endpoint=endpoints[0] if endpoints else None, **options)
+        return _shared_client
@@ -0,0 +1,252 @@
+"""
+Cache de respostas do LLM em dois níveis.
+
+1. Exato: chave = hash SHA-256 do (namespace, mensagens já recortadas, parâmetros de geração),
+   com o texto normalizado (espaços colapsados, caixa ignorada). Guardado num `TTLCache`.
+2. Semântico (opcional): quando há um embedder configurado, a última pergunta do usuário é
+   vetorizada e comparada por cosseno com as perguntas já respondidas no mesmo contexto
+   (mesmo sistema, histórico anterior e parâmetros); acima de `similarity_threshold` a resposta
+   guardada é reaproveitada.
+
+Só gerações determinísticas são cacheadas: com `temperature` > 0 a consulta e a gravação são
+ignoradas (contadas em `bypassed`), para não transformar uma resposta amostrada em fixa.
+
+Os dois níveis expiram por TTL e despejam por LRU. `get_response_cache()` devolve a instância
+compartilhada do processo, configurada por variáveis de ambiente:
+
+- `RESPONSE_CACHE_SIZE` (padrão 1024) e `RESPONSE_CACHE_TTL` em segundos (padrão 3600)
+- `RESPONSE_CACHE_EMBEDDINGS`: vazio desativa o nível semântico; nome de um modelo do
+  `sentence-transformers` (ver `embeddings.load_embedder`). O `HashingEmbedder` (`hashing` ou a
+  alternativa quando o pacote falta) é recusado: n-gramas de caracteres não distinguem negações
+  ("Não quero cancelar minha conta" × "Quero cancelar minha conta" dá 0.93) e o cache serviria
+  a resposta errada; o motivo fica em `stats()["semantic_disabled"]`
+- `RESPONSE_CACHE_THRESHOLD`: similaridade mínima do nível semântico (padrão 0.9)
+
+O NumPy só é importado pelo nível semântico.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from cache import TTLCache
+from embeddings import Embedder, HashingEmbedder, load_embedder
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PARAM_FIELDS = ("temperature", "top_p", "max_tokens")
+
+def normalize(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+def _param_values(params: Any) -> Dict[str, Any]:
+    if params is None:
+        return {}
+    if isinstance(params, dict):
+        return {k: params[k] for k in PARAM_FIELDS if k in params}
+    return {k: getattr(params, k) for k in PARAM_FIELDS if hasattr(params, k)}
+
+def _digest(payload: Any) -> str:
+    raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _split_question(messages: List[Dict[str, str]]) -> Tuple[List[Dict[str, str]], str]:
+    """Separa a última pergunta do usuário do contexto que a antecede"""
+    for i in range(len(messages) - 1, -1, -1):
+        if messages[i]["role"] == "user":
+            return messages[:i], messages[i]["content"]
+    return messages, ""
+
+def cacheable(params: Any) -> bool:
+    """Só gerações determinísticas (`temperature` 0 ou não informada) entram no cache"""
+    return not _param_values(params).get("temperature")
+
+def cache_key(messages: List[Dict[str, str]], params: Any = None, namespace: str = "") -> str:
+    return _digest([namespace, [[m["role"], normalize(m["content"])] for m in messages], _param_values(params)])
+
+# =========================
+# Nível semântico
+# =========================
+class _Partition:
+    """Perguntas de um mesmo contexto; a matriz de vetores é remontada só quando muda"""
+    __slots__ = ("keys", "matrix")
+
+    def __init__(self):
+        self.keys: List[str] = []
+        self.matrix: Optional["np.ndarray"] = None
+
+class SemanticIndex:
+    """Índice vetorial em memória (NumPy) com busca por cosseno, TTL e despejo LRU"""
+
+    def __init__(self, embedder: Embedder, threshold: float = 0.9, maxsize: int = 1024,
+                 ttl: float = 3600.0, clock: Callable[[], float] = time.monotonic):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # chave -> (partição, vetor, expira_em, valor)
+        self._partitions: Dict[str, _Partition] = {}
+        self._lock = threading.Lock()
+
+    def embed(self, text: str) -> "np.ndarray":
+        return self.embedder([text])[0]
+
+    def _remove(self, key: str):
+        partition_key = self._entries.pop(key)[0]
+        partition = self._partitions[partition_key]
+        partition.keys.remove(key)
+        partition.matrix = None
+        if not partition.keys:
+            del self._partitions[partition_key]
+
+    def add(self, partition_key: str, key: str, vector: "np.ndarray", value: Any):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (partition_key, vector, self.clock() + self.ttl, value)
+            partition = self._partitions.setdefault(partition_key, _Partition())
+            partition.keys.append(key)
+            partition.matrix = None
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def search(self, partition_key: str, vector: "np.ndarray") -> Optional[Tuple[Any, float]]:
+        """Retorna (valor, similaridade) da entrada válida mais parecida acima do limiar"""
+        import numpy as np
+        with self._lock:
+            partition = self._partitions.get(partition_key)
+            if partition is None:
+                return None
+            if partition.matrix is None:
+                partition.matrix = np.vstack([self._entries[k][1] for k in partition.keys])
+            keys = list(partition.keys)
+            scores = partition.matrix @ vector
+            now = self.clock()
+            for i in np.argsort(-scores):
+                if scores[i] < self.threshold:
+                    break
+                key = keys[i]
+                entry = self._entries[key]
+                if entry[2] <= now:
+                    self._remove(key)
+                    continue
+                self._entries.move_to_end(key)
+                return entry[3], float(scores[i])
+            return None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._partitions.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+# =========================
+# Cache de respostas
+# =========================
+class ResponseCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0, embedder: Optional[Embedder] = None,
+                 similarity_threshold: float = 0.9, clock: Callable[[], float] = time.monotonic):
+        self.exact = TTLCache(maxsize=maxsize, ttl=ttl, negative_ttl=0, clock=clock)
+        self.semantic_disabled: Optional[str] = None  # motivo, quando um embedder foi recusado
+        if isinstance(embedder, HashingEmbedder):
+            self.semantic_disabled = "HashingEmbedder não distingue negações; requer sentence-transformers"
+            logger.warning("Nível semântico do cache de respostas desativado: %s", self.semantic_disabled)
+            embedder = None
+        self.semantic = (SemanticIndex(embedder, similarity_threshold, maxsize, ttl, clock)
+                         if embedder is not None else None)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def _semantic_keys(self, messages, params, namespace) -> Tuple[str, str]:
+        context, question = _split_question(messages)
+        return cache_key(context, params, namespace), normalize(question)
+
+    def lookup(self, messages: List[Dict[str, str]], params: Any = None, namespace: str = "") -> Optional[str]:
+        """Retorna a resposta cacheada (exata ou semelhante) ou None"""
+        if not cacheable(params):
+            with self._lock:
+                self.bypassed += 1
+            return None
+        value = self.exact.get(cache_key(messages, params, namespace))
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            return value
+        if self.semantic is not None:
+            partition_key, question = self._semantic_keys(messages, params, namespace)
+            if question:
+                match = self.semantic.search(partition_key, self.semantic.embed(question))
+                if match is not None:
+                    with self._lock:
+                        self.semantic_hits += 1
+                    return match[0]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def store(self, messages: List[Dict[str, str]], response: str, params: Any = None, namespace: str = ""):
+        if not response or not cacheable(params):
+            return
+        key = cache_key(messages, params, namespace)
+        self.exact.set(key, response)
+        if self.semantic is not None:
+            partition_key, question = self._semantic_keys(messages, params, namespace)
+            if question:
+                self.semantic.add(partition_key, key, self.semantic.embed(question), response)
+
+    def get_or_generate(self, messages: List[Dict[str, str]], generate: Callable[[], str],
+                        params: Any = None, namespace: str = "") -> str:
+        cached = self.lookup(messages, params, namespace)
+        if cached is not None:
+            return cached
+        response = generate()
+        self.store(messages, response, params, namespace)
+        return response
+
+    def clear(self):
+        self.exact.clear()
+        if self.semantic is not None:
+            self.semantic.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.semantic_hits + self.misses
+        return {
+            "size": len(self.exact),
+            "semantic_size": len(self.semantic) if self.semantic is not None else 0,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "semantic_disabled": self.semantic_disabled,
+            "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+        }
+
+_lock = threading.Lock()
+_shared_cache: Optional[ResponseCache] = None
+
+def get_response_cache() -> ResponseCache:
+    """Retorna o cache de respostas único do processo (configurado por variáveis de ambiente)"""
+    global _shared_cache
+    with _lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache(
+                maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "1024")),
+                ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+                embedder=load_embedder(os.getenv("RESPONSE_CACHE_EMBEDDINGS", "")),
+                similarity_threshold=float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.9")),
+            )
+        return _shared_cache
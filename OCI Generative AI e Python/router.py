@@ -0,0 +1,193 @@
+"""
+Roteamento entre vários endpoints/regiões do OCI GenAI, com balanceamento por latência e failover.
+
+Para cada endpoint o `EndpointRouter` acompanha:
+- requisições em voo (`outstanding`)
+- latência (EWMA da duração das chamadas bem-sucedidas, do envio ao último pedaço: a mesma
+  medida com e sem streaming, para que as duas alimentem a mesma média)
+- taxa de erro numa janela das últimas `window` requisições e falhas seguidas
+
+Estratégias de escolha:
+- `p2c` (padrão): sorteia dois endpoints saudáveis e fica com o de menor
+  `latência × (em voo + 1)` ("power of two choices")
+- `least`: o de menos requisições em voo (empate pela latência)
+- `random`: sorteio simples, referência para comparação nos benchmarks
+
+Um endpoint com `consecutive_failures` falhas seguidas, ou com taxa de erro acima de
+`error_threshold` na janela, é ejetado por `eject_seconds` (multiplicado a cada ejeção seguida,
+até `max_eject_seconds`). Ao voltar ele fica em observação: uma falha o ejeta de novo, um
+sucesso zera o histórico. Cada falha leva a latência do endpoint à maior latência conhecida
+(`failure_latency` antes da primeira medida), para que um endpoint que só falha não pareça o
+mais rápido na comparação do `p2c`. Se todos estiverem ejetados, o roteador usa todos ("modo pânico")
+em vez de recusar tráfego.
+
+A configuração vem de `endpoint_urls()`: `OCI_ENDPOINTS` (URLs separadas por vírgula),
+`OCI_REGIONS` (regiões, ex.: `us-chicago-1,sa-saopaulo-1`) ou o único `OCI_ENDPOINT_URL` /
+`OCI_REGION`. O cliente que usa o roteador é o `oci_client.RoutedOCIClient`. Pode ser exercitado
+com vários `benchmarks/stub_server.py` com latências e falhas diferentes (cenário `router`).
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from metrics import REGISTRY, Counter, Histogram
+
+REGION_URL = "https://inference.generativeai.{region}.oci.oraclecloud.com"
+STRATEGIES = ("p2c", "least", "random")
+
+endpoint_latency = Histogram("oci_endpoint_latency_seconds", "Duração das chamadas bem-sucedidas por endpoint",
+                             label="endpoint")
+endpoint_errors = Counter("oci_endpoint_errors_total", "Falhas de rede/429/5xx por endpoint", label="endpoint")
+endpoint_ejections = Counter("oci_endpoint_ejections_total", "Ejeções de endpoints não saudáveis", label="endpoint")
+REGISTRY.extend([endpoint_latency, endpoint_errors, endpoint_ejections])
+
+class NoEndpointAvailable(RuntimeError):
+    """Nenhum endpoint restante para tentar"""
+
+def endpoint_urls() -> List[str]:
+    """Endpoints configurados no ambiente, sem repetição e na ordem informada"""
+    urls = [u.strip() for u in os.getenv("OCI_ENDPOINTS", "").split(",") if u.strip()]
+    urls += [REGION_URL.format(region=r.strip()) for r in os.getenv("OCI_REGIONS", "").split(",") if r.strip()]
+    if not urls:
+        single = os.getenv("OCI_ENDPOINT_URL", "") or (
+            REGION_URL.format(region=os.getenv("OCI_REGION")) if os.getenv("OCI_REGION") else "")
+        urls = [single] if single else []
+    return list(dict.fromkeys(u.rstrip("/") for u in urls))
+
+# =========================
+# Estado por endpoint
+# =========================
+class Endpoint:
+    __slots__ = ("url", "outstanding", "latency", "outcomes", "failures", "ejected_until", "ejections",
+                 "probation", "requests")
+
+    def __init__(self, url: str, window: int):
+        self.url = url
+        self.outstanding = 0
+        self.latency: Optional[float] = None  # EWMA em segundos; None até a primeira medida
+        self.outcomes: deque = deque(maxlen=window)  # True = sucesso
+        self.failures = 0  # falhas seguidas
+        self.ejected_until = 0.0
+        self.ejections = 0  # ejeções seguidas (zera no primeiro sucesso depois da volta)
+        self.probation = False
+        self.requests = 0
+
+    @property
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def score(self) -> float:
+        return (self.latency or 0.0) * (self.outstanding + 1)
+
+# =========================
+# Roteador
+# =========================
+class EndpointRouter:
+    def __init__(self, urls: Sequence[str], strategy: str = "p2c", window: int = 50, alpha: float = 0.3,
+                 error_threshold: float = 0.5, min_requests: int = 10, consecutive_failures: int = 5,
+                 eject_seconds: float = 10.0, max_eject_seconds: float = 300.0, failure_latency: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic, rng: Optional[random.Random] = None):
+        if not urls:
+            raise ValueError("informe ao menos um endpoint")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"estratégia inválida: {strategy} (use {', '.join(STRATEGIES)})")
+        self.endpoints = [Endpoint(url.rstrip("/"), window) for url in dict.fromkeys(urls)]
+        self.strategy = strategy
+        self.alpha = alpha
+        self.error_threshold = error_threshold
+        self.min_requests = min_requests
+        self.consecutive_failures = consecutive_failures
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self.failure_latency = failure_latency
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self._lock = threading.Lock()
+
+    def _available(self, exclude: Iterable[str]) -> List[Endpoint]:
+        now = self.clock()
+        candidates = [e for e in self.endpoints if e.url not in exclude]
+        healthy = []
+        for endpoint in candidates:
+            if endpoint.ejected_until and now >= endpoint.ejected_until:
+                # Fim da ejeção: volta em observação, com histórico limpo
+                endpoint.ejected_until = 0.0
+                endpoint.probation = True
+                endpoint.outcomes.clear()
+                endpoint.failures = 0
+            if not endpoint.ejected_until:
+                healthy.append(endpoint)
+        return healthy or candidates  # todos ejetados: modo pânico
+
+    def acquire(self, exclude: Iterable[str] = ()) -> Endpoint:
+        """Escolhe um endpoint (fora de `exclude`) e conta a requisição como em voo"""
+        with self._lock:
+            candidates = self._available(set(exclude))
+            if not candidates:
+                raise NoEndpointAvailable("todos os endpoints já foram tentados")
+            if len(candidates) == 1:
+                endpoint = candidates[0]
+            elif self.strategy == "p2c":
+                a, b = self.rng.sample(candidates, 2)
+                endpoint = a if a.score() <= b.score() else b
+            elif self.strategy == "least":
+                endpoint = min(candidates, key=lambda e: (e.outstanding, e.latency or 0.0))
+            else:
+                endpoint = self.rng.choice(candidates)
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def observe(self, endpoint: Endpoint, seconds: float):
+        """Registra a duração de uma chamada bem-sucedida (resposta completa)"""
+        endpoint_latency.observe(endpoint.url, seconds)
+        with self._lock:
+            endpoint.latency = seconds if endpoint.latency is None else \
+                self.alpha * seconds + (1 - self.alpha) * endpoint.latency
+
+    def release(self, endpoint: Endpoint, ok: Optional[bool]):
+        """Fim da requisição; `ok=False` só para falhas do endpoint (rede, timeout, 429/5xx) e
+        `ok=None` para chamadas interrompidas (cancelamento), que não contam nem como sucesso nem
+        como falha"""
+        with self._lock:
+            endpoint.outstanding -= 1
+            if ok is None:
+                return
+            endpoint.outcomes.append(ok)
+            if ok:
+                endpoint.failures = 0
+                if endpoint.probation:
+                    endpoint.probation = False
+                    endpoint.ejections = 0
+                return
+            endpoint.failures += 1
+            endpoint_errors.inc(endpoint.url)
+            # Penalidade: sem isso a latência de quem só falha fica em None e o score em 0
+            endpoint.latency = max((e.latency for e in self.endpoints if e.latency is not None),
+                                   default=self.failure_latency)
+            if endpoint.ejected_until:
+                return
+            if (endpoint.probation or endpoint.failures >= self.consecutive_failures
+                    or (len(endpoint.outcomes) >= self.min_requests and endpoint.error_rate >= self.error_threshold)):
+                endpoint.ejections += 1
+                endpoint.probation = False
+                endpoint.ejected_until = self.clock() + min(self.max_eject_seconds,
+                                                            self.eject_seconds * endpoint.ejections)
+                endpoint_ejections.inc(endpoint.url)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now = self.clock()
+        with self._lock:
+            return [{
+                "endpoint": e.url,
+                "requests": e.requests,
+                "outstanding": e.outstanding,
+                "latency_ms": (e.latency or 0.0) * 1000,
+                "error_rate": e.error_rate,
+                "ejected_for_s": max(0.0, e.ejected_until - now) if e.ejected_until else 0.0,
+                "ejections": e.ejections,
+            } for e in self.endpoints]
@@ -0,0 +1,272 @@
+"""
+Serviço HTTP/JSON do chatbot (ASGI/FastAPI), independente do modelo de rerun do Streamlit.
+
+Endpoints:
+- `POST /chat`: gera a resposta do LLM (ou do `SmartAgent`, com `agent=true`); com
+  `stream=true` responde em SSE (`event: delta` por pedaço e `event: done` no final)
+- `POST /feedback`: enfileira um feedback no `FeedbackStore`
+- `GET /analytics`, `/analytics/rollup`, `/analytics/recent`, `/analytics/comments`: leituras
+  das contagens pré-agregadas e do navegador de comentários
+- `GET /sessions/{id}`, `DELETE /sessions/{id}`: histórico guardado de uma sessão (usado pelo
+  `app.py` como cliente fino, que envia só o `session_id` no `/chat`)
+- `GET /metrics`: latência por etapa no formato texto do Prometheus (por worker)
+- `GET /health`
+
+O serviço não guarda estado de conversa em memória: o cliente envia o histórico a cada
+`/chat` ou informa um `session_id`, cujo histórico fica no store externo (`SESSION_STORE_URL`,
+ver `session_store.py`). Assim qualquer worker ou réplica atende qualquer requisição, sem
+sessões "grudadas". Para subir com vários workers:
+
+    uvicorn service:app --host 0.0.0.0 --port 8000 --workers 4
+    python service.py            # usa SERVICE_HOST, SERVICE_PORT e SERVICE_WORKERS
+
+Com `LLM_BATCH_MAX_SIZE` > 1, os `/chat` sem streaming simultâneos são agrupados em chamadas em
+lote ao backend (`batching.py`); fila cheia responde 503 e prazo estourado, 504.
+
+Configuração: `CHAT_BACKEND` (`mock` ou `oci`), `FEEDBACK_DB`, `SESSION_STORE_URL` e as variáveis de
+`oci_client.get_shared_client()`, `batching.get_batcher()` e `response_cache.get_response_cache()`.
+"""
+
+import json
+import os
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Union
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, field_validator
+from starlette.concurrency import run_in_threadpool
+
+from agent import SmartAgent
+from batching import DeadlineExceeded, QueueFullError, get_batcher
+from feedback_store import ROLLUP_DIMENSIONS, get_feedback_store
+from history import trim_history
+from metrics import CONTENT_TYPE, atimed_stream, render_prometheus, span
+from oci_client import AsyncOCIClient, GenParams, RoutedOCIClient, get_shared_client
+from prompting import PERSONAS, STYLES, build_system_prompt
+from response_cache import get_response_cache
+from session_store import get_session_store
+from singleflight import flight_key, flights
+
+load_dotenv()
+
+CHAT_BACKEND = os.getenv("CHAT_BACKEND", "mock")
+FEEDBACK_DB = os.getenv("FEEDBACK_DB", "feedback.db")
+SESSION_STORE_URL = os.getenv("SESSION_STORE_URL", "sqlite:///sessions.db")
+SESSION_HISTORY_LIMIT = 200
+
+# =========================
+# Modelos da API
+# =========================
+class ChatMessage(BaseModel):
+    role: Literal["user", "assistant"]
+    content: str
+
+class PersonaStyle(BaseModel):
+    persona: str = "Professor"
+    style: str = "Formal"
+
+    @field_validator("persona")
+    @classmethod
+    def _check_persona(cls, value: str) -> str:
+        if value not in PERSONAS:
+            raise ValueError(f"Persona inválida: {value}")
+        return value
+
+    @field_validator("style")
+    @classmethod
+    def _check_style(cls, value: str) -> str:
+        if value not in STYLES:
+            raise ValueError(f"Estilo inválido: {value}")
+        return value
+
+class ChatRequest(PersonaStyle):
+    message: str = Field(..., min_length=1)
+    history: List[ChatMessage] = Field(default_factory=list)
+    session_id: Optional[str] = Field(None, max_length=128)  # histórico no store em vez de `history`
+    params: GenParams = Field(default_factory=GenParams)
+    agent: bool = False  # usa o SmartAgent (detecção de países) em vez do LLM
+    stream: bool = False
+
+class FeedbackRequest(PersonaStyle):
+    rating: Literal["👍", "👎"]
+    comment: str = ""
+    user_msg: str = ""
+    assistant_msg: str = ""
+    timestamp: Optional[datetime] = None
+
+# =========================
+# Aplicação
+# =========================
+app = FastAPI(title="OCI Chatbot Service")
+_mock_client = AsyncOCIClient(mode="mock")
+
+def _llm_client() -> Union[AsyncOCIClient, RoutedOCIClient]:
+    return get_shared_client() if CHAT_BACKEND == "oci" else _mock_client
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _history(req: ChatRequest) -> List[Dict[str, str]]:
+    if req.session_id and not req.history:
+        return get_session_store(SESSION_STORE_URL).load(req.session_id, SESSION_HISTORY_LIMIT)
+    return [m.model_dump() for m in req.history]
+
+def _remember(req: ChatRequest, response: str):
+    """Acrescenta a troca ao store da sessão (só as duas mensagens novas)"""
+    if req.session_id:
+        get_session_store(SESSION_STORE_URL).append(
+            req.session_id, {"role": "user", "content": req.message}, {"role": "assistant", "content": response})
+
+def _run_agent(req: ChatRequest) -> Dict[str, Any]:
+    # Agente descartável por requisição; as respostas dele não usam o histórico, então não há leitura do store
+    agent = SmartAgent(req.persona, req.style)
+    result = agent.process_message(req.message)
+    _remember(req, result["response"])
+    return result
+
+async def _llm_messages(req: ChatRequest) -> List[Dict[str, str]]:
+    with span("prompt"):
+        messages = [{"role": "system", "content": build_system_prompt(req.persona, req.style)}]
+    messages += await run_in_threadpool(_history, req)
+    messages.append({"role": "user", "content": req.message})
+    with span("memory"):
+        return trim_history(messages, req.params.memory_turns, req.params.context_tokens)
+
+async def _llm_stream(req: ChatRequest) -> AsyncIterator[str]:
+    """Pedaços da resposta do LLM, passando pelo cache de respostas"""
+    messages = await _llm_messages(req)
+    client = _llm_client()
+    cache = get_response_cache()
+    with span("cache"):
+        cached = await run_in_threadpool(cache.lookup, messages, req.params, namespace=client.mode)
+    if cached is not None:
+        yield cached
+        await run_in_threadpool(_remember, req, cached)
+        return
+    chunks = []
+    # Requisições idênticas simultâneas compartilham uma única geração no backend
+    stream = flights.astream(flight_key(messages, req.params, client.mode),
+                             lambda: client.agenerate_stream(messages, req.params))
+    # "llm" mede só a espera pelos pedaços, não o envio ao cliente
+    async for chunk in atimed_stream("llm", stream, first_stage="llm_first_token"):
+        chunks.append(chunk)
+        yield chunk
+    response = "".join(chunks)
+    await run_in_threadpool(cache.store, messages, response, req.params, namespace=client.mode)
+    await run_in_threadpool(_remember, req, response)
+
+async def _llm_complete(req: ChatRequest) -> str:
+    """Resposta completa do LLM; com micro-batching ativo, sai num lote com outros pedidos"""
+    client = _llm_client()
+    batcher = get_batcher(client)
+    if batcher is None:
+        return "".join([chunk async for chunk in _llm_stream(req)])
+    messages = await _llm_messages(req)
+    cache = get_response_cache()
+    with span("cache"):
+        response = await run_in_threadpool(cache.lookup, messages, req.params, namespace=client.mode)
+    if response is None:
+        with span("llm"):
+            response = await batcher.submit(messages, req.params)
+        await run_in_threadpool(cache.store, messages, response, req.params, namespace=client.mode)
+    await run_in_threadpool(_remember, req, response)
+    return response
+
+@app.post("/chat")
+async def chat(req: ChatRequest):
+    if req.agent:
+        with span("agent"):
+            result = await run_in_threadpool(_run_agent, req)
+        if not req.stream:
+            return result
+
+        async def agent_events():
+            yield _sse("delta", {"text": result["response"]})
+            yield _sse("done", result)
+        return StreamingResponse(agent_events(), media_type="text/event-stream")
+
+    if not req.stream:
+        try:
+            return {"response": await _llm_complete(req)}
+        except QueueFullError as e:
+            raise HTTPException(503, str(e), headers={"Retry-After": "1"})
+        except DeadlineExceeded as e:
+            raise HTTPException(504, str(e))
+
+    async def llm_events():
+        text = ""
+        try:
+            async for chunk in _llm_stream(req):
+                text += chunk
+                yield _sse("delta", {"text": chunk})
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+            return
+        yield _sse("done", {"response": text})
+    return StreamingResponse(llm_events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/feedback", status_code=202)
+def feedback(req: FeedbackRequest):
+    data = req.model_dump()
+    data["timestamp"] = (req.timestamp or datetime.now()).isoformat()
+    data["comment"] = req.comment.strip()
+    get_feedback_store(FEEDBACK_DB).submit(data)
+    return {"status": "queued"}
+
+@app.get("/analytics")
+def analytics():
+    store = get_feedback_store(FEEDBACK_DB)
+    by_rating = dict(store.rollup("rating"))
+    return {
+        "total": sum(by_rating.values()),
+        "by_rating": by_rating,
+        "by_persona": dict(store.rollup("persona")),
+    }
+
+@app.get("/analytics/rollup")
+def analytics_rollup(dims: List[str] = Query(default_factory=list)):
+    invalid = [d for d in dims if d not in ROLLUP_DIMENSIONS]
+    if invalid:
+        raise HTTPException(400, f"Dimensões inválidas: {', '.join(invalid)}")
+    return {"dimensions": dims, "rows": get_feedback_store(FEEDBACK_DB).rollup(*dims)}
+
+@app.get("/analytics/recent")
+def analytics_recent(limit: int = Query(50, ge=1, le=1000)):
+    return {"rows": get_feedback_store(FEEDBACK_DB).recent(limit)}
+
+@app.get("/analytics/comments")
+def analytics_comments(persona: Optional[str] = None, rating: Optional[str] = None,
+                       start: Optional[date] = None, end: Optional[date] = None,
+                       search: Optional[str] = None, cursor_timestamp: Optional[str] = None,
+                       cursor_id: Optional[int] = None, limit: int = Query(20, ge=1, le=200)):
+    cursor = (cursor_timestamp, cursor_id) if cursor_timestamp is not None and cursor_id is not None else None
+    rows, next_cursor = get_feedback_store(FEEDBACK_DB).comments_page(
+        persona=persona, rating=rating, start=start, end=end, search=search, cursor=cursor, limit=limit)
+    return {"rows": rows, "next_cursor": next_cursor}
+
+@app.get("/sessions/{session_id}")
+def session_history(session_id: str, limit: int = Query(SESSION_HISTORY_LIMIT, ge=1, le=SESSION_HISTORY_LIMIT)):
+    return {"messages": get_session_store(SESSION_STORE_URL).load(session_id, limit)}
+
+@app.delete("/sessions/{session_id}", status_code=204)
+def clear_session(session_id: str):
+    get_session_store(SESSION_STORE_URL).clear(session_id)
+
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(render_prometheus(), media_type=CONTENT_TYPE)
+
+@app.get("/health")
+def health():
+    return {"status": "ok", "backend": CHAT_BACKEND}
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("service:app",
+                host=os.getenv("SERVICE_HOST", "0.0.0.0"),
+                port=int(os.getenv("SERVICE_PORT", "8000")),
+                workers=int(os.getenv("SERVICE_WORKERS", "4")))
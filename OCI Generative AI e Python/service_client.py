@@ -0,0 +1,109 @@
+"""
+Cliente síncrono do serviço HTTP (`service.py`), usado pelo Streamlit como cliente fino.
+
+`ChatServiceClient` expõe a mesma interface de leitura/escrita do `FeedbackStore`
+(`submit`, `rollup`, `recent`, `comments_page`), de modo que as páginas de analytics funcionam
+igual com o banco local ou com o serviço remoto, e `chat_stream` consome o SSE do `/chat`.
+O histórico da conversa fica no serviço: o chat envia só o `session_id`, e `load_session` /
+`clear_session` leem e apagam a conversa guardada lá.
+"""
+
+import json
+import threading
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from oci_client import GenParams
+
+class ChatServiceClient:
+    def __init__(self, base_url: str, timeout: float = 60.0, max_connections: int = 20):
+        import httpx  # só no modo cliente fino (`CHAT_SERVICE_URL`)
+        self.base_url = base_url.rstrip("/")
+        self._http = httpx.Client(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(timeout, connect=5.0),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    # =========================
+    # Chat
+    # =========================
+    def chat_stream(self, message: str, persona: str, style: str, session_id: str,
+                    params: GenParams, agent: bool = False) -> Iterator[str]:
+        """Pedaços da resposta conforme chegam pelo SSE do `/chat`; o serviço guarda a troca na sessão"""
+        payload = {
+            "message": message,
+            "persona": persona,
+            "style": style,
+            "session_id": session_id,
+            "params": params.model_dump(),
+            "agent": agent,
+            "stream": True,
+        }
+        with self._http.stream("POST", "/chat", json=payload) as response:
+            response.raise_for_status()
+            event = "message"
+            for line in response.iter_lines():
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:"):
+                    data = json.loads(line[5:])
+                    if event == "delta":
+                        yield data["text"]
+                    elif event == "error":
+                        raise RuntimeError(data.get("detail", "erro no serviço de chat"))
+                elif not line:
+                    event = "message"
+
+    def load_session(self, session_id: str, limit: Optional[int] = None) -> List[Dict[str, str]]:
+        return self._get(f"/sessions/{session_id}", {"limit": limit})["messages"]
+
+    def clear_session(self, session_id: str):
+        self._http.delete(f"/sessions/{session_id}").raise_for_status()
+
+    # =========================
+    # Feedback e analytics
+    # =========================
+    def submit(self, feedback_data: Dict[str, Any]):
+        self._http.post("/feedback", json=feedback_data).raise_for_status()
+
+    def _get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        response = self._http.get(path, params={k: v for k, v in (params or {}).items() if v not in (None, "")})
+        response.raise_for_status()
+        return response.json()
+
+    def rollup(self, *dimensions: str) -> List[tuple]:
+        return [tuple(row) for row in self._get("/analytics/rollup", {"dims": list(dimensions)})["rows"]]
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        return self._get("/analytics/recent", {"limit": limit})["rows"]
+
+    def comments_page(self, persona: Optional[str] = None, rating: Optional[str] = None,
+                      start: Optional[date] = None, end: Optional[date] = None,
+                      search: Optional[str] = None, cursor: Optional[Tuple[str, int]] = None,
+                      limit: int = 20) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, int]]]:
+        data = self._get("/analytics/comments", {
+            "persona": persona, "rating": rating,
+            "start": start.isoformat() if start else None,
+            "end": end.isoformat() if end else None,
+            "search": search.strip() if search else None,
+            "cursor_timestamp": cursor[0] if cursor else None,
+            "cursor_id": cursor[1] if cursor else None,
+            "limit": limit,
+        })
+        next_cursor = data["next_cursor"]
+        return data["rows"], tuple(next_cursor) if next_cursor else None
+
+    def close(self):
+        self._http.close()
+
+_clients: Dict[str, ChatServiceClient] = {}
+_clients_lock = threading.Lock()
+
+def get_service_client(base_url: str) -> ChatServiceClient:
+    """Instância única por URL, compartilhada por todas as sessões do processo"""
+    with _clients_lock:
+        client = _clients.get(base_url)
+        if client is None:
+            client = _clients[base_url] = ChatServiceClient(base_url)
+        return client
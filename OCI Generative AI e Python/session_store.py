@@ -0,0 +1,180 @@
+"""
+Armazenamento externo das conversas, para que sobrevivam a reinícios e sejam vistas por
+qualquer worker (sem sessões "grudadas" num processo).
+
+Backends, todos com a mesma interface (`append`, `load`, `clear`):
+
+- `InMemorySessionStore`: dicionário por processo (desenvolvimento / testes)
+- `SQLiteSessionStore`: tabela `session_turns` em modo WAL, uma linha por mensagem
+- `RedisSessionStore`: uma lista por sessão (`RPUSH`/`LRANGE`), com expiração; aceita qualquer
+  cliente compatível com o `redis-py` (ex.: `fakeredis` em testes locais)
+
+As mensagens só são acrescentadas (nunca se regrava o histórico inteiro) e são serializadas
+de forma compacta: 1 byte de papel seguido do conteúdo UTF-8, comprimido com zlib quando longo.
+
+`get_session_store(url)` escolhe o backend pela URL: `memory://`, `sqlite:///caminho.db` ou
+`redis://host:6379/0`.
+"""
+
+import sqlite3
+import threading
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from feedback_store import connect
+from metrics import span
+
+ROLE_CODES = {"system": b"s", "user": b"u", "assistant": b"a"}
+CODE_ROLES = {code[0]: role for role, code in ROLE_CODES.items()}
+COMPRESS_MIN_BYTES = 512
+
+# =========================
+# Serialização
+# =========================
+def encode_turn(message: Dict[str, str]) -> bytes:
+    """`{"role", "content"}` -> papel (1 byte; maiúsculo se comprimido) + conteúdo"""
+    code = ROLE_CODES[message["role"]]
+    payload = message["content"].encode("utf-8")
+    if len(payload) >= COMPRESS_MIN_BYTES:
+        compressed = zlib.compress(payload, 6)
+        if len(compressed) < len(payload):
+            return code.upper() + compressed
+    return code + payload
+
+def decode_turn(raw: bytes) -> Dict[str, str]:
+    code, payload = raw[0], raw[1:]
+    if code not in CODE_ROLES:  # maiúsculo: conteúdo comprimido
+        code = ord(chr(code).lower())
+        payload = zlib.decompress(payload)
+    return {"role": CODE_ROLES[code], "content": payload.decode("utf-8")}
+
+# =========================
+# Backends
+# =========================
+class InMemorySessionStore:
+    def __init__(self):
+        self._sessions: Dict[str, List[bytes]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    @span("session_write")
+    def append(self, session_id: str, *messages: Dict[str, str]):
+        turns = [encode_turn(m) for m in messages]
+        with self._lock:
+            self._sessions[session_id].extend(turns)
+
+    @span("session_load")
+    def load(self, session_id: str, limit: Optional[int] = None) -> List[Dict[str, str]]:
+        """Mensagens da sessão em ordem cronológica (só as `limit` mais recentes, se informado)"""
+        with self._lock:
+            turns = list(self._sessions.get(session_id, ()))
+        if limit is not None:
+            turns = turns[-limit:] if limit > 0 else []
+        return [decode_turn(t) for t in turns]
+
+    def clear(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+class SQLiteSessionStore:
+    """Uma linha por mensagem; leituras pelo índice `(session_id, id)`, sem varrer a tabela"""
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS session_turns (
+            id INTEGER PRIMARY KEY,
+            session_id TEXT NOT NULL,
+            turn BLOB NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_session_turns_session ON session_turns(session_id, id)",
+    )
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()  # uma conexão por thread
+        conn = self._conn()
+        with conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect(self.db_path)
+        return conn
+
+    @span("session_write")
+    def append(self, session_id: str, *messages: Dict[str, str]):
+        conn = self._conn()
+        with conn:
+            conn.executemany("INSERT INTO session_turns (session_id, turn) VALUES (?, ?)",
+                             [(session_id, encode_turn(m)) for m in messages])
+
+    @span("session_load")
+    def load(self, session_id: str, limit: Optional[int] = None) -> List[Dict[str, str]]:
+        if limit is None:
+            rows = self._conn().execute(
+                "SELECT turn FROM session_turns WHERE session_id = ? ORDER BY id", (session_id,)).fetchall()
+        else:
+            rows = self._conn().execute(
+                "SELECT turn FROM (SELECT id, turn FROM session_turns WHERE session_id = ? "
+                "ORDER BY id DESC LIMIT ?) ORDER BY id", (session_id, max(limit, 0))).fetchall()
+        return [decode_turn(row[0]) for row in rows]
+
+    def clear(self, session_id: str):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM session_turns WHERE session_id = ?", (session_id,))
+
+class RedisSessionStore:
+    """Lista Redis por sessão; cada `append` renova a expiração da conversa"""
+
+    def __init__(self, client, prefix: str = "chat:session:", ttl: Optional[int] = 30 * 24 * 3600):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _key(self, session_id: str) -> str:
+        return self.prefix + session_id
+
+    @span("session_write")
+    def append(self, session_id: str, *messages: Dict[str, str]):
+        key = self._key(session_id)
+        pipe = self.client.pipeline()
+        pipe.rpush(key, *[encode_turn(m) for m in messages])
+        if self.ttl:
+            pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    @span("session_load")
+    def load(self, session_id: str, limit: Optional[int] = None) -> List[Dict[str, str]]:
+        if limit is not None and limit <= 0:
+            return []
+        start = -limit if limit is not None else 0
+        return [decode_turn(raw) for raw in self.client.lrange(self._key(session_id), start, -1)]
+
+    def clear(self, session_id: str):
+        self.client.delete(self._key(session_id))
+
+# =========================
+# Fábrica
+# =========================
+_stores: Dict[str, object] = {}
+_stores_lock = threading.Lock()
+
+def _create_store(url: str):
+    if url.startswith("memory://"):
+        return InMemorySessionStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteSessionStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        import redis  # dependência opcional
+        return RedisSessionStore(redis.Redis.from_url(url))
+    raise ValueError(f"URL de sessão não suportada: {url}")
+
+def get_session_store(url: str):
+    """Instância única por URL, compartilhada por todas as sessões do processo"""
+    with _stores_lock:
+        store = _stores.get(url)
+        if store is None:
+            store = _stores[url] = _create_store(url)
+        return store
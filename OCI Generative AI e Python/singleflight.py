@@ -0,0 +1,239 @@
+"""
+Coalescência de chamadas idênticas simultâneas ("single-flight") no processo.
+
+Quando várias sessões pedem a mesma geração ao mesmo tempo (mesmo prompt montado e mesmos
+parâmetros), só a primeira chega ao backend; as demais esperam e recebem o mesmo resultado —
+ou, no caso de streaming, os mesmos pedaços, desde o início e à medida que chegam.
+
+- `do(chave, fn)`: chamada síncrona; o primeiro executa `fn` na própria thread
+- `stream(chave, fonte)`: um iterador é consumido por uma thread de bombeamento e repassado a
+  todos os interessados, então quem desiste no meio não trava os demais; quando o último
+  interessado desiste, a fonte é fechada e a vaga no backend liberada
+- `astream(chave, fonte)`: o mesmo para async iterators (serviço ASGI), numa task do event loop
+  (cancelada quando não sobra nenhum interessado)
+- `submit(chave, executor, fn, *args)`: `Future` compartilhado num pool (ferramentas do agente)
+
+Cada modo tem sua própria tabela de voos, então a mesma chave em `do` e em `stream` não se
+mistura. `flight_key(messages, params, namespace)` gera a chave (SHA-256 do prompt exato +
+parâmetros). As chamadas líderes e as compartilhadas são contadas em `singleflight_calls_total`.
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+from concurrent.futures import Executor, Future
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, Iterator, List, Optional
+
+from metrics import REGISTRY, Counter
+
+flight_calls = Counter("singleflight_calls_total", "Chamadas por papel no single-flight (leader/shared)", label="role")
+REGISTRY.append(flight_calls)
+
+def flight_key(messages: List[Dict[str, str]], params: Any = None, namespace: str = "") -> str:
+    """Chave exata do prompt montado (sem normalização, ao contrário do cache de respostas)"""
+    if hasattr(params, "model_dump"):
+        params = params.model_dump()
+    payload = json.dumps([namespace, [[m["role"], m["content"]] for m in messages], params],
+                         ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class FlightInterrupted(RuntimeError):
+    """A geração compartilhada foi interrompida (cancelamento ou encerramento do processo)"""
+
+class _Stream:
+    """Pedaços já produzidos por uma geração em andamento, com espera por novos"""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.abandoned = False  # todos os interessados desistiram: o bombeamento para
+        self.cond = threading.Condition()
+
+class _AsyncStream:
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.abandoned = False
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Future] = None
+
+    def notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+class SingleFlight:
+    def __init__(self):
+        # Uma tabela por modo: os voos de cada uma têm tipos diferentes
+        self._calls: Dict[Hashable, Future] = {}
+        self._futures: Dict[Hashable, Future] = {}
+        self._streams: Dict[Hashable, _Stream] = {}
+        self._astreams: Dict[Hashable, _AsyncStream] = {}
+        self._lock = threading.Lock()
+
+    def _join(self, table: Dict[Hashable, Any], key: Hashable, factory: Callable[[], Any]):
+        """(voo, é_líder): entra num voo em andamento ou abre um novo"""
+        with self._lock:
+            flight = table.get(key)
+            if flight is not None:
+                flight_calls.inc("shared")
+                return flight, False
+            flight = table[key] = factory()
+            flight_calls.inc("leader")
+            return flight, True
+
+    def _subscribe(self, table: Dict[Hashable, Any], key: Hashable, factory: Callable[[], Any]):
+        """Como `_join`, contando o interessado no mesmo lock (streams)"""
+        with self._lock:
+            flight = table.get(key)
+            leader = flight is None
+            if leader:
+                flight = table[key] = factory()
+            flight.subscribers += 1
+        flight_calls.inc("leader" if leader else "shared")
+        return flight, leader
+
+    def _leave(self, table: Dict[Hashable, Any], key: Hashable, flight: Any) -> bool:
+        """Tira um interessado; True se era o último e a geração ainda não terminou"""
+        with self._lock:
+            flight.subscribers -= 1
+            if flight.subscribers or flight.done:
+                return False
+            flight.abandoned = True
+            if table.get(key) is flight:
+                del table[key]  # novos pedidos abrem outro voo
+            return True
+
+    def _land(self, table: Dict[Hashable, Any], key: Hashable, flight: Any):
+        with self._lock:
+            if table.get(key) is flight:
+                del table[key]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls) + len(self._futures) + len(self._streams) + len(self._astreams)
+
+    # =========================
+    # Chamadas simples
+    # =========================
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        future, leader = self._join(self._calls, key, Future)
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        except BaseException:
+            # Cancelamento/encerramento é do líder, não da chamada: quem espera recebe um erro comum
+            future.set_exception(FlightInterrupted("chamada compartilhada interrompida"))
+            raise
+        finally:
+            self._land(self._calls, key, future)
+        future.set_result(result)
+        return result
+
+    def submit(self, key: Hashable, executor: Executor, fn: Callable, *args) -> Future:
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                flight_calls.inc("shared")
+                return future
+            future = self._futures[key] = executor.submit(fn, *args)
+            flight_calls.inc("leader")
+        future.add_done_callback(lambda _: self._land(self._futures, key, future))
+        return future
+
+    # =========================
+    # Streaming
+    # =========================
+    def _pump(self, key: Hashable, flight: _Stream, source: Callable[[], Iterator[str]]):
+        chunks = None
+        try:
+            chunks = source()
+            for chunk in chunks:
+                with flight.cond:
+                    if flight.abandoned:
+                        break
+                    flight.chunks.append(chunk)
+                    flight.cond.notify_all()
+        except Exception as e:
+            flight.error = e
+        except BaseException:
+            flight.error = FlightInterrupted("geração compartilhada interrompida")
+            raise
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()  # libera a conexão/vaga no backend se paramos antes do fim
+            self._land(self._streams, key, flight)
+            with flight.cond:
+                flight.done = True
+                flight.cond.notify_all()
+
+    def stream(self, key: Hashable, source: Callable[[], Iterator[str]]) -> Iterator[str]:
+        flight, leader = self._subscribe(self._streams, key, _Stream)
+        if leader:
+            threading.Thread(target=self._pump, args=(key, flight, source),
+                             name="singleflight-pump", daemon=True).start()
+        index = 0
+        try:
+            while True:
+                with flight.cond:
+                    while index == len(flight.chunks) and not flight.done:
+                        flight.cond.wait()
+                    chunks, done = flight.chunks[index:], flight.done
+                yield from chunks
+                index += len(chunks)
+                if done and index == len(flight.chunks):
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+        finally:
+            self._leave(self._streams, key, flight)
+
+    async def _apump(self, key: Hashable, flight: _AsyncStream, source: Callable[[], AsyncIterator[str]]):
+        chunks = None
+        try:
+            chunks = source()
+            async for chunk in chunks:
+                flight.chunks.append(chunk)
+                flight.notify()
+        except asyncio.CancelledError:
+            flight.error = FlightInterrupted("geração compartilhada cancelada")
+            raise
+        except Exception as e:
+            flight.error = e
+        finally:
+            aclose = getattr(chunks, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            self._land(self._astreams, key, flight)
+            flight.done = True
+            flight.notify()
+
+    async def astream(self, key: Hashable, source: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        flight, leader = self._subscribe(self._astreams, key, _AsyncStream)
+        if leader:
+            flight.task = asyncio.ensure_future(self._apump(key, flight, source))
+        index = 0
+        try:
+            while True:
+                while index < len(flight.chunks):
+                    yield flight.chunks[index]
+                    index += 1
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await flight.changed.wait()
+        finally:
+            if self._leave(self._astreams, key, flight) and flight.task is not None:
+                flight.task.cancel()  # ninguém mais espera: para a geração no backend
+
+flights = SingleFlight()
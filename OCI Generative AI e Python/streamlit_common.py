@@ -0,0 +1,32 @@
+"""
+Partes de Streamlit repetidas nos três apps (`app.py`, `app_v2.py`, `app_v3_simple.py`).
+
+- `get_session_id(prefix)`: id estável da conversa, guardado na URL (`?sid=`)
+- `diagnostics_page()`: página "🩺 Diagnóstico" com os histogramas de `metrics.py`
+"""
+
+import uuid
+
+import streamlit as st
+
+from metrics import render_prometheus, summary
+
+def get_session_id(prefix: str) -> str:
+    """ID estável da conversa, guardado na URL (?sid=) para sobreviver a reloads e reinícios"""
+    sid = st.query_params.get("sid")
+    if not sid:
+        sid = st.query_params["sid"] = uuid.uuid4().hex
+    return f"{prefix}:{sid}"
+
+def diagnostics_page():
+    """Latência por etapa medida neste processo (ver `metrics.py`)"""
+    st.title("🩺 Diagnóstico")
+    st.caption("Histogramas por etapa desde o início do processo; percentis estimados pelos buckets.")
+    rows = summary()
+    if not rows:
+        st.info("Nenhuma etapa medida ainda. Envie algumas mensagens no chat.")
+    else:
+        import pandas as pd  # carregado só quando a página é aberta
+        st.dataframe(pd.DataFrame(rows).round(3), use_container_width=True, hide_index=True)
+    with st.expander("Formato Prometheus (`/metrics`)"):
+        st.code(render_prometheus(), language="text")
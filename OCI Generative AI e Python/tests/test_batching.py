@@ -0,0 +1,59 @@
+"""Micro-batching: agrupamento de pedidos e troca de event loop entre `asyncio.run`s"""
+
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from batching import MicroBatcher  # noqa: E402
+
+class Backend:
+    def __init__(self):
+        self.batches = []
+
+    async def agenerate_batch(self, requests):
+        self.batches.append(len(requests))
+        await asyncio.sleep(0)
+        return [f"eco: {messages[-1]['content']}" for messages, _ in requests]
+
+def ask(batcher, texts):
+    async def main():
+        return await asyncio.gather(*(batcher.submit([{"role": "user", "content": t}], None) for t in texts))
+    return asyncio.run(main())
+
+def test_concurrent_requests_share_a_batch():
+    backend = Backend()
+    batcher = MicroBatcher(backend.agenerate_batch, max_batch_size=4, max_wait=0.05)
+    assert ask(batcher, ["a", "b", "c"]) == ["eco: a", "eco: b", "eco: c"]
+    assert backend.batches == [3]
+
+def test_collector_restarts_after_its_loop_is_closed():
+    backend = Backend()
+    batcher = MicroBatcher(backend.agenerate_batch, max_batch_size=4, max_wait=0.01, timeout=2.0)
+    loop = asyncio.new_event_loop()
+    # Loop fechado sem cancelar as tasks: o coletor antigo fica pendente, nunca `done()`
+    assert loop.run_until_complete(batcher.submit([{"role": "user", "content": "a"}], None)) == "eco: a"
+    loop.close()
+    first = batcher._collector
+    assert not first.done()
+    assert ask(batcher, ["b", "c"]) == ["eco: b", "eco: c"]
+    assert batcher._collector is not first
+    assert backend.batches == [1, 2]
+
+def test_collector_follows_the_loop_of_the_caller():
+    backend = Backend()
+    batcher = MicroBatcher(backend.agenerate_batch, max_batch_size=4, max_wait=0.01, timeout=2.0)
+    other = asyncio.new_event_loop()
+    thread = threading.Thread(target=other.run_forever, daemon=True)
+    thread.start()
+    try:
+        # Coletor vivo noutro loop (p.ex. o loop compartilhado do `oci_client`)
+        future = asyncio.run_coroutine_threadsafe(batcher.submit([{"role": "user", "content": "a"}], None), other)
+        assert future.result(2) == "eco: a"
+        assert ask(batcher, ["b"]) == ["eco: b"]
+    finally:
+        other.call_soon_threadsafe(other.stop)
+        thread.join(2)
+    assert backend.batches == [1, 1]
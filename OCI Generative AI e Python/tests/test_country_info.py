@@ -0,0 +1,21 @@
+"""Países e territórios sem capital no snapshot (Macau, Antártida...)"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agent import compare_countries, format_country  # noqa: E402
+from country_info import country_capital, snapshot  # noqa: E402
+
+def test_country_capital_fallback():
+    assert country_capital({"capital": ["Brasília"]}) == "Brasília"
+    assert country_capital({"capital": []}) == "N/A"
+    assert country_capital({}) == "N/A"
+
+def test_country_without_capital():
+    for name in ("Macau", "Antarctica"):
+        data = snapshot.lookup(name)
+        assert data is not None
+        assert "**Capital:** N/A" in format_country(data)
+        assert f"| {data['name']['common']} | N/A |" in compare_countries([data])
@@ -0,0 +1,58 @@
+"""Gravação em lote do FeedbackStore"""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from feedback_store import FeedbackStore  # noqa: E402
+
+def feedback(i, rating="👍"):
+    return {"timestamp": f"2025-01-0{1 + i % 2}T10:00:00", "persona": "Educador", "style": "Formal",
+            "rating": rating, "comment": f"comentário {i}", "user_msg": "oi", "assistant_msg": "olá"}
+
+def test_submit_flush_writes_rows_and_rollups(tmp_path):
+    store = FeedbackStore(str(tmp_path / "feedback.db"))
+    for i in range(5):
+        store.submit(feedback(i, "👍" if i < 3 else "👎"))
+    store.flush(timeout=5)
+    try:
+        assert store.rows_written == 5 and store.rows_dropped == 0
+        assert [row["comment"] for row in store.recent()] == [f"comentário {i}" for i in reversed(range(5))]
+        assert store.rollup() == [(5,)]
+        assert store.rollup("rating") == [("👍", 3), ("👎", 2)]
+        assert store.rollup("day") == [("2025-01-01", 3), ("2025-01-02", 2)]
+    finally:
+        store.close()
+
+class LockedOnce:
+    """Conexão que responde `database is locked` na primeira transação"""
+
+    def __init__(self, conn, failures=1):
+        self.conn = conn
+        self.failures = failures
+
+    def __enter__(self):
+        return self.conn.__enter__()
+
+    def __exit__(self, *exc):
+        return self.conn.__exit__(*exc)
+
+    def executemany(self, sql, rows):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return self.conn.executemany(sql, rows)
+
+def test_busy_database_is_retried(tmp_path):
+    store = FeedbackStore(str(tmp_path / "feedback.db"), retry_backoff=0.001)
+    conn = sqlite3.connect(store.db_path)
+    try:
+        store._write_batch(LockedOnce(conn), [tuple(feedback(0).values())])
+        assert store.rows_written == 1 and store.rows_dropped == 0
+        store._write_batch(LockedOnce(conn, failures=99), [tuple(feedback(1).values())])
+        assert store.rows_dropped == 1
+    finally:
+        conn.close()
+    assert store.rollup() == [(1,)]
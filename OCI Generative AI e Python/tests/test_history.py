@@ -0,0 +1,37 @@
+"""Recorte do histórico por orçamento de tokens"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from history import TRUNCATION_MARK, TokenCounter, trim_history  # noqa: E402
+
+counter = TokenCounter(lambda text: len(text.split()), message_overhead=1)
+system = {"role": "system", "content": "seja breve"}
+
+def total(messages):
+    return sum(counter.count(m) for m in messages)
+
+def test_keeps_recent_turns_within_budget():
+    history = [system] + [{"role": r, "content": "palavra " * 5} for r in ("user", "assistant") * 4]
+    trimmed = trim_history(history, max_turns=10, max_tokens=20, counter=counter)
+    assert trimmed[0] is system
+    assert trimmed[1:] == history[-2:]
+    assert total(trimmed) <= 20
+
+def test_long_newest_message_is_truncated_to_budget():
+    paste = " ".join(f"linha{i}" for i in range(500))
+    history = [system, {"role": "user", "content": "oi"}, {"role": "user", "content": paste}]
+    trimmed = trim_history(history, max_turns=6, max_tokens=50, counter=counter)
+    assert [m["role"] for m in trimmed] == ["system", "user"]
+    content = trimmed[-1]["content"]
+    assert content.startswith("linha0 linha1") and content.endswith(TRUNCATION_MARK)
+    assert total(trimmed) <= 50
+    assert history[-1]["content"] == paste  # o histórico original não é alterado
+
+def test_budget_smaller_than_system_prompt():
+    with pytest.raises(ValueError):
+        trim_history([system, {"role": "user", "content": "oi"}], max_turns=6, max_tokens=2, counter=counter)
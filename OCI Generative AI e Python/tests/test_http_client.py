@@ -0,0 +1,127 @@
+"""Cliente HTTP das ferramentas: disjuntor, cache negativo e, contra o stub com injeção de
+falhas (`benchmarks/stub_server.py`), novas tentativas, `Retry-After` e requisições hedged"""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+import requests
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import country_info  # noqa: E402
+from http_client import CircuitBreaker, CircuitOpenError, ToolHTTPClient, UpstreamStatusError  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+@pytest.fixture
+def stub_factory():
+    servers = []
+
+    def start(**kwargs):
+        server = StubServer(**kwargs).start()
+        servers.append(server)
+        return server
+    yield start
+    for server in servers:
+        server.stop()
+
+def test_unexpected_error_releases_half_open_trial():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+    client = ToolHTTPClient("test", retries=0, breaker=breaker, sleep=lambda s: None)
+    breaker.record_failure()
+    now[0] = 11.0
+
+    def broken(*args, **kwargs):
+        raise requests.exceptions.ChunkedEncodingError("corpo truncado")
+    client._send = broken
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        client.get("http://stub")
+    assert breaker.state == CircuitBreaker.OPEN
+    now[0] = 22.0
+    assert breaker.allow()  # nova requisição de teste liberada
+
+def test_only_not_found_is_negatively_cached(monkeypatch):
+    calls = []
+
+    def fetch(name):
+        calls.append(name)
+        raise CircuitOpenError("disjuntor aberto")
+    monkeypatch.setattr(country_info, "_fetch_remote", fetch)
+    country_info.country_cache.clear()
+    for _ in range(2):
+        with pytest.raises(CircuitOpenError):
+            country_info.fetch_country("Atlântida")
+    assert len(calls) == 2
+
+    response = requests.Response()
+    response.status_code = 404
+
+    def missing(name):
+        calls.append(name)
+        raise requests.HTTPError("404", response=response)
+    monkeypatch.setattr(country_info, "_fetch_remote", missing)
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            country_info.fetch_country("Atlântida")
+    assert len(calls) == 3
+    country_info.country_cache.clear()
+
+def test_retries_with_full_jitter(stub_factory):
+    stub = stub_factory(error_rate=1.0)
+    delays = []
+    client = ToolHTTPClient("test", retries=3, backoff=0.2, max_backoff=1.0, sleep=delays.append)
+    with pytest.raises(UpstreamStatusError):
+        client.get(stub.url.format(name="Brazil"))
+    assert stub.requests == 4 and client.stats()["retries"] == 3
+    assert len(delays) == 3 and len(set(delays)) == 3  # sorteados, não fixos
+    for attempt, delay in enumerate(delays):
+        assert 0 <= delay <= min(1.0, 0.2 * 2 ** attempt)
+
+def test_transient_failures_are_retried_until_success(stub_factory):
+    stub = stub_factory(error_rate=0.4, drop_rate=0.2, seed=3)
+    client = ToolHTTPClient("test", retries=10, sleep=lambda s: None)
+    for _ in range(5):
+        assert client.get(stub.url.format(name="Brazil")).status_code == 200
+    assert stub.faults["error"] and stub.faults["drop"]
+    assert client.stats()["retries"] == stub.faults["error"] + stub.faults["drop"]
+
+def test_retry_after_is_honored_up_to_max_backoff(stub_factory):
+    delays = []
+    client = ToolHTTPClient("test", retries=2, max_backoff=2.0, sleep=delays.append)
+    with pytest.raises(UpstreamStatusError):
+        client.get(stub_factory(error_rate=1.0, retry_after=0.3).url.format(name="Brazil"))
+    assert delays == [0.3, 0.3]
+    delays.clear()
+    client.breaker.record_success()
+    with pytest.raises(UpstreamStatusError):
+        client.get(stub_factory(error_rate=1.0, retry_after=30).url.format(name="Brazil"))
+    assert delays == [2.0, 2.0]
+
+def test_hedge_wins_over_a_slow_response(stub_factory):
+    # seed 1: a primeira requisição sorteia lenta (0.13 < 0.5), a segunda não (0.85)
+    stub = stub_factory(slow_rate=0.5, slow_latency=2.0, seed=1)
+    client = ToolHTTPClient("test", retries=0, hedge_after=0.05)
+    started = time.perf_counter()
+    response = client.get(stub.url.format(name="Brazil"))
+    elapsed = time.perf_counter() - started
+    client.close()
+    assert response.status_code == 200 and elapsed < 1.0
+    assert client.stats()["hedges"] == 1 and client.stats()["hedge_wins"] == 1
+
+def test_breaker_opens_when_upstream_always_fails(stub_factory):
+    stub = stub_factory(error_rate=1.0)
+    client = ToolHTTPClient("test", retries=1, breaker=CircuitBreaker(failure_threshold=2),
+                            sleep=lambda s: None)
+    for _ in range(2):
+        with pytest.raises(UpstreamStatusError):
+            client.get(stub.url.format(name="Brazil"))
+    assert client.breaker.state == CircuitBreaker.OPEN
+    requests_before = stub.requests
+    with pytest.raises(CircuitOpenError):
+        client.get(stub.url.format(name="Brazil"))
+    assert stub.requests == requests_before  # falha na hora, sem tocar no upstream
+    assert client.stats()["rejected"] == 1
@@ -0,0 +1,18 @@
+"""Janela recente da SimpleMemory"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from memory import SimpleMemory  # noqa: E402
+
+def test_context_follows_the_window():
+    memory = SimpleMemory(max_turns=10, context_messages=2)
+    assert memory.get_context() == ""
+    for i in range(5):
+        memory.add_message("user" if i % 2 == 0 else "assistant", f"m{i}")
+        expected = "".join(f"{'Usuário' if j % 2 == 0 else 'Assistente'}: m{j}\n" for j in range(max(0, i - 1), i + 1))
+        assert memory.get_context() == expected
+    memory.clear()
+    assert memory.get_context() == ""
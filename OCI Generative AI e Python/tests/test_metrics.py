@@ -0,0 +1,50 @@
+"""Medição de streams por etapa"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from metrics import atimed_stream, stage_seconds, timed_stream  # noqa: E402
+
+def measured(stage):
+    counts, total = stage_seconds.collect().get(stage, ([0], 0.0))
+    return sum(counts), total
+
+def test_stream_time_excludes_the_consumer():
+    closed = []
+
+    def chunks():
+        try:
+            for token in ("a", "b", "c"):
+                time.sleep(0.002)
+                yield token
+        finally:
+            closed.append(True)
+    for chunk in timed_stream("test_sync", chunks(), first_stage="test_sync_first"):
+        time.sleep(0.05)  # renderização lenta não entra na medida
+    calls, total = measured("test_sync")
+    assert calls == 1 and total < 0.05
+    assert measured("test_sync_first")[0] == 1
+    assert closed == [True]
+
+def test_abandoned_async_stream_is_closed():
+    closed = []
+
+    async def chunks():
+        try:
+            for token in ("a", "b", "c"):
+                await asyncio.sleep(0.001)
+                yield token
+        finally:
+            closed.append(True)
+
+    async def main():
+        stream = atimed_stream("test_async", chunks())
+        assert await stream.__anext__() == "a"
+        await stream.aclose()
+    asyncio.run(main())
+    assert closed == [True]
+    assert measured("test_async")[0] == 1
@@ -0,0 +1,119 @@
+"""Cliente assíncrono do OCI contra o stub local (`benchmarks/stub_server.py`)"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from oci_client import AsyncOCIClient, FairLimiter, GenParams, mock_tokens  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+PARAMS = GenParams()
+
+def ask(text):
+    return [{"role": "user", "content": text}]
+
+@pytest.fixture
+def stub():
+    server = StubServer(latency=0.01).start()
+    yield server
+    server.stop()
+
+def test_stream_parses_sse_chunks(stub):
+    async def main():
+        client = AsyncOCIClient(endpoint=stub.chat_url)
+        try:
+            chunks = [chunk async for chunk in client.agenerate_stream(ask("olá mundo"), PARAMS)]
+            full = await client.agenerate(ask("olá mundo"), PARAMS)
+        finally:
+            await client.aclose()
+        return chunks, full
+    chunks, full = asyncio.run(main())
+    assert chunks == mock_tokens("Eco: olá mundo")
+    assert full == "".join(chunks) == "Eco: olá mundo"
+
+def test_connections_are_reused(stub):
+    async def main():
+        client = AsyncOCIClient(endpoint=stub.chat_url, max_concurrency=4)
+        try:
+            for i in range(5):
+                await client.agenerate(ask(str(i)), PARAMS)
+            assert stub.connections == 1
+            await asyncio.gather(*(client.agenerate(ask(str(i)), PARAMS) for i in range(12)))
+        finally:
+            await client.aclose()
+    asyncio.run(main())
+    assert stub.requests == 17
+    assert stub.connections <= 4  # no máximo uma conexão por vaga do limitador
+
+def test_requests_are_served_in_arrival_order(stub):
+    async def main():
+        client = AsyncOCIClient(endpoint=stub.chat_url, max_concurrency=1)
+        finished = []
+
+        async def call(i):
+            finished.append(await client.agenerate(ask(str(i)), PARAMS))
+        try:
+            tasks = []
+            for i in range(6):
+                tasks.append(asyncio.ensure_future(call(i)))
+                await asyncio.sleep(0)  # garante a ordem de chegada no limitador
+            await asyncio.gather(*tasks)
+        finally:
+            await client.aclose()
+        return finished
+    assert asyncio.run(main()) == [f"Eco: {i}" for i in range(6)]
+
+def test_newcomers_do_not_jump_the_queue():
+    async def main():
+        limiter = FairLimiter(1)
+        await limiter.acquire()
+        order = []
+
+        async def worker(name):
+            async with limiter:
+                order.append(name)
+        waiting = asyncio.ensure_future(worker("waiting"))
+        await asyncio.sleep(0)
+        limiter.release()  # a vaga vai para quem já esperava...
+        newcomer = asyncio.ensure_future(worker("newcomer"))  # ...não para quem chega agora
+        await asyncio.gather(waiting, newcomer)
+        return order, limiter.in_flight
+    assert asyncio.run(main()) == (["waiting", "newcomer"], 0)
+
+def test_cancel_while_waiting_leaves_the_queue():
+    async def main():
+        limiter = FairLimiter(1)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.queued == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.queued == 0
+        limiter.release()
+        return limiter.in_flight
+    assert asyncio.run(main()) == 0
+
+def test_cancel_after_handoff_passes_the_slot_on():
+    async def main():
+        limiter = FairLimiter(1)
+        await limiter.acquire()
+        first = asyncio.ensure_future(limiter.acquire())
+        second = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        limiter.release()  # repassa a vaga para `first`...
+        first.cancel()  # ...que é cancelado antes de retomar
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        await asyncio.wait_for(second, 1)  # a vaga seguiu para o próximo da fila
+        assert limiter.in_flight == 1 and limiter.queued == 0
+        limiter.release()
+        return limiter.in_flight
+    assert asyncio.run(main()) == 0
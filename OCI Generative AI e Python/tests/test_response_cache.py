@@ -0,0 +1,32 @@
+"""Nível semântico do cache de respostas"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from embeddings import HashingEmbedder  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+
+def test_hashing_embedder_refused_for_semantic_tier():
+    cache = ResponseCache(embedder=HashingEmbedder())
+    assert cache.semantic is None
+
+def test_negated_question_is_not_served_from_cache():
+    cache = ResponseCache(embedder=HashingEmbedder())
+    cache.store([{"role": "user", "content": "Quero cancelar minha conta"}], "Conta cancelada.")
+    assert cache.lookup([{"role": "user", "content": "Não quero cancelar minha conta"}]) is None
+
+def test_sampled_generations_bypass_the_cache():
+    cache = ResponseCache()
+    messages = [{"role": "user", "content": "Conte uma piada"}]
+    cache.store(messages, "Resposta amostrada", {"temperature": 0.7})
+    assert cache.lookup(messages, {"temperature": 0.7}) is None
+    cache.store(messages, "Resposta fixa", {"temperature": 0.0})
+    assert cache.lookup(messages, {"temperature": 0.0}) == "Resposta fixa"
+    stats = cache.stats()
+    assert stats["bypassed"] == 1 and stats["hits"] == 1 and stats["misses"] == 0
+
+def test_disabled_semantic_tier_is_reported():
+    assert ResponseCache(embedder=HashingEmbedder()).stats()["semantic_disabled"]
+    assert ResponseCache().stats()["semantic_disabled"] is None
@@ -0,0 +1,128 @@
+"""Roteamento entre stubs locais: failover, ejeção, observação e chamadas canceladas"""
+
+import asyncio
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from oci_client import GenParams, RoutedOCIClient  # noqa: E402
+from router import EndpointRouter  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+PARAMS = GenParams()
+
+def ask(text):
+    return [{"role": "user", "content": text}]
+
+class FirstChoice(random.Random):
+    """Sempre o primeiro candidato: o endpoint com falha é escolhido enquanto estiver disponível"""
+
+    def choice(self, seq):
+        return seq[0]
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def stubs():
+    servers = [StubServer(error_rate=1.0).start()] + [StubServer(latency=0.005).start() for _ in range(3)]
+    yield servers
+    for server in servers:
+        server.stop()
+
+def routed(stubs, clock=None, **options):
+    router = EndpointRouter([s.chat_url for s in stubs], strategy="random", rng=FirstChoice(),
+                            clock=clock or FakeClock(), **options)
+    return RoutedOCIClient([], router=router), router
+
+def run(client, coro_fn):
+    async def main():
+        try:
+            return await coro_fn()
+        finally:
+            await client.aclose()
+    return asyncio.run(main())
+
+def test_failed_call_is_retried_on_another_endpoint(stubs):
+    client, router = routed(stubs, consecutive_failures=5)
+    answer = run(client, lambda: client.agenerate(ask("olá"), PARAMS))
+    assert answer == "Eco: olá"
+    bad, first_good = router.endpoints[0], router.endpoints[1]
+    assert stubs[0].requests == 1 and stubs[1].requests == 1
+    assert list(bad.outcomes) == [False] and list(first_good.outcomes) == [True]
+    assert bad.latency >= first_good.latency  # penalidade: quem falha não parece o mais rápido
+    assert all(e.outstanding == 0 for e in router.endpoints)
+
+def test_failing_endpoint_is_ejected(stubs):
+    client, router = routed(stubs, consecutive_failures=2, eject_seconds=10.0)
+
+    async def calls():
+        return [await client.agenerate(ask(str(i)), PARAMS) for i in range(6)]
+    assert run(client, calls) == [f"Eco: {i}" for i in range(6)]
+    bad = router.endpoints[0]
+    assert stubs[0].requests == 2  # ejetado depois de 2 falhas seguidas, sem tráfego depois
+    assert bad.ejections == 1
+    assert router.stats()[0]["ejected_for_s"] == pytest.approx(10.0)
+
+def test_probation_failure_ejects_again_and_success_clears_history(stubs):
+    clock = FakeClock()
+    client, router = routed(stubs, clock=clock, consecutive_failures=1, eject_seconds=10.0)
+    bad = router.endpoints[0]
+
+    async def scenario():
+        await client.agenerate(ask("a"), PARAMS)
+        assert bad.ejections == 1
+        clock.now += 11  # volta em observação: uma falha já basta para ejetar de novo
+        await client.agenerate(ask("b"), PARAMS)
+        assert bad.ejections == 2 and stubs[0].requests == 2
+        assert router.stats()[0]["ejected_for_s"] == pytest.approx(20.0)
+        clock.now += 21
+        stubs[0].error_rate = 0.0
+        assert await client.agenerate(ask("c"), PARAMS) == "Eco: c"
+    run(client, scenario)
+    assert stubs[0].requests == 3
+    assert bad.ejections == 0 and not bad.probation and not bad.ejected_until
+
+def test_cancelled_call_is_not_recorded(stubs):
+    slow = StubServer(latency=0.5).start()
+    try:
+        client, router = routed([slow])
+
+        async def cancel():
+            task = asyncio.ensure_future(client.agenerate(ask("lento"), PARAMS))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        run(client, cancel)
+    finally:
+        slow.stop()
+    endpoint = router.endpoints[0]
+    assert endpoint.outstanding == 0
+    assert list(endpoint.outcomes) == [] and endpoint.latency is None
+
+def test_stream_records_the_full_duration_and_ignores_abandoned_streams(stubs):
+    client, router = routed(stubs[1:2])
+    endpoint = router.endpoints[0]
+
+    async def scenario():
+        chunks = [c async for c in client.agenerate_stream(ask("olá mundo"), PARAMS)]
+        assert "".join(chunks) == "Eco: olá mundo"
+        assert list(endpoint.outcomes) == [True] and endpoint.latency is not None
+        latency = endpoint.latency
+        stream = client.agenerate_stream(ask("olá mundo"), PARAMS)
+        await stream.__anext__()
+        await stream.aclose()  # quem consumia desistiu no meio
+        assert list(endpoint.outcomes) == [True] and endpoint.latency == latency
+    run(client, scenario)
+    assert endpoint.outstanding == 0
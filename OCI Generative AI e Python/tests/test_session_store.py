@@ -0,0 +1,82 @@
+"""Backends de sessão: codificação compacta, gravação só por acréscimo e expiração no Redis"""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from session_store import (COMPRESS_MIN_BYTES, InMemorySessionStore, RedisSessionStore,  # noqa: E402
+                           SQLiteSessionStore, decode_turn, encode_turn)
+
+def turn(role, content):
+    return {"role": role, "content": content}
+
+@pytest.mark.parametrize("message", [
+    turn("user", "Olá! 🌎 Qual a capital da Islândia?"),
+    turn("assistant", ""),
+    turn("system", "x" * (COMPRESS_MIN_BYTES - 2)),
+    turn("assistant", "Reykjavík é a capital. " * 100),
+])
+def test_encoding_round_trip(message):
+    raw = encode_turn(message)
+    assert decode_turn(raw) == message
+    payload = message["content"].encode("utf-8")
+    if len(payload) >= COMPRESS_MIN_BYTES:
+        assert raw[:1].isupper() and len(raw) < len(payload)  # papel em maiúsculo: zlib
+    else:
+        assert raw == message["role"][0].encode() + payload
+
+def redis_store(**kwargs):
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisSessionStore(fakeredis.FakeRedis(), **kwargs)
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemorySessionStore()
+    if request.param == "sqlite":
+        return SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    return redis_store()
+
+def test_append_load_and_clear(store):
+    store.append("s1", turn("user", "oi"), turn("assistant", "olá"))
+    store.append("s1", turn("user", "tudo bem?"))
+    store.append("s2", turn("user", "outra sessão"))
+    assert [m["content"] for m in store.load("s1")] == ["oi", "olá", "tudo bem?"]
+    assert [m["content"] for m in store.load("s1", limit=2)] == ["olá", "tudo bem?"]
+    assert store.load("s1", limit=0) == []
+    store.clear("s1")
+    assert store.load("s1") == []
+    assert store.load("s2") == [turn("user", "outra sessão")]
+
+def test_sqlite_only_appends_rows(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    store.append("s", turn("user", "primeira"))
+    conn = sqlite3.connect(store.db_path)
+    try:
+        before = conn.execute("SELECT id, turn FROM session_turns").fetchall()
+        store.append("s", turn("assistant", "segunda"), turn("user", "terceira"))
+        after = conn.execute("SELECT id, turn FROM session_turns ORDER BY id").fetchall()
+    finally:
+        conn.close()
+    assert after[:1] == before  # a linha antiga não é regravada
+    assert [decode_turn(raw)["content"] for _, raw in after] == ["primeira", "segunda", "terceira"]
+
+def test_redis_appends_and_renews_expiration():
+    store = redis_store(ttl=3600)
+    key = store._key("s")
+    store.append("s", turn("user", "oi"))
+    assert store.client.llen(key) == 1
+    store.client.expire(key, 10)
+    store.append("s", turn("assistant", "olá"), turn("user", "tchau"))
+    assert store.client.llen(key) == 3
+    assert 3590 <= store.client.ttl(key) <= 3600  # cada append renova a expiração
+    assert store.client.lindex(key, 0) == encode_turn(turn("user", "oi"))
+
+def test_redis_without_ttl_never_expires():
+    store = redis_store(ttl=None)
+    store.append("s", turn("user", "oi"))
+    assert store.client.ttl(store._key("s")) == -1
@@ -0,0 +1,109 @@
+"""Coalescência do single-flight: interrupção do líder e tabelas separadas por modo"""
+
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from singleflight import FlightInterrupted, SingleFlight, flight_calls  # noqa: E402
+
+class LeaderStopped(BaseException):
+    """Simula KeyboardInterrupt/SystemExit sem derrubar o pytest"""
+
+def wait_shared(count: int):
+    """Espera os seguidores entrarem no voo (contados como `shared`)"""
+    deadline = time.monotonic() + 5
+    while flight_calls.collect().get("shared", 0) < count and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+def test_followers_share_the_leader_result():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "ok"
+
+    with ThreadPoolExecutor(4) as pool:
+        leader = pool.submit(flights.do, "k", fn)
+        started.wait(5)
+        shared = flight_calls.collect().get("shared", 0)
+        followers = [pool.submit(flights.do, "k", fn) for _ in range(3)]
+        wait_shared(shared + 3)
+        release.set()
+        assert leader.result(5) == "ok"
+        assert [f.result(5) for f in followers] == ["ok"] * 3
+    assert calls == [1]
+    assert flights.in_flight() == 0
+
+def test_followers_get_flight_interrupted_when_the_leader_is_interrupted():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def fn():
+        started.set()
+        release.wait(5)
+        raise LeaderStopped()
+
+    def leader():
+        try:
+            flights.do("k", fn)
+        except LeaderStopped:
+            return "leader re-raised"
+
+    with ThreadPoolExecutor(2) as pool:
+        first = pool.submit(leader)
+        started.wait(5)
+        shared = flight_calls.collect().get("shared", 0)
+        follower = pool.submit(flights.do, "k", lambda: "não deveria rodar")
+        wait_shared(shared + 1)
+        release.set()
+        assert first.result(5) == "leader re-raised"
+        with pytest.raises(FlightInterrupted):
+            follower.result(5)
+    assert flights.in_flight() == 0
+
+def test_followers_get_the_leader_exception():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def fn():
+        started.set()
+        release.wait(5)
+        raise ValueError("falhou")
+
+    with ThreadPoolExecutor(2) as pool:
+        first = pool.submit(flights.do, "k", fn)
+        started.wait(5)
+        shared = flight_calls.collect().get("shared", 0)
+        follower = pool.submit(flights.do, "k", fn)
+        wait_shared(shared + 1)
+        release.set()
+        for future in (first, follower):
+            with pytest.raises(ValueError, match="falhou"):
+                future.result(5)
+
+def test_modes_do_not_share_flights_for_the_same_key():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        return "do"
+
+    with ThreadPoolExecutor(2) as pool:
+        future = flights.submit("k", pool, slow)
+        # Com uma tabela só, `do` receberia o Future do `submit` (ou `stream` um Future sem `cond`)
+        assert list(flights.stream("k", lambda: iter(["a", "b"]))) == ["a", "b"]
+        assert flights.do("k", lambda: "direto") == "direto"
+        assert flights.in_flight() == 1
+        release.set()
+        assert future.result(5) == "do"